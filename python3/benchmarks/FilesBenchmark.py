@@ -0,0 +1,58 @@
+"""
+Throughput of MmapFileReader on a large sparse file: find from the start of
+the file and from subfiles, and random slices. The file is sparse, so a
+multi-GB file takes no disk space, but every find still scans the pages.
+
+Run from the python3 directory:
+    python3 -m benchmarks.FilesBenchmark [--json FILE] [--quick] [--size GB] [--directory DIR]
+"""
+import argparse
+import os
+import random
+import tempfile
+from python3.benchmarks.generators import removeFile, sparseFile
+from python3.benchmarks.measure import measure, report
+from python3.tools.files import MmapFileReader
+
+GIGABYTE = 1024 * 1024 * 1024
+
+
+def run(quick=False, size=2 * GIGABYTE, directory=None):
+    """
+    Returns a dict mapping each case to its result (see measure.measure).
+    """
+    if quick:
+        size = min(size, 64 * 1024 * 1024)
+    fd, path = tempfile.mkstemp(prefix="mmapbenchmark", dir=directory)
+    os.close(fd)
+    try:
+        needles = sparseFile(path, size, needles=16, seed=3)
+        rand = random.Random(4)
+        with MmapFileReader(path) as reader:
+            # the needles are spread over the file, on average half of it is scanned
+            results = {
+                "find": measure(lambda needle: reader.find(needle),
+                                [needle for _, needle in needles], warmup=0),
+            }
+            # find the next needle from the previous one, typically a short scan
+            subfiles = [(reader.subfile(position), needle) for (position, _), (_, needle) in zip(needles, needles[1:])]
+            results["subfile.find"] = measure(lambda pair: pair[0].find(pair[1]), subfiles * 4, warmup=0)
+            slices = [rand.randrange(size - 4096) for _ in range(10000 if quick else 100000)]
+            results["slice/4k"] = measure(lambda start: reader[start:start + 4096], slices)
+        return results
+    finally:
+        removeFile(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MmapFileReader on a sparse file")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--quick", action="store_true", help="small inputs, for smoke testing")
+    parser.add_argument("--size", type=float, default=2, help="file size in GB")
+    parser.add_argument("--directory", help="directory of the sparse file (default: system temp)")
+    args = parser.parse_args()
+    report(run(args.quick, int(args.size * GIGABYTE), args.directory), args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Measures the import time of the library modules. Every module is imported in
+a fresh interpreter with "python -X importtime" several times, the cumulative
+time of the module itself is reported (p50/p99 of the runs), as well as the
+number of modules loaded by it.
+
+Run from the python3 directory:
+    python3 -m benchmarks.ImportTimeBenchmark [--json FILE] [--quick] [--repeat N] [module ...]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from python3.benchmarks.measure import report, summarize
+
+
+defaultModules = [
+    "python3.services.inputtype",
+    "python3.services.configuration",
+    "python3.services.results",
+    "python3.services.schema",
+    "python3.services.router",
+    "python3.tools.files",
+    "python3.tools.structs",
+    "python3.tools.storageutils",
+]
+
+# directory containing the python3 package
+rootDirectory = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def importTime(module):
+    """
+    Import module in a new interpreter and return a tuple of its cumulative
+    import time in microseconds and the number of modules imported.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = rootDirectory + os.pathsep + env.get("PYTHONPATH", "")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        cwd=rootDirectory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+
+    # lines look like: "import time:       123 |        456 | python3.tools.files"
+    cumulative, count = None, 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # header line
+        count += 1
+        if fields[2].strip() == module:
+            cumulative = int(fields[1])
+    if cumulative is None:
+        raise RuntimeError("no import time reported for " + module)
+    return cumulative, count
+
+
+def run(quick=False, modules=defaultModules, repeat=10):
+    """
+    Returns a dict mapping "import/<module>" (without the python3. prefix)
+    to its result (see measure.summarize, one operation per import), with
+    the number of modules loaded by the import added as "modules".
+    """
+    if quick:
+        repeat = min(repeat, 3)
+    results = {}
+    for module in modules:
+        timings = [importTime(module) for _ in range(repeat)]
+        latencies = [t[0] * 1000 for t in timings]
+        result = summarize(latencies, sum(latencies))
+        result["modules"] = timings[0][1]
+        name = module[len("python3."):] if module.startswith("python3.") else module
+        results["import/" + name] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure library import times")
+    parser.add_argument("modules", nargs="*", default=defaultModules)
+    parser.add_argument("--repeat", type=int, default=10, help="imports per module")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--quick", action="store_true", help="fewer imports, for smoke testing")
+    args = parser.parse_args()
+    report(run(args.quick, args.modules, args.repeat), args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Throughput of input detection and validation: Detect on a mixed indicator
+feed, the domain name check, and IP validation of public and non-public
+addresses (the latter hit the non-public range lookup).
+
+Run from the python3 directory:
+    python3 -m benchmarks.InputtypeBenchmark [--json FILE] [--quick]
+"""
+import ipaddress
+import random
+from python3.benchmarks.generators import indicatorFeed
+from python3.benchmarks.measure import arguments, measure, report
+from python3.services.inputtype import (
+    Detect,
+    ValidateDomain,
+    ValidateIP,
+    __initTldMapHelper as initTldMapHelper, # normally InitializeTLDMap(path)
+    __isDomainName as isDomainName,
+)
+
+
+def run(quick=False):
+    """
+    Returns a dict mapping each case to its result (see measure.measure).
+    """
+    count = 20000 if quick else 500000
+    initTldMapHelper("\n".join(["COM", "NET", "ORG", "DE", "IO", "INFO"]))
+    feed = indicatorFeed(count, seed=1)
+    domains = [line for line in feed if Detect(line)[0] is not None and "@" not in line
+               and not line[0].isdigit() and ":" not in line]
+    rand = random.Random(2)
+    public = [ipaddress.IPv4Address(rand.randrange(0x01000000, 0x0A000000)) for _ in range(count)]
+    nonpublic = [ipaddress.IPv4Address(rand.randrange(0xAC100000, 0xAC200000)) for _ in range(count)]
+    return {
+        "Detect/mixed":          measure(Detect, feed),
+        "isDomainName":          measure(isDomainName, domains),
+        "ValidateDomain":        measure(ValidateDomain, domains),
+        "ValidateIP/public":     measure(ValidateIP, public),
+        "ValidateIP/nonpublic":  measure(ValidateIP, nonpublic),
+    }
+
+
+def main():
+    args = arguments("Benchmark input detection and validation")
+    report(run(args.quick), args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Cost of building result trees with ServiceResultSet.add: wide flat sets,
+deep paths and trees that are both, added key path by key path, as nested
+result sets and as dictionaries.
+
+Run from the python3 directory:
+    python3 -m benchmarks.ResultsBenchmark [--json FILE] [--quick]
+"""
+from python3.benchmarks.generators import resultPaths
+from python3.benchmarks.measure import arguments, measure, report
+from python3.services.results import ServiceResultSet
+
+
+shapes = {
+    # name: (depth, width)
+    "wide":      (1, 100000),
+    "deep":      (32, 1),
+    "deep+wide": (4, 16),
+}
+
+
+def run(quick=False):
+    """
+    Returns a dict mapping each case to its result (see measure.measure).
+    """
+    results = {}
+    for name, (depth, width) in shapes.items():
+        if quick:
+            width = min(width, 8) if depth > 1 else min(width, 5000)
+        paths = resultPaths(depth, width, seed=5)
+        repeat = 1
+        if depth > 1 and len(paths) < 10000:
+            # repeat small trees, each in a fresh set, so every case has
+            # enough samples
+            repeat = 10000 // len(paths) + 1
+        jobs = [(resultset, path) for resultset in [ServiceResultSet() for _ in range(repeat)] for path in paths]
+        results["add/" + name] = measure(lambda job: job[0].add(*job[1]), jobs, warmup=0)
+
+        subsets = []
+        for _, path in jobs[:1000]:
+            subset = ServiceResultSet()
+            subset.add(*path)
+            subsets.append(subset)
+        # every subset under its own key, else they pile up in a single list
+        target = ServiceResultSet()
+        merged = [("merged{}".format(i), subset) for i, subset in enumerate(subsets)]
+        results["add(ServiceResultSet)/" + name] = measure(lambda job: target.add(*job), merged, warmup=0)
+        targets = [ServiceResultSet() for _ in range(len(subsets) // len(paths) + 1)]
+        dicts = [(targets[i // len(paths)], subset.dict()) for i, subset in enumerate(subsets)]
+        results["add(dict)/" + name] = measure(lambda job: job[0].add(job[1]), dicts, warmup=0)
+    return results
+
+
+def main():
+    args = arguments("Benchmark ServiceResultSet.add")
+    report(run(args.quick), args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+HTTP load against a Router on a local port: the info page, a small analyze
+handler and a JSON response built with ServiceResultSet. The server runs in
+its own thread and IOLoop, requests are sent by a fixed number of concurrent
+clients over keep-alive connections.
+
+Run from the python3 directory:
+    python3 -m benchmarks.RouterBenchmark [--json FILE] [--quick] [--concurrency N]
+"""
+import argparse
+import asyncio
+import threading
+import time
+
+import tornado.httpclient
+import tornado.httpserver
+import tornado.ioloop
+import tornado.netutil
+import tornado.web
+
+from python3.benchmarks.measure import report, summarize
+from python3.services.configuration import Metadata
+from python3.services.results import ServiceResultSet
+from python3.services.router import Router
+
+
+class AnalyzeHandler(tornado.web.RequestHandler):
+    def get(self):
+        resultset = ServiceResultSet()
+        obj = self.get_argument("obj")
+        resultset.add("input", obj)
+        for i in range(32):
+            resultset.add("findings", "finding{}".format(i), "score", i)
+        self.write(resultset.dict())
+
+
+def serve(router):
+    """
+    Start router on a free local port in a daemon thread.
+    Returns the port and the IOLoop of the server.
+    """
+    sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+    port = sockets[0].getsockname()[1]
+    started = threading.Event()
+    loops = []
+
+    def loop():
+        asyncio.set_event_loop(asyncio.new_event_loop())
+        server = tornado.httpserver.HTTPServer(router)
+        server.add_sockets(sockets)
+        loops.append(tornado.ioloop.IOLoop.current())
+        started.set()
+        loops[0].start()
+
+    threading.Thread(target=loop, daemon=True).start()
+    started.wait()
+    return port, loops[0]
+
+
+async def load(url, requests, concurrency):
+    # returns the per request latencies and the total time in nanoseconds
+    client = tornado.httpclient.AsyncHTTPClient(max_clients=concurrency)
+    latencies = []
+    remaining = [requests]
+
+    async def worker():
+        while remaining[0] > 0:
+            remaining[0] -= 1
+            start = time.perf_counter_ns()
+            await client.fetch(url)
+            latencies.append(time.perf_counter_ns() - start)
+
+    started = time.perf_counter_ns()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter_ns() - started
+    client.close()
+    return latencies, elapsed
+
+
+def run(quick=False, concurrency=16):
+    """
+    Returns a dict mapping each case to its result (see measure.measure).
+    """
+    requests = 500 if quick else 20000
+    metadata = Metadata(
+        name="benchmark-service",
+        version="1.0",
+        description="benchmark",
+        copyright="none",
+        license="none",
+    )
+    router = Router(metadata=metadata, handlers={"analyze": AnalyzeHandler})
+    port, serverloop = serve(router)
+    base = "http://127.0.0.1:{}".format(port)
+    results = {}
+    try:
+        for case, path in (("info", "/"), ("analyze", "/analyze/?obj=example.com")):
+            asyncio.run(load(base + path, min(requests, 200), concurrency))  # warm up
+            latencies, elapsed = asyncio.run(load(base + path, requests, concurrency))
+            results["{}/c{}".format(case, concurrency)] = summarize(latencies, elapsed)
+    finally:
+        serverloop.add_callback(serverloop.stop)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a local Router under HTTP load")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--quick", action="store_true", help="small inputs, for smoke testing")
+    parser.add_argument("--concurrency", type=int, default=16, help="number of concurrent clients")
+    args = parser.parse_args()
+    report(run(args.quick, args.concurrency), args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Compares the cost of reading configuration values through StructDict,
+FrozenStructDict and the compiled objects created by CompileStruct (a plain
+dict lookup is given as reference).
+
+Run from the python3 directory:
+    python3 -m benchmarks.StructBenchmark [--json FILE] [--quick]
+"""
+import time
+import timeit
+from python3.benchmarks.measure import arguments, report, summarize
+from python3.tools.structs import StructDict, FrozenStructDict, CompileStruct
+
+
+exampleConfiguration = {
+    "Port": 8016,
+    "MaxSize": 1000,
+    "Hosts": ["a.example.com", "b.example.com"],
+    "Limits": {
+        "MaxInflight": 16,
+        "MaxQueue": 64,
+    },
+}
+
+
+def run(quick=False, number=10000, repeat=200):
+    """
+    Returns a dict mapping each case (variant/flat and variant/nested) to its
+    result (see measure.summarize). Lookups take nanoseconds, they are timed
+    in batches of number lookups.
+    """
+    if quick:
+        repeat = 20
+    variants = {
+        "dict":             dict(exampleConfiguration),
+        "StructDict":       StructDict(exampleConfiguration),
+        "FrozenStructDict": FrozenStructDict(exampleConfiguration),
+        "CompileStruct":    CompileStruct(exampleConfiguration),
+    }
+    statements = {
+        "dict": (
+            "cfg['MaxSize']",
+            "cfg['Limits']['MaxQueue']",
+        ),
+    }
+    results = {}
+    for name, cfg in variants.items():
+        flat, nested = statements.get(name, ("cfg.maxsize", "cfg.limits.maxqueue"))
+        for label, statement in (("flat", flat), ("nested", nested)):
+            timer = timeit.Timer(statement, globals={"cfg": cfg})
+            started = time.perf_counter_ns()
+            batches = timer.repeat(number=number, repeat=repeat)
+            elapsed = time.perf_counter_ns() - started
+            latencies = [batch / number * 1e9 for batch in batches]
+            results["{}/{}".format(name, label)] = summarize(latencies, elapsed, number * repeat)
+    return results
+
+
+def main():
+    args = arguments("Benchmark configuration lookups")
+    report(run(args.quick), args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Runs the benchmarks, each in a fresh interpreter (so the peak RSS belongs to
+a single benchmark), stores the results as JSON and compares them with the
+previous run.
+
+Run from the python3 directory:
+    python3 -m benchmarks.Suite [--results FILE] [--threshold 0.1] [--quick] [benchmark ...]
+
+The results of the previous run are read from --results before it is
+overwritten (use --baseline to compare against another file and --no-save to
+keep the stored results). Exits with 1 if a case got slower by more than the
+threshold.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from python3.benchmarks import measure
+
+defaultBenchmarks = [
+    "InputtypeBenchmark",
+    "FilesBenchmark",
+    "ResultsBenchmark",
+    "RouterBenchmark",
+    "StructBenchmark",
+    "ImportTimeBenchmark",
+]
+
+# directory containing the python3 package
+rootDirectory = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+defaultResults = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results.json")
+
+
+def runBenchmark(name, quick=False):
+    """
+    Run benchmarks.<name> in a new interpreter and return its results.
+    """
+    fd, path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = rootDirectory + os.pathsep + env.get("PYTHONPATH", "")
+        command = [sys.executable, "-m", "python3.benchmarks." + name, "--json", path]
+        if quick:
+            command.append("--quick")
+        subprocess.run(command, cwd=rootDirectory, env=env, stdout=subprocess.DEVNULL, check=True)
+        return measure.load(path)
+    finally:
+        os.remove(path)
+
+
+def run(benchmarks=defaultBenchmarks, quick=False):
+    """
+    Returns a dict mapping each benchmark to its results.
+    """
+    results = {}
+    for name in benchmarks:
+        print("running", name, file=sys.stderr)
+        results[name] = runBenchmark(name, quick)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmarks and compare with the previous run")
+    parser.add_argument("benchmarks", nargs="*", default=defaultBenchmarks)
+    parser.add_argument("--results", default=defaultResults, help="results file, the previous run is read from it")
+    parser.add_argument("--baseline", help="compare against this file instead of --results")
+    parser.add_argument("--no-save", action="store_true", help="do not overwrite --results")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change that is reported")
+    parser.add_argument("--quick", action="store_true", help="small inputs, for smoke testing")
+    args = parser.parse_args()
+
+    baseline = args.baseline or args.results
+    previous = measure.load(baseline) if os.path.isfile(baseline) else {}
+    results = run(args.benchmarks, args.quick)
+    for name, cases in results.items():
+        print("\n" + name)
+        measure.report(cases)
+
+    regressions = 0
+    changes = measure.compare(previous, results, args.threshold)
+    if changes:
+        print("\nchanges against {}:".format(baseline))
+    for benchmark, case, metric, old, new, change in changes:
+        print("{:<20s} {:<34s} {:<12s} {:>14.2f} -> {:>14.2f} ({:+.0%})".format(
+            benchmark, case, metric, old, new, change))
+        regressions += change < 0
+
+    if not args.no_save:
+        merged = dict(previous) if baseline == args.results else {}
+        merged.update(results)
+        measure.save(args.results, merged)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
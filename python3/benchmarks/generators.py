@@ -0,0 +1,90 @@
+"""
+Synthetic, reproducible inputs of the benchmarks. Every generator takes a
+seed, the same arguments always produce the same data.
+"""
+import ipaddress
+import os
+import random
+
+
+def indicatorFeed(count, seed=0):
+    """
+    Returns a list of count indicator strings as found in threat feeds: IPv4
+    and IPv6 addresses (public and non-public), networks, domains, email
+    addresses and invalid lines.
+    """
+    rand = random.Random(seed)
+    tlds = ["com", "net", "org", "de", "io", "info"]
+
+    def label():
+        return "".join(rand.choice("abcdefghijklmnopqrstuvwxyz0123456789-")
+                       for _ in range(rand.randint(1, 12))).strip("-") or "x"
+
+    def domain():
+        return ".".join(label() for _ in range(rand.randint(1, 3))) + "." + rand.choice(tlds)
+
+    def ipv4():
+        return str(ipaddress.IPv4Address(rand.getrandbits(32)))
+
+    kinds = [
+        (30, ipv4),
+        (5,  lambda: "10.{}.{}.{}".format(rand.randrange(256), rand.randrange(256), rand.randrange(256))),
+        (10, lambda: str(ipaddress.IPv6Address(rand.getrandbits(128)))),
+        (10, lambda: "{}/{}".format(ipv4(), rand.randint(8, 32))),
+        (25, domain),
+        (15, lambda: "{} <{}@{}>".format(label(), label(), domain()) if rand.random() < 0.3
+             else "{}@{}".format(label(), domain())),
+        (5,  lambda: rand.choice(["", "not an indicator", "300.1.2.3", "a..b", "-.com"])),
+    ]
+    weights = [weight for weight, _ in kinds]
+    makers = [maker for _, maker in kinds]
+    return [rand.choices(makers, weights)[0]() for _ in range(count)]
+
+
+def sparseFile(path, size, needles=16, seed=0):
+    """
+    Create a sparse file of size bytes at path (only the needles occupy disk
+    space, so multi-GB files are cheap) and write needles at random
+    positions.
+
+    Returns the sorted list of (position, needle) pairs.
+    """
+    rand = random.Random(seed)
+    placed = []
+    with open(path, "wb") as f:
+        f.truncate(size)
+        for i in range(needles):
+            needle = "NEEDLE-{:04d}".format(i).encode()
+            position = rand.randrange(size - len(needle))
+            f.seek(position)
+            f.write(needle)
+            placed.append((position, needle))
+    placed.sort()
+    # later needles may overwrite earlier ones, keep the intact ones
+    with open(path, "rb") as f:
+        intact = []
+        for position, needle in placed:
+            f.seek(position)
+            if f.read(len(needle)) == needle:
+                intact.append((position, needle))
+    return intact
+
+
+def resultPaths(depth, width, seed=0):
+    """
+    Returns the argument tuples of ServiceResultSet.add building a tree of
+    the given depth where every inner node has width children, each tuple is
+    the path of keys to a leaf followed by its value.
+    """
+    rand = random.Random(seed)
+    paths = [()]
+    for level in range(depth):
+        paths = [path + ("level{}-{}".format(level, i),) for path in paths for i in range(width)]
+    return [path + (rand.random(),) for path in paths]
+
+
+def removeFile(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
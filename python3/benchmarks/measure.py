@@ -0,0 +1,126 @@
+"""
+Shared helpers of the benchmarks: timing of individual operations, peak
+memory, JSON results and the comparison of two runs.
+
+Every benchmark module provides run(quick=False) returning a dict mapping
+case names to the dict created by measure(), and a main() accepting --json
+and --quick (see arguments()).
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+
+
+def measure(operation, inputs, warmup=100):
+    """
+    Call operation(input) for every entry of inputs, timing each call.
+
+    Returns a dict with the number of operations, operations per second,
+    p50/p99 latency in microseconds and the peak RSS of the process in MB.
+    """
+    inputs = list(inputs)
+    for _input in inputs[:warmup]:
+        operation(_input)
+    clock = time.perf_counter_ns
+    latencies = []
+    append = latencies.append
+    started = clock()
+    for _input in inputs:
+        start = clock()
+        operation(_input)
+        append(clock() - start)
+    return summarize(latencies, clock() - started)
+
+
+def summarize(latencies, elapsed, count=None):
+    """
+    Build a result of measure() from per operation latencies and the total
+    elapsed time, both in nanoseconds. Operations too short to be timed one
+    by one are timed in batches, latencies are then the mean per batch and
+    count the total number of operations.
+    """
+    latencies = sorted(latencies)
+    if len(latencies) == 0:
+        raise ValueError("no operations measured")
+    if count is None:
+        count = len(latencies)
+    return {
+        "ops":        count,
+        "ops_per_sec": count / (elapsed / 1e9) if elapsed else float("inf"),
+        "p50_us":     latencies[(len(latencies) - 1) // 2] / 1000.0,
+        "p99_us":     latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] / 1000.0,
+        "peak_rss_mb": peakRSS(),
+    }
+
+
+def peakRSS():
+    """
+    Peak resident set size of the process in MB. Run every benchmark in its
+    own process (as the Suite does) to attribute it to a single benchmark.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return rss / (1024.0 * 1024.0)  # bytes on macOS, KB elsewhere
+    return rss / 1024.0
+
+
+def arguments(description):
+    """
+    Parse the common command line arguments of a benchmark module.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--quick", action="store_true", help="small inputs, for smoke testing")
+    return parser.parse_args()
+
+
+def report(results, path=None):
+    """
+    Print the results of a benchmark and write them to path if given.
+    """
+    print("{:<34s} {:>10s} {:>14s} {:>10s} {:>10s} {:>10s}".format(
+        "case", "ops", "ops/sec", "p50 [us]", "p99 [us]", "rss [MB]"))
+    for case, result in sorted(results.items()):
+        print("{:<34s} {:>10d} {:>14.1f} {:>10.2f} {:>10.2f} {:>10.1f}".format(
+            case, result["ops"], result["ops_per_sec"], result["p50_us"],
+            result["p99_us"], result["peak_rss_mb"]))
+    if path:
+        save(path, results)
+
+
+def save(path, results):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(previous, current, threshold=0.1):
+    """
+    Compare two results of the Suite ({benchmark: {case: result}}).
+
+    Returns a list of (benchmark, case, metric, previous, current, change)
+    tuples for every ops/sec and p99 value which changed by more than
+    threshold (relative), change is positive for improvements.
+    """
+    changes = []
+    for benchmark, cases in sorted(current.items()):
+        for case, result in sorted(cases.items()):
+            before = previous.get(benchmark, {}).get(case)
+            if before is None:
+                continue
+            for metric, higherIsBetter in (("ops_per_sec", True), ("p99_us", False)):
+                old, new = before.get(metric), result.get(metric)
+                if not old or new is None:
+                    continue
+                change = (new - old) / old
+                if not higherIsBetter:
+                    change = -change
+                if abs(change) > threshold:
+                    changes.append((benchmark, case, metric, old, new, change))
+    return changes
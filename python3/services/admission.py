@@ -0,0 +1,257 @@
+# imports for tornado
+import tornado
+from tornado import gen, web
+from tornado.concurrent import Future
+
+# imports for queueing
+import datetime
+import heapq
+import itertools
+import time
+
+
+DEFAULT_PRIORITIES = {
+    "high":   0,
+    "normal": 1,
+    "low":    2,
+}
+
+
+class AdmissionController(object):
+    """
+    Bounds the amount of work an endpoint accepts at once.
+
+    Up to max_inflight requests are processed concurrently, up to max_queue
+    further requests wait for a free slot. Waiting requests are served by
+    priority class first and by arrival second. Anything beyond that is shed
+    with a "503 Service Unavailable" response carrying a Retry-After header.
+
+    Clients choose a priority class via the "priority" request parameter or the
+    "X-Priority" header (unknown classes fall back to the default class) and
+    can announce a deadline via the "X-Deadline" header (unix timestamp in
+    seconds). Requests whose deadline has passed, either on arrival or while
+    queued, are dropped with a "504 Deadline Exceeded" response. The deadline
+    is available to the handler as self.deadline (None if not given), so it
+    can be passed on to downstream calls.
+
+    Usage:
+        admission = {
+            "analyze": AdmissionController(max_inflight=4, max_queue=32),
+        }
+        router = Router(metadata=m, handlers=handlers, admission=admission)
+    """
+
+    def __init__(self, max_inflight=16, max_queue=64, priorities=DEFAULT_PRIORITIES,
+            default_priority="normal", priority_argument="priority",
+            priority_header="X-Priority", deadline_header="X-Deadline",
+            retry_after=1):
+        """
+        Parameters:
+            max_inflight      - Int:    Maximum number of concurrently processed requests
+            max_queue         - Int:    Maximum number of requests waiting for a slot
+            priorities        - Dict:   Priority class names mapped to their rank (lower is served first)
+            default_priority  - String: Class used if the request does not specify a known one
+            priority_argument - String: Request parameter selecting the priority class
+            priority_header   - String: Header selecting the priority class
+            deadline_header   - String: Header containing the client deadline (unix timestamp)
+            retry_after       - Int:    Seconds suggested to shed clients before retrying
+        """
+        if default_priority not in priorities:
+            raise ValueError("Invalid parameter supplied to AdmissionController(default_priority), {} is not a known priority class".format(default_priority))
+        self.max_inflight      = max_inflight
+        self.max_queue         = max_queue
+        self.priorities        = dict(priorities)
+        self.default_priority  = default_priority
+        self.priority_argument = priority_argument
+        self.priority_header   = priority_header
+        self.deadline_header   = deadline_header
+        self.retry_after       = retry_after
+
+        self.inflight = 0
+        self.waiting  = 0
+        self.queue    = []
+        self.counter  = itertools.count()
+
+        self.admitted = 0
+        self.shed     = 0
+        self.expired  = 0
+
+    def priority(self, name):
+        """
+        Returns the rank of the given priority class name.
+        """
+        return self.priorities.get(name, self.priorities[self.default_priority])
+
+    async def admit(self, priority=None, deadline=None, waiter=None):
+        """
+        Wait for a free slot.
+
+        Returns (True, None) once the caller holds a slot, which must be given
+        back by calling release(). Otherwise no slot is held and either
+        (False, 503) is returned if the request was shed because the queue is
+        full, (False, 504) if its deadline passed, or (False, None) if the
+        waiter was abandoned (see abandon(waiter)).
+
+        An optional tornado Future can be supplied as waiter, it allows to
+        abandon the request while it is queued.
+        """
+        if priority is None:
+            priority = self.priority(self.default_priority)
+        if deadline is not None and deadline <= time.time():
+            self.expired += 1
+            return False, 504
+
+        if self.inflight < self.max_inflight and self.waiting == 0:
+            self.inflight += 1
+            self.admitted += 1
+            return True, None
+
+        if self.waiting >= self.max_queue:
+            self.shed += 1
+            return False, 503
+
+        if waiter is None:
+            waiter = Future()
+        heapq.heappush(self.queue, (priority, next(self.counter), waiter))
+        self.waiting += 1
+        try:
+            if deadline is None:
+                admitted = await waiter
+            else:
+                timeout = datetime.timedelta(seconds=max(0, deadline - time.time()))
+                admitted = await gen.with_timeout(timeout, waiter)
+        except gen.TimeoutError:
+            if not self.abandon(waiter):
+                self.expired += 1
+                return False, 504
+            admitted = True
+        if not admitted:
+            return False, None
+        self.admitted += 1
+        return True, None
+
+    def abandon(self, waiter):
+        """
+        Remove a waiter from the queue (e.g. because its client disconnected).
+        Returns True if the waiter was already granted a slot in the meantime.
+        """
+        if waiter.done():
+            return waiter.result()
+        waiter.set_result(False)
+        self.waiting -= 1
+        # abandoned entries are skipped lazily by release(), compact the heap
+        # if they start to pile up
+        if len(self.queue) > 2 * (self.waiting + 1):
+            self.queue = [entry for entry in self.queue if not entry[2].done()]
+            heapq.heapify(self.queue)
+        return False
+
+    def release(self):
+        """
+        Give back a slot, handing it over to the most important waiter if any.
+        """
+        if self.inflight <= self.max_inflight:
+            while self.queue:
+                _, _, waiter = heapq.heappop(self.queue)
+                if not waiter.done():
+                    self.waiting -= 1
+                    waiter.set_result(True)
+                    return
+        self.inflight -= 1
+
+    def resize(self, max_inflight=None, max_queue=None):
+        """
+        Adjust the limits at runtime. Shrinking takes effect as in-flight
+        requests finish, growing immediately admits queued requests.
+        """
+        if max_queue is not None:
+            self.max_queue = max_queue
+        if max_inflight is not None:
+            self.max_inflight = max_inflight
+            while self.inflight < self.max_inflight and self.waiting > 0:
+                self.inflight += 1
+                self.release()
+
+    def stats(self):
+        return {
+            "inflight": self.inflight,
+            "waiting":  self.waiting,
+            "admitted": self.admitted,
+            "shed":     self.shed,
+            "expired":  self.expired,
+        }
+
+
+class AdmissionMixin(object):
+    """
+    Request handler mixin enforcing the admission control of the class
+    attribute `admission` before the actual prepare() of the handler runs.
+    Do not use directly, see CreateAdmissionHandler(handler, controller).
+    """
+    admission = None
+    deadline  = None
+
+    _admission_slot   = False
+    _admission_waiter = None
+
+    async def prepare(self):
+        controller = self.admission
+
+        name = self.get_query_argument(controller.priority_argument, None)
+        if name is None:
+            name = self.request.headers.get(controller.priority_header)
+        priority = controller.priority(name)
+
+        deadline = self.request.headers.get(controller.deadline_header)
+        if deadline is not None:
+            try:
+                self.deadline = float(deadline)
+            except ValueError:
+                raise tornado.web.HTTPError(400, "Invalid {} header: {}".format(controller.deadline_header, deadline), reason="Bad Deadline")
+
+        self._admission_waiter = Future()
+        self._admission_slot, status = await controller.admit(priority, self.deadline, self._admission_waiter)
+        if not self._admission_slot:
+            if status == 504:
+                self.__reject(504, "Deadline Exceeded")
+            elif status == 503:
+                self.set_header("Retry-After", str(controller.retry_after))
+                self.__reject(503, "Service Overloaded")
+            else:
+                # client went away while queued
+                self.finish()
+            return
+
+        result = super().prepare()
+        if result is not None:
+            await result
+
+    def __reject(self, status, reason):
+        self.set_status(status, reason=reason)
+        self.finish("{:d}: {:s}".format(status, reason))
+
+    def on_finish(self):
+        self.__release()
+        super().on_finish()
+
+    def on_connection_close(self):
+        # only a queued request is dropped here, an admitted one keeps its
+        # slot until the handler has finished (on_finish), its work is still
+        # running after the client went away
+        if self._admission_waiter is not None and not self._admission_waiter.done():
+            self.admission.abandon(self._admission_waiter)
+        super().on_connection_close()
+
+    def __release(self):
+        if self._admission_slot:
+            self._admission_slot = False
+            self.admission.release()
+
+
+def CreateAdmissionHandler(handler, controller):
+    """
+    Wrap a tornado.web.RequestHandler class so that every request it receives
+    passes the given AdmissionController first. The handler code itself stays
+    untouched.
+    """
+    return type(handler.__name__, (AdmissionMixin, handler), {"admission": controller})
@@ -0,0 +1,108 @@
+# imports for tornado
+import tornado
+from tornado import web
+
+# imports for compression
+import zlib
+
+
+def CreateCompressionTransform(min_length=1024, level=6, brotli_quality=5):
+    """
+    Create a tornado output transform compressing responses.
+
+    The encoding is negotiated via the Accept-Encoding header of the request,
+    brotli ("br") is preferred over gzip if the brotli package is installed and
+    the client accepts both equally. Only text and common structured data
+    (json, xml, javascript) responses are compressed, single chunk responses
+    below min_length bytes are sent as they are.
+
+    Parameters:
+        min_length     - Int: Minimum size in bytes of a response to be compressed
+        level          - Int: gzip compression level (1-9)
+        brotli_quality - Int: brotli compression quality (0-11)
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None  # optional dependency
+    encodings = ["gzip"]
+    if brotli is not None:
+        encodings.insert(0, "br")
+    negotiate = __negotiate  # avoid name mangling inside the class
+
+    class CompressionTransform(tornado.web.OutputTransform):
+        CONTENT_TYPES = tornado.web.GZipContentEncoding.CONTENT_TYPES | {
+            "application/x-ndjson",
+        }
+
+        def __init__(self, request):
+            self.encoding = negotiate(request.headers.get("Accept-Encoding", ""), encodings)
+            self.compressor = None
+
+        def transform_first_chunk(self, status_code, headers, chunk, finishing):
+            if "Vary" in headers:
+                headers["Vary"] += ", Accept-Encoding"
+            else:
+                headers["Vary"] = "Accept-Encoding"
+            if self.encoding:
+                ctype = headers.get("Content-Type", "").split(";")[0]
+                if not (ctype.startswith("text/") or ctype in self.CONTENT_TYPES):
+                    self.encoding = None
+                elif finishing and len(chunk) < min_length:
+                    self.encoding = None
+                elif "Content-Encoding" in headers:
+                    self.encoding = None
+            if self.encoding:
+                headers["Content-Encoding"] = self.encoding
+                if self.encoding == "br":
+                    self.compressor = brotli.Compressor(quality=brotli_quality)
+                else:
+                    self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+                chunk = self.transform_chunk(chunk, finishing)
+                if "Content-Length" in headers:
+                    # the original content length is no longer correct, fall
+                    # back to chunked encoding unless this is the only chunk
+                    if finishing:
+                        headers["Content-Length"] = str(len(chunk))
+                    else:
+                        del headers["Content-Length"]
+            return status_code, headers, chunk
+
+        def transform_chunk(self, chunk, finishing):
+            if self.compressor is None:
+                return chunk
+            if self.encoding == "br":
+                data = self.compressor.process(chunk)
+                data += self.compressor.finish() if finishing else self.compressor.flush()
+            else:
+                data = self.compressor.compress(chunk)
+                data += self.compressor.flush(zlib.Z_FINISH if finishing else zlib.Z_SYNC_FLUSH)
+            return data
+
+    return CompressionTransform
+
+
+def __negotiate(header, encodings):
+    """
+    Pick the supported encoding with the highest quality value from an
+    Accept-Encoding header, earlier entries of encodings win ties.
+    Returns None if none of them is acceptable.
+    """
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    best, bestQuality = None, 0.0
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > bestQuality:
+            best, bestQuality = encoding, quality
+    return best
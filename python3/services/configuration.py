@@ -1,13 +1,26 @@
 import json
-from python3.tools.structs import StructDict
-from tornado.web import HTTPError
+import copy
+import os
+from python3.tools.structs import StructDict, FrozenStructDict, CompileStruct
+from python3.services.schema import ApplySchema
+from python3.tools.imports import LazyModule
 
-def ParseConfig(config, path="service.conf", data=None):
+# tornado is only needed on errors and for watching, do not load it up front
+web    = LazyModule("tornado.web")
+ioloop = LazyModule("tornado.ioloop")
+log    = LazyModule("tornado.log")
+
+def ParseConfig(config, path="service.conf", data=None, schema=None):
     """
     Try opening the path, reading it all in and parsing it as json.
     If an error occures, throw a tornado.web.HTTPError (well defined
     behaviour by tornado for these).
     If parsing succeeds, update provided config dictionary.
+
+    An optional schema (see python3.services.schema.Field) declares typed
+    values. These are validated and converted once, right here (e.g. "16MB"
+    to 16777216), and may deviate from the type of their default. Invalid
+    values raise a ValueError.
     """
     if not isinstance(config, dict):
         raise ValueError("Invalid parameter supplied to ParseConfig(config), given {}, but expects a dict".format(type(config)))
@@ -18,16 +31,18 @@ def ParseConfig(config, path="service.conf", data=None):
                 try:
                     loaded_config = json.loads(file.read())
                 except Exception as e:
-                    raise HTTPError(500, "Error parsing config file: {}".format(e), reason="Bad Service Configuration")
+                    raise web.HTTPError(500, "Error parsing config file: {}".format(e), reason="Bad Service Configuration")
         except Exception as e:
-            raise HTTPError(500, "Error opening config file: {}".format(e), reason="Bad Service Configuration")
+            raise web.HTTPError(500, "Error opening config file: {}".format(e), reason="Bad Service Configuration")
     else:
         try:
             loaded_config = json.loads(data)
         except Exception as e:
-            raise HTTPError(500, "Error parsing config input: {}".format(e), reason="Bad Service Configuration")
+            raise web.HTTPError(500, "Error parsing config input: {}".format(e), reason="Bad Service Configuration")
 
-    __updateDict(config, loaded_config)
+    __updateDict(config, loaded_config, schema)
+    if schema is not None:
+        ApplySchema(config, schema)
     return StructDict(config)
 
 def __toLower(key):
@@ -35,10 +50,13 @@ def __toLower(key):
         return key.lower()
     return key
 
-def __updateDict(old, new):
+def __updateDict(old, new, schema=None):
     keymap = {}
     for key in old:
         keymap[__toLower(key)] = key
+    schemamap = {}
+    for key in (schema or {}):
+        schemamap[__toLower(key)] = schema[key]
 
     for key in new:
         _key = __toLower(key)
@@ -49,7 +67,12 @@ def __updateDict(old, new):
             if isinstance(ofrag, dict):
                 if not isinstance(nfrag, dict):
                     raise ValueError("Mismatching config, expected dict, got: {}".format(type(nfrag)))
-                __updateDict(ofrag, nfrag)
+                nested = schemamap.get(_key)
+                __updateDict(ofrag, nfrag, nested if isinstance(nested, dict) else None)
+
+            elif _key in schemamap:
+                # typed by the schema, validated by ApplySchema
+                old[keymap[_key]] = nfrag
 
             else:
                 # other entries are replaced if their types match
@@ -61,6 +84,113 @@ def __updateDict(old, new):
 ParseConfiguration = ParseConfig
 
 
+class ConfigWatcher(object):
+    """
+    Reloads a configuration file whenever it changes.
+
+    The file is polled for changes (modification time, size, inode) from the
+    tornado IOLoop. Every reload parses the file on top of a fresh copy of the
+    default config using the same rules as ParseConfig. If that succeeds, the
+    current snapshot (an immutable FrozenStructDict) is swapped for the new one
+    and all subscribed callbacks are called with (new, old). A broken file is
+    logged and ignored, the previous snapshot stays active.
+
+    Always access the configuration through watcher.config (and keep the
+    reference only for the duration of a request), so updates get picked up.
+
+    Usage:
+        watcher = ConfigWatcher(config, "service.conf")
+        watcher.subscribe(lambda new, old: controller.resize(new.maxinflight))
+        watcher.start()
+        router.ListenAndServe(watcher.config.port)
+    """
+
+    def __init__(self, config, path="service.conf", interval=1.0, compiled=False, schema=None):
+        """
+        Parameters:
+            config   - Dict:   Default configuration (see ParseConfig), it is not modified
+            path     - String: Path of the configuration file
+            interval - Float:  Seconds between checks for modifications
+            compiled - Bool:   Publish snapshots compiled by CompileStruct instead
+                               of FrozenStructDicts (faster attribute access,
+                               lowercase attribute names only)
+            schema   - Dict:   Typed values, see ParseConfig
+        Raises
+            HTTPError, ValueError - if the initial configuration is invalid
+        """
+        if not isinstance(config, dict):
+            raise ValueError("Invalid parameter supplied to ConfigWatcher(config), given {}, but expects a dict".format(type(config)))
+        self.defaults  = copy.deepcopy(config)
+        self.path      = path
+        self.interval  = interval
+        self.compiled  = compiled
+        self.schema    = schema
+        self.callbacks = []
+        self.periodic  = None
+        self.version   = self.__stat()
+        self.config    = self.__load()
+
+    def subscribe(self, callback):
+        """
+        Register callback(new, old) to be called after every successful reload.
+        """
+        self.callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        self.callbacks.remove(callback)
+
+    def start(self):
+        """
+        Start watching the file on the current IOLoop.
+        """
+        if self.periodic is None:
+            self.periodic = ioloop.PeriodicCallback(self.check, self.interval * 1000)
+            self.periodic.start()
+
+    def stop(self):
+        if self.periodic is not None:
+            self.periodic.stop()
+            self.periodic = None
+
+    def check(self):
+        """
+        Reload the configuration if the file changed.
+        Returns True if a new configuration got activated.
+        """
+        try:
+            version = self.__stat()
+        except OSError:
+            return False  # e.g. the file is being replaced right now
+        if version == self.version:
+            return False
+        self.version = version
+
+        try:
+            config = self.__load()
+        except Exception as e:
+            log.app_log.error("Ignoring invalid configuration %s: %s", self.path, e)
+            return False
+
+        old, self.config = self.config, config
+        for callback in list(self.callbacks):
+            try:
+                callback(config, old)
+            except Exception:
+                log.app_log.error("Exception in configuration callback %r", callback, exc_info=True)
+        return True
+
+    def __stat(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def __load(self):
+        config = copy.deepcopy(self.defaults)
+        ParseConfig(config, self.path, schema=self.schema)
+        if self.compiled:
+            return CompileStruct(config)
+        return FrozenStructDict(config)
+
+
 class Metadata(object):
     def __init__(self, name, version, description, copyright, license):
         self.name = name
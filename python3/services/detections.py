@@ -0,0 +1,214 @@
+# Imports for the columns
+import ipaddress
+import sys
+from array import array
+
+from python3.services.inputtype import Detect, Email, Errors, Types
+
+
+"""
+Exported classes. For public use
+"""
+
+class StringTable(object):
+    """
+    Interns strings: equal strings are stored once and referred to by their
+    index. Used by DetectionBatch for domains, users, names and paths, and by
+    inputtype.ParseEmails(table=...) to share the user and domain strings of the
+    parsed addresses.
+
+    Usage:
+        table = StringTable()
+        i = table.add("example.com")
+        table[i]                      # "example.com"
+        table.intern("example.com")   # the stored str object
+    """
+    __slots__ = ["strings", "index"]
+
+    def __init__(self):
+        self.strings = []
+        self.index   = {}
+
+    def add(self, s):
+        """
+        Returns the index of s, adding it if necessary.
+        """
+        i = self.index.get(s)
+        if i is None:
+            i = self.index[s] = len(self.strings)
+            self.strings.append(s)
+        return i
+
+    def intern(self, s):
+        """
+        Returns the stored string equal to s, adding s if necessary.
+        """
+        return self.strings[self.add(s)]
+
+    def __getitem__(self, i):
+        return self.strings[i]
+
+    def __len__(self):
+        return len(self.strings)
+
+    def memoryUsage(self):
+        """
+        Approximate memory used by the table in bytes.
+        """
+        return (sys.getsizeof(self.strings) + sys.getsizeof(self.index) +
+            sum(sys.getsizeof(s) for s in self.strings))
+
+
+class DetectionBatch(object):
+    """
+    Column store for large numbers of Detect results. Every result takes a
+    fixed 32 bytes in the columns below, strings are stored once in a shared
+    StringTable. Results are turned back into the (type, object, error)
+    tuples of Detect on access.
+
+    Columns (array.array, one entry per result):
+        types     - 'B': Types value, 0 for None (empty input)
+        errors    - 'B': Errors value, 0 for None
+        versions  - 'B': IP version (4 or 6) of IPs, networks and email IPs
+        prefixes  - 'B': prefix length of networks
+        iphigh    - 'Q': upper 64 bits of the IP / network address
+        iplow     - 'Q': lower 64 bits of the IP / network address
+        strings   - 'i': StringTable index of the domain, email domain or file
+        users     - 'i': StringTable index of the email user
+        names     - 'i': StringTable index of the email full name
+    String indices are -1 if not set. The columns support the buffer
+    protocol, e.g. numpy.frombuffer(batch.types, dtype=numpy.uint8).
+
+    Usage:
+        batch = DetectionBatch()
+        batch.extend(open("indicators.txt"))
+        for t, obj, err in batch:
+            ...
+        t, obj, err = batch[42]
+    """
+    __slots__ = ["types", "errors", "versions", "prefixes", "iphigh", "iplow",
+                 "strings", "users", "names", "table"]
+
+    def __init__(self, table=None):
+        self.types    = array("B")
+        self.errors   = array("B")
+        self.versions = array("B")
+        self.prefixes = array("B")
+        self.iphigh   = array("Q")
+        self.iplow    = array("Q")
+        self.strings  = array("i")
+        self.users    = array("i")
+        self.names    = array("i")
+        self.table    = table if table is not None else StringTable()
+
+    def append(self, _input):
+        """
+        Detect the type of _input (see inputtype.Detect) and store the result.
+        """
+        t, obj, err = Detect(_input)
+        self.add(t, obj, err)
+
+    def extend(self, inputs):
+        """
+        Detect and store every entry of inputs, trailing line breaks are
+        removed (so an open file can be passed).
+        """
+        for _input in inputs:
+            if isinstance(_input, bytes):
+                _input = _input.decode()
+            self.append(_input.rstrip("\r\n"))
+
+    def add(self, t, obj, err):
+        """
+        Store a result as returned by inputtype.Detect.
+        """
+        version = prefix = high = low = 0
+        string = user = name = -1
+        if t == Types.IP or t == Types.IPNet:
+            version, prefix, high, low = self.__packIP(obj)
+        elif t == Types.Email:
+            user = self.table.add(obj.user)
+            name = self.table.add(obj.fullname)
+            if obj.domain is not None:
+                string = self.table.add(obj.domain)
+            if obj.ip is not None:
+                version, prefix, high, low = self.__packIP(obj.ip)
+        elif t == Types.Domain or t == Types.File:
+            string = self.table.add(obj)
+
+        self.types.append(t.value if t is not None else 0)
+        self.errors.append(err.value if err is not None else 0)
+        self.versions.append(version)
+        self.prefixes.append(prefix)
+        self.iphigh.append(high)
+        self.iplow.append(low)
+        self.strings.append(string)
+        self.users.append(user)
+        self.names.append(name)
+
+    def type(self, i):
+        """
+        Returns the Types member (or None) of result i without building the
+        parsed object.
+        """
+        code = self.types[i]
+        return Types(code) if code else None
+
+    def error(self, i):
+        """
+        Returns the Errors member (or None) of result i.
+        """
+        code = self.errors[i]
+        return Errors(code) if code else None
+
+    def __getitem__(self, i):
+        t, err = self.type(i), self.error(i)
+        obj = None
+        if t == Types.IP:
+            obj = self.__ip(i)
+        elif t == Types.IPNet:
+            obj = ipaddress.ip_network((self.__ip(i), self.prefixes[i]))
+        elif t == Types.Email:
+            domain = self.table[self.strings[i]] if self.strings[i] >= 0 else None
+            ip = self.__ip(i) if self.versions[i] else None
+            obj = Email(self.table[self.names[i]], self.table[self.users[i]], domain, ip)
+        elif t == Types.Domain or t == Types.File:
+            obj = self.table[self.strings[i]]
+        return t, obj, err
+
+    @staticmethod
+    def __packIP(obj):
+        # returns version, prefix length, upper and lower 64 bits of an ip
+        # address or network
+        if isinstance(obj, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+            prefix = obj.prefixlen
+            value = int(obj.network_address)
+        else:
+            prefix = 0
+            value = int(obj)
+        return obj.version, prefix, value >> 64, value & 0xFFFFFFFFFFFFFFFF
+
+    def __ip(self, i):
+        value = (self.iphigh[i] << 64) | self.iplow[i]
+        if self.versions[i] == 4:
+            return ipaddress.IPv4Address(value)
+        return ipaddress.IPv6Address(value)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self[i]
+
+    def memoryUsage(self, table=True):
+        """
+        Approximate memory used by the batch in bytes, including the string
+        table unless table is False (e.g. if it is shared).
+        """
+        size = sum(sys.getsizeof(column) for column in (
+            self.types, self.errors, self.versions, self.prefixes,
+            self.iphigh, self.iplow, self.strings, self.users, self.names))
+        if table:
+            size += self.table.memoryUsage()
+        return size
@@ -0,0 +1,395 @@
+# Imports for the columns
+import numpy
+
+# Imports for classification
+import hashlib
+import ipaddress
+from python3.services.inputtype import Detect, Email, Types
+
+# Imports for spilling and persistence
+import json
+import os
+import struct
+import tempfile
+
+
+"""
+Exported classes. For public use
+"""
+
+IPV6_DTYPE = numpy.dtype([("hi", "<u8"), ("lo", "<u8")])
+KINDS = ("ipv4", "ipv6", "domain", "email")
+
+class IndicatorSet(object):
+    """
+    Set of indicators (IPs, domains and email addresses) supporting fast
+    union, intersection and difference of large sets, e.g. to find the
+    indicators that are new since yesterday:
+
+        today = IndicatorSet()
+        today.update(open("indicators.txt"))
+        yesterday = IndicatorSet.load("yesterday.set")
+        for indicator in today - yesterday:
+            ...
+        today.save("today.set")
+
+    Indicators are classified with inputtype.Detect (ipaddress objects and
+    inputtype.Email are accepted as well), anything other than an IP, a
+    domain or an email address is rejected. IPv4 and IPv6 addresses are
+    stored as integers in sorted numpy arrays. Domains (lower case) and
+    email addresses (domain in lower case) are stored as sorted 64 bit
+    blake2b fingerprints, the strings themselves in a shared byte heap. Set
+    operations compare fingerprints only, membership tests compare the
+    strings as well.
+
+    Columns larger than max_memory_size (MB) are moved to memory-mapped
+    files in the spill directory (the system default if spill is True), so
+    huge sets are paged by the operating system instead of occupying RAM.
+    Sets loaded via load(path) map the saved file directly and are
+    available without reparsing.
+
+    Parameters:
+        spill           - String/Bool: spill directory, True for the system
+                          default temporary directory, False to never spill
+        max_memory_size - Int: size in MB from which columns are spilled
+    """
+    __slots__ = ["spill", "max_memory_size", "_columns", "_pending"]
+
+    def __init__(self, indicators=None, spill=False, max_memory_size=256):
+        self.spill = spill
+        self.max_memory_size = max_memory_size
+        self._columns = {
+            "ipv4":          numpy.empty(0, numpy.uint32),
+            "ipv6":          numpy.empty(0, IPV6_DTYPE),
+            "domain":        numpy.empty(0, numpy.uint64),
+            "domain.start":  numpy.empty(0, numpy.uint64),
+            "domain.length": numpy.empty(0, numpy.uint32),
+            "email":         numpy.empty(0, numpy.uint64),
+            "email.start":   numpy.empty(0, numpy.uint64),
+            "email.length":  numpy.empty(0, numpy.uint32),
+            "heap":          numpy.empty(0, numpy.uint8),
+        }
+        self._pending = {kind: set() for kind in KINDS}
+        if indicators is not None:
+            self.update(indicators)
+
+    def add(self, indicator):
+        """
+        Add an indicator (str, bytes, int, ipaddress address or Email).
+        Returns True if it was accepted and False if it is neither an IP, a
+        domain nor an email address.
+        """
+        kind, value = self.__classify(indicator)
+        if kind is None:
+            return False
+        self._pending[kind].add(value)
+        return True
+
+    def update(self, indicators):
+        """
+        Add every entry of indicators (trailing line breaks are removed, so an
+        open file can be passed). Returns the number of accepted indicators.
+        """
+        accepted = 0
+        for indicator in indicators:
+            if isinstance(indicator, bytes):
+                indicator = indicator.decode()
+            if isinstance(indicator, str):
+                indicator = indicator.rstrip("\r\n")
+            if self.add(indicator):
+                accepted += 1
+        self.flush()
+        return accepted
+
+    def flush(self):
+        """
+        Merge the indicators added since the last flush into the sorted
+        columns, only indicators new to the set are stored. Called
+        automatically by all operations reading the set.
+        """
+        pending = self._pending
+        if not any(pending.values()):
+            return
+        columns = dict(self._columns)
+        if pending["ipv4"]:
+            values = numpy.array(list(pending["ipv4"]), numpy.uint32)
+            columns["ipv4"] = numpy.union1d(columns["ipv4"], values)
+        if pending["ipv6"]:
+            values = numpy.array([(v >> 64, v & 0xFFFFFFFFFFFFFFFF) for v in pending["ipv6"]], IPV6_DTYPE)
+            columns["ipv6"] = numpy.union1d(columns["ipv6"], values)
+        for kind in ("domain", "email"):
+            if not pending[kind]:
+                continue
+            encoded = [s.encode() for s in pending[kind]]
+            lengths = numpy.array([len(s) for s in encoded], numpy.uint32)
+            starts = numpy.zeros(len(encoded), numpy.uint64)
+            numpy.cumsum(lengths[:-1], out=starts[1:])
+            added = {
+                kind:             numpy.array([_fingerprint(s) for s in encoded], numpy.uint64),
+                kind + ".start":  starts,
+                kind + ".length": lengths,
+            }
+            heap = numpy.frombuffer(b"".join(encoded), numpy.uint8)
+            columns.update(_unionStrings(kind, columns, added, heap))
+        self._pending = {kind: set() for kind in KINDS}
+        self.__setColumns(columns)
+
+    def union(self, other):
+        """
+        Returns a new IndicatorSet containing the indicators of both sets.
+        """
+        self.flush()
+        other.flush()
+        a, b = self._columns, other._columns
+        columns = dict(a)
+        columns["ipv4"] = numpy.union1d(a["ipv4"], b["ipv4"])
+        columns["ipv6"] = numpy.union1d(a["ipv6"], b["ipv6"])
+        for kind in ("domain", "email"):
+            columns.update(_unionStrings(kind, columns, b, b["heap"]))
+        return self.__derive(columns)
+
+    def intersection(self, other):
+        """
+        Returns a new IndicatorSet containing the indicators of this set
+        which are also contained in other.
+        """
+        self.flush()
+        other.flush()
+        a, b = self._columns, other._columns
+        columns = {
+            "ipv4": numpy.intersect1d(a["ipv4"], b["ipv4"], assume_unique=True),
+            "ipv6": numpy.intersect1d(a["ipv6"], b["ipv6"], assume_unique=True),
+            "heap": a["heap"],
+        }
+        for kind in ("domain", "email"):
+            _, indices, _ = numpy.intersect1d(a[kind], b[kind], assume_unique=True, return_indices=True)
+            for name in (kind, kind + ".start", kind + ".length"):
+                columns[name] = a[name][indices]
+        return self.__derive(columns)
+
+    def difference(self, other):
+        """
+        Returns a new IndicatorSet containing the indicators of this set
+        which are not contained in other.
+        """
+        self.flush()
+        other.flush()
+        a, b = self._columns, other._columns
+        columns = {
+            "ipv4": numpy.setdiff1d(a["ipv4"], b["ipv4"], assume_unique=True),
+            "ipv6": numpy.setdiff1d(a["ipv6"], b["ipv6"], assume_unique=True),
+            "heap": a["heap"],
+        }
+        for kind in ("domain", "email"):
+            keep = ~numpy.isin(a[kind], b[kind], assume_unique=True)
+            for name in (kind, kind + ".start", kind + ".length"):
+                columns[name] = a[name][keep]
+        return self.__derive(columns)
+
+    __or__  = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __contains__(self, indicator):
+        # pending indicators are looked up without flushing, so alternating
+        # add() and lookups does not merge the columns on every lookup
+        kind, value = self.__classify(indicator)
+        if kind is None:
+            return False
+        if value in self._pending[kind]:
+            return True
+        column = self._columns[kind]
+        if kind == "ipv6":
+            value = numpy.array((value >> 64, value & 0xFFFFFFFFFFFFFFFF), IPV6_DTYPE)
+        elif kind in ("domain", "email"):
+            encoded = value.encode()
+            value = numpy.uint64(_fingerprint(encoded))
+        i = numpy.searchsorted(column, value)
+        if i >= len(column) or column[i] != value:
+            return False
+        if kind in ("domain", "email"):
+            return self.__string(kind, i) == encoded
+        return True
+
+    def __len__(self):
+        self.flush()
+        return sum(len(self._columns[kind]) for kind in KINDS)
+
+    def counts(self):
+        """
+        Returns a dict with the number of indicators of each kind.
+        """
+        self.flush()
+        return {kind: len(self._columns[kind]) for kind in KINDS}
+
+    def __iter__(self):
+        self.flush()
+        for value in self._columns["ipv4"]:
+            yield str(ipaddress.IPv4Address(int(value)))
+        for hi, lo in self._columns["ipv6"].tolist():
+            yield str(ipaddress.IPv6Address((hi << 64) | lo))
+        for kind in ("domain", "email"):
+            for i in range(len(self._columns[kind])):
+                yield self.__string(kind, i).decode()
+
+    def save(self, path):
+        """
+        Write the set to path (the string heap is compacted first). The file
+        is written next to path and renamed afterwards.
+        """
+        self.flush()
+        columns = _compactHeap(self._columns)
+
+        header = {"version": _FORMAT_VERSION, "columns": {}}
+        offset = 0
+        for name, column in sorted(columns.items()):
+            header["columns"][name] = {
+                "dtype":  column.dtype.descr if column.dtype.names else column.dtype.str,
+                "count":  len(column),
+                "offset": offset,
+            }
+            offset += column.nbytes + (-column.nbytes % 64)
+        encoded = json.dumps(header).encode()
+        start = len(_MAGIC) + 8 + len(encoded)
+        start += -start % 64
+
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(_MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+            f.write(b"\0" * (start - f.tell()))
+            for name, column in sorted(columns.items()):
+                numpy.ascontiguousarray(column).tofile(f)
+                f.write(b"\0" * (-column.nbytes % 64))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, mmap=True, spill=False, max_memory_size=256):
+        """
+        Load a set written by save(path). With mmap the columns are mapped
+        read-only instead of being read into memory.
+
+        Raises a ValueError if the file is not a saved IndicatorSet.
+        """
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError("{}: not an indicator set".format(path))
+            length, = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(length).decode())
+        if header.get("version") != _FORMAT_VERSION:
+            raise ValueError("{}: unsupported version {}".format(path, header.get("version")))
+        start = len(_MAGIC) + 8 + length
+        start += -start % 64
+
+        indicators = cls(spill=spill, max_memory_size=max_memory_size)
+        columns = {}
+        for name, info in header["columns"].items():
+            dtype = info["dtype"]
+            dtype = numpy.dtype([tuple(field) for field in dtype] if isinstance(dtype, list) else dtype)
+            if info["count"] == 0:
+                columns[name] = numpy.empty(0, dtype)
+            elif mmap:
+                columns[name] = numpy.memmap(path, dtype, mode="r", offset=start+info["offset"], shape=(info["count"],))
+            else:
+                columns[name] = numpy.fromfile(path, dtype, count=info["count"], offset=start+info["offset"])
+        if set(columns) != set(indicators._columns):
+            raise ValueError("{}: columns missing".format(path))
+        indicators._columns = columns
+        return indicators
+
+    def __derive(self, columns):
+        result = IndicatorSet(spill=self.spill, max_memory_size=self.max_memory_size)
+        result.__setColumns(columns)
+        return result
+
+    def __setColumns(self, columns):
+        if self.spill is not False:
+            limit = self.max_memory_size * 1024 * 1024
+            directory = None if self.spill is True else self.spill
+            for name, column in columns.items():
+                if column.nbytes >= limit and not isinstance(column, numpy.memmap):
+                    columns[name] = _spill(column, directory)
+        self._columns = columns
+
+    def __string(self, kind, i):
+        start = int(self._columns[kind + ".start"][i])
+        length = int(self._columns[kind + ".length"][i])
+        return self._columns["heap"][start:start+length].tobytes()
+
+    @staticmethod
+    def __classify(indicator):
+        # returns the kind and the normalized value of an indicator
+        if isinstance(indicator, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+            t, obj = Types.IP, indicator
+        elif isinstance(indicator, Email):
+            t, obj = Types.Email, indicator
+        else:
+            t, obj, _ = Detect(indicator)
+        if t == Types.IP:
+            return ("ipv4" if obj.version == 4 else "ipv6"), int(obj)
+        if t == Types.Domain:
+            return "domain", obj.lower()
+        if t == Types.Email:
+            if obj.domain is None:
+                return "email", "{}@[{}]".format(obj.user, obj.ip)
+            return "email", "{}@{}".format(obj.user, obj.domain.lower())
+        return None, None
+
+
+"""
+Private variables and functions. Not for public use.
+"""
+
+_MAGIC = b"HOLMESIS"
+_FORMAT_VERSION = 1
+
+def _fingerprint(encoded):
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "little")
+
+def _unionStrings(kind, a, b, heap):
+    # merge the string columns of kind of b (strings stored in heap) into
+    # those of a, only strings new to a are appended to the heap of a and
+    # entries of a win on equal fingerprints. Returns the merged columns
+    # including the heap
+    keys, first = numpy.unique(b[kind], return_index=True)
+    new = ~numpy.isin(keys, a[kind], assume_unique=True)
+    keys, first = keys[new], first[new]
+    lengths = b[kind + ".length"][first]
+    strings, starts = _gather(heap, b[kind + ".start"][first], lengths)
+    starts += numpy.uint64(len(a["heap"]))
+    keys = numpy.concatenate([a[kind], keys])
+    order = numpy.argsort(keys, kind="stable")
+    return {
+        kind:             keys[order],
+        kind + ".start":  numpy.concatenate([a[kind + ".start"], starts])[order],
+        kind + ".length": numpy.concatenate([a[kind + ".length"], lengths])[order],
+        "heap":           numpy.concatenate([a["heap"], strings]),
+    }
+
+def _gather(heap, starts, lengths):
+    # copy the strings at starts (lengths) out of heap into a new heap,
+    # returns it and the starts of the strings in it
+    lengths = lengths.astype(numpy.uint64)
+    newStarts = numpy.zeros(len(lengths), numpy.uint64)
+    numpy.cumsum(lengths[:-1], out=newStarts[1:])
+    total = int(lengths.sum())
+    # index of every byte of the new heap in the old heap
+    gather = numpy.arange(total, dtype=numpy.uint64) + numpy.repeat(starts - newStarts, lengths.astype(numpy.int64))
+    return numpy.asarray(heap)[gather], newStarts
+
+def _compactHeap(columns):
+    # returns the columns with a heap containing only referenced strings
+    columns = dict(columns)
+    starts = numpy.concatenate([columns["domain.start"], columns["email.start"]])
+    lengths = numpy.concatenate([columns["domain.length"], columns["email.length"]])
+    columns["heap"], newStarts = _gather(columns["heap"], starts, lengths)
+    count = len(columns["domain.start"])
+    columns["domain.start"] = newStarts[:count]
+    columns["email.start"] = newStarts[count:]
+    return columns
+
+def _spill(column, directory):
+    # move a column into an anonymous memory-mapped file
+    with tempfile.TemporaryFile(dir=directory) as f:
+        column.tofile(f)
+        f.flush()
+        return numpy.memmap(f, column.dtype, mode="r", shape=column.shape)
@@ -6,6 +6,14 @@ import ipaddress
 import re
 import os
 
+# Imports for the precompiled lookup tables
+import hashlib
+from python3.services import validationtables
+from python3.services.ranges import IPRangeSet
+
+# Import for request tracing
+from python3.tools import tracing
+
 # Import for error and type enums
 import enum
 
@@ -49,7 +57,11 @@ def Detect(_input):
 
     TODO: provide methods to check if an input is a specific type
     """
-    return __detectType(_input)
+    # these take microseconds, skip even the no-op span while tracing is off
+    if tracing.tracer is None:
+        return __detectType(_input)
+    with tracing.StartSpan("inputtype.Detect"):
+        return __detectType(_input)
 
 def InitializeTLDMap(path):
     """
@@ -64,7 +76,35 @@ def InitializeTLDMap(path):
     """
     return __initTldMap(path)
 
-def ValidateIP(ip):
+def InitializeValidationTables(path, tldpath=None):
+    """
+    Load the lookup tables (TLDs, non-public IP ranges, character classes)
+    from a file created by BuildValidationTables. The file is mapped into
+    memory read-only and shared by all processes using it.
+
+    If the file does not exist, is invalid or was built from different
+    built-in tables, the tables are built in-process instead, with the TLD map
+    read from tldpath (if given, see InitializeTLDMap).
+
+    Returns True if the file was loaded and False if the fallback was used.
+    """
+    return __initTables(path, tldpath)
+
+def BuildValidationTables(tldpath, output):
+    """
+    Compile the TLD list at tldpath (see InitializeTLDMap for the format), the
+    built-in non-public IP ranges and the character class table into a single
+    versioned file at output, to be loaded via InitializeValidationTables.
+
+    Raises an error if the TLD list cannot be read or contains non-ascii TLDs.
+    """
+    with open(tldpath, "r") as file:
+        tlds = __parseTldList(file.read())
+    ipv4nets, ipv6nets = __getNonpublicNets()
+    validationtables.WriteValidationTables(output, tlds, ipv4nets, ipv6nets,
+        __charClasses, __tablesDigest())
+
+def ValidateIP(ip, blocklist=None):
     """
     Check if an IP is public or not.
     Public IP is any IP that is neither of:
@@ -74,14 +114,21 @@ def ValidateIP(ip):
     - broadcast / multicast
     - link-local
 
+    If a blocklist is given (any container supporting "in", e.g. a set or a
+    tools.bloomfilter.Prechecked), a public IP whose string representation is
+    contained is rejected with Errors.BlocklistedError.
+
     Returns True on success and False on failure.
 
     Raises a ValueError exception if the input is not of type
     ipaddress.IPv4Address or ipaddress.IPv6Address.
     """
-    return __validateIP(ip)
+    if tracing.tracer is None:
+        return __validateIP(ip, blocklist)
+    with tracing.StartSpan("inputtype.ValidateIP"):
+        return __validateIP(ip, blocklist)
 
-def ValidateDomain(domain):
+def ValidateDomain(domain, blocklist=None):
     """
     Checks whether or not the given string is valid domain name.
     Additionally checks whether or not the given string contains a valid top
@@ -90,14 +137,20 @@ def ValidateDomain(domain):
     *Any attempt to identify a domain without a proper TLD map set will
     result in an exception being raised!* (see inputtype.InitializeTLDMap(path))
 
+    If a blocklist is given (see ValidateIP), a valid domain contained in it
+    (in lower case) is rejected with Errors.BlocklistedError.
+
     Returns (True, None) if the domain is valid. Otherwise it returns either
     (False, Errors.InvalidDomainError) or (False, Errors.InvalidTLDError)
 
     Raises a ValueError exception if the input is not of type str or bytes.
     """
-    return __validateDomain(domain)
+    if tracing.tracer is None:
+        return __validateDomain(domain, blocklist)
+    with tracing.StartSpan("inputtype.ValidateDomain"):
+        return __validateDomain(domain, blocklist)
 
-def ValidateEmail(email):
+def ValidateEmail(email, blocklist=None):
     """
     Checks whether or not the given emails address contains a valid domain name.
     Additionally checks whether or not the given domain contains a valid top
@@ -110,12 +163,62 @@ def ValidateEmail(email):
     (False, Errors.InvalidEmailError), (False, Errors.InvalidDomainError),
     or (False, Errors.InvalidTLDError)
 
+    If a blocklist is given (see ValidateIP), a valid address is rejected with
+    Errors.BlocklistedError if either "user@domain" (domain in lower case) or
+    its domain or IP is contained in it.
+
     TODO: output differs a bit from Go version, should be unified long-term
 
     raises a ValueError exception if the input is not of type str, bytes or
     inputtypes.Email.
     """
-    return __validateEmail(email)
+    if tracing.tracer is None:
+        return __validateEmail(email, blocklist)
+    with tracing.StartSpan("inputtype.ValidateEmail"):
+        return __validateEmail(email, blocklist)
+
+def ParseEmail(_input):
+    """
+    Parse an email address ("user@domain", "user@[ip]" or
+    "Full Name <user@domain>") without trying any other input type.
+
+    Returns an Email on success and None if the input is not an email address.
+    """
+    if isinstance(_input, bytes):
+        _input = _input.decode()
+    return __detectEmail(_input)
+
+def ParseEmails(inputs, table=None):
+    """
+    Bulk version of ParseEmail for large inputs like mailbox dumps. Accepts
+    any iterable of str or bytes (e.g. an open file, trailing line breaks are
+    removed) and yields an Email or None for every entry.
+
+    If a table (detections.StringTable) is given, users and domains are
+    interned through it, so equal strings of the resulting Emails share the
+    same object.
+    """
+    for _input in inputs:
+        if isinstance(_input, bytes):
+            _input = _input.decode()
+        email = __detectEmail(_input.rstrip("\r\n"))
+        if email is not None and table is not None:
+            email.user = table.intern(email.user)
+            if email.domain is not None:
+                email.domain = table.intern(email.domain)
+        yield email
+
+def ValidateEmails(inputs, blocklist=None):
+    """
+    Parse and validate every entry of inputs (see ParseEmails), yielding a
+    tuple (email, ok, err) per entry: email is None and err is
+    Errors.InvalidEmailError if the entry could not be parsed, otherwise ok
+    and err are the result of ValidateEmail(email, blocklist).
+
+    Domain validation results are cached for the duration of the call, so
+    addresses sharing a domain only pay for the TLD lookup once.
+    """
+    return __validateEmails(inputs, blocklist)
 
 def ValidateFile(file):
     """
@@ -124,7 +227,10 @@ def ValidateFile(file):
     Returns (True, None) on success and either of
     (False, Errors.FileNotFoundError) or (False, Errors.FileAccessDeniedError)
     """
-    return __validateFile(file)
+    if tracing.tracer is None:
+        return __validateFile(file)
+    with tracing.StartSpan("inputtype.ValidateFile"):
+        return __validateFile(file)
 
 
 """
@@ -132,6 +238,8 @@ Custom classes for input types
 """
 
 class Email(object):
+    __slots__ = ["fullname", "user", "domain", "ip"]
+
     def __init__(self, fullname, user, domain, ip=None):
         self.fullname = fullname  # "Peter Parker" in "Peter Parker <peter@parker.com>"
         self.user = user          # "peter"        in "Peter Parker <peter@parker.com"
@@ -139,6 +247,8 @@ class Email(object):
         self.ip = ip              # "53.24.88.19"  in "tester@[53.24.88.19]"
     def validate(self):
         return ValidateEmail(self)
+    def __repr__(self):
+        return "Email({!r}, {!r}, {!r}, {!r})".format(self.fullname, self.user, self.domain, self.ip)
 
 
 """
@@ -162,13 +272,14 @@ def __detectType(_input):
     if not isinstance(_input, (str, int)):
         raise ValueError("Invalid parameter type supplied to __detectType: {}, must be str or int".format(type(_input)))
 
-    ip = __detectIP(_input)
-    if ip:
-        return Types.IP, ip, None
+    if __maybeIP(_input):
+        ip = __detectIP(_input)
+        if ip:
+            return Types.IP, ip, None
 
-    ipnet = __detectIPNet(_input)
-    if ipnet:
-        return Types.IPNet, ipnet, None
+        ipnet = __detectIPNet(_input)
+        if ipnet:
+            return Types.IPNet, ipnet, None
 
     if isinstance(_input, str):
         domain = __detectDomain(_input)
@@ -186,6 +297,15 @@ def __detectType(_input):
     return Types.Unknown, None, Errors.UnknownTypeError
 
 
+# ipaddress only accepts these characters (a '%' starts the scope id of an
+# IPv6 address, which may contain anything), other strings are rejected
+# without the comparatively slow exception based parsing
+__ipCharsRegex = re.compile(r"[0-9A-Fa-f.:/]*")
+def __maybeIP(_input):
+    if not isinstance(_input, str) or "%" in _input:
+        return True
+    return __ipCharsRegex.fullmatch(_input) is not None
+
 def __detectIP(_input):
     if not _input:
         return None
@@ -212,23 +332,38 @@ def __detectDomain(_input):
 # based on validators library which in turn is based on djangos email validator
 # http://validators.readthedocs.io/en/latest/_modules/validators/email.html#email
 # improved by a domain name parsing function ported from Go
+#
+# The address is taken apart with a few C level string operations (no per
+# character Python loop and no encoding of the input), the domain syntax is
+# checked by a single regular expression implementing the rules of
+# __isDomainName.
+__emailNamedRegex = re.compile(
+    # "Full Name <user@domain>": the address is the part between the last '<'
+    # and the trailing '>', surrounding whitespace is ignored
+    r"(.*)<\s*([^<]*?)\s*>", re.DOTALL)
+__domainLabel = r"[A-Za-z0-9_](?:[A-Za-z0-9_-]{0,61}[A-Za-z0-9_])?"
+__domainRegex = re.compile(
+    # at least one letter, at least one dot (a trailing dot is allowed)
+    r"(?=[0-9.-]*[A-Za-z_])(?:{0}\.)+(?:{0})?".format(__domainLabel))
+
 def __detectEmail(_input):
-    if _input:
-        fullname = ""
-        if _input[-1] == '>':
-            pos = _input.rfind('<')
-            if pos >= 0:
-                fullname = _input[:pos].strip()
-                _input = (_input[pos+1:-1]).strip()
-        if '@' in _input:
-            user, domain = _input.rsplit('@', 1)
-            if is_ascii(_input):
-                if __isDomainName(domain):
-                    return Email(fullname, user, domain)
-                if domain[0]=="[" and domain[-1] == "]":
-                    ip = __detectIP(domain[1:-1])
-                    if ip:
-                        return Email(fullname, user, None, ip)
+    if not _input:
+        return None
+    fullname = ""
+    if _input[-1] == '>':
+        match = __emailNamedRegex.fullmatch(_input)
+        if match:
+            fullname, _input = match.groups()
+            fullname = fullname.strip()
+    user, at, domain = _input.rpartition('@')
+    if not at or not _input.isascii():
+        return None
+    if len(domain) <= 255 and __domainRegex.fullmatch(domain):
+        return Email(fullname, user, domain)
+    if len(domain) >= 2 and domain[0] == "[" and domain[-1] == "]":
+        ip = __detectIP(domain[1:-1])
+        if ip:
+            return Email(fullname, user, None, ip)
     return None
 
 def __cleanPath(path):
@@ -275,6 +410,8 @@ Errors = enum.Enum('Errors', [
     "IPisLinkLocalMulticastError",
     "IPisLinkLocalUnicastError",
     "IPisNotPublicError",
+
+    "BlocklistedError",
     ], module=__name__)
 
 def __parseCIDRList(cidrlist):
@@ -283,13 +420,13 @@ def __parseCIDRList(cidrlist):
         ipnetlist.append(ipaddress.ip_network(cidr))
     return ipnetlist
 
-__ipv4Private = __parseCIDRList([
+__ipv4Private = [
     # private use networks
     "10.0.0.0/8",
     "172.16.0.0/12",
     "192.168.0.0/16",
-])
-__ipv4Nonpublic = __parseCIDRList([
+]
+__ipv4Nonpublic = [
     # this-host-this-net,
     # loopback,
     # link-local,
@@ -317,15 +454,15 @@ __ipv4Nonpublic = __parseCIDRList([
     # possible other canditates listed in rfc5771 for multicast and
     # detailed allocations see, some of them seem to be routable though:
     # http://www.iana.org/assignments/multicast-addresses/multicast-addresses.xhtml#multicast-addresses-2
-]) + __ipv4Private
+] + __ipv4Private
 
-__ipv6Private = __parseCIDRList([
+__ipv6Private = [
     # private ipv6 networks (ietf rfc1918)
     # ORCHIDv2 non-routable (ietf rfc7343)
     "fc00::/7",
     "2001:20::/28",
-])
-__ipv6Nonpublic = __parseCIDRList([
+]
+__ipv6Nonpublic = [
     # Unspecified Address
     # Loopback Address
     # IPv4-mapped Address
@@ -351,30 +488,98 @@ __ipv6Nonpublic = __parseCIDRList([
     # http://www.iana.org/assignments/ipv6-multicast-addresses/ipv6-multicast-addresses.xhtml
     "FE80::/10",
     "FF00::/8",
-]) + __ipv6Private
+] + __ipv6Private
+
+# the CIDR lists above are only parsed once the first IP is validated, this
+# keeps the import of this module cheap for services not validating IPs
+__nonpublicNets = None
+def __getNonpublicNets():
+    global __nonpublicNets
+    if __nonpublicNets is None:
+        __nonpublicNets = (__parseCIDRList(__ipv4Nonpublic), __parseCIDRList(__ipv6Nonpublic))
+    return __nonpublicNets
+
+# the same networks merged into sorted intervals for binary search
+__nonpublicRanges = None
+def __getNonpublicRanges():
+    global __nonpublicRanges
+    if __nonpublicRanges is None:
+        ipv4nets, ipv6nets = __getNonpublicNets()
+        __nonpublicRanges = IPRangeSet(ipv4nets + ipv6nets)
+    return __nonpublicRanges
+
+
+# character classes used by __isDomainName
+__charLetter = 1  # a-z, A-Z and _
+__charDigit  = 2
+__charHyphen = 3
+__charDot    = 4
+def __buildCharClasses():
+    classes = bytearray(256)
+    for c in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ_":
+        classes[ord(c)] = __charLetter
+    for c in "0123456789":
+        classes[ord(c)] = __charDigit
+    classes[ord("-")] = __charHyphen
+    classes[ord(".")] = __charDot
+    return bytes(classes)
+__charClasses = __buildCharClasses()
 
 
 __tldMap = {}
 __tldMapInitialized = False
-def __initTldMapHelper(data):
-    tlds = [line.strip() for line in data.split("\n")]
-    for tld in tlds:
+def __parseTldList(data):
+    tlds = []
+    for tld in data.split("\n"):
+        tld = tld.strip()
         if not is_ascii(tld):
             raise ValueError("TLD list contains non-ascii TLD: {}".format(tld))
         if tld and tld[0] != "#":
-            __tldMap[tld.upper()] = True
+            tlds.append(tld)
+    return tlds
+
+def __initTldMapHelper(data):
+    for tld in __parseTldList(data):
+        __tldMap[tld.upper()] = True
     global __tldMapInitialized
     __tldMapInitialized = True
 
 def __initTldMap(path):
     with open(path, "r") as file:
-        data = file.read()
-        __initTldMapHelper(data.decode())
+        __initTldMapHelper(file.read())
     if len(__tldMap) == 0:
         return False
     return True
 
 
+# tables loaded from a file built by BuildValidationTables, if any
+__tables = None
+def __tablesDigest():
+    # identifies the built-in tables, a file built from other tables (e.g. by
+    # an older version of this library) is not used
+    digest = hashlib.sha256()
+    digest.update("\n".join(__ipv4Nonpublic).encode())
+    digest.update(b"\0")
+    digest.update("\n".join(__ipv6Nonpublic).encode())
+    digest.update(b"\0")
+    digest.update(__charClasses)
+    return digest.digest()
+
+def __initTables(path, tldpath):
+    global __tables, __charClasses
+    try:
+        tables = validationtables.ValidationTables(path, __tablesDigest())
+    except (OSError, ValueError):
+        if tldpath is not None:
+            __initTldMap(tldpath)
+        return False
+    if __tables is not None:
+        __tables.close()
+    __tables = tables
+    __charClasses = tables.charClasses
+    return True
+
+
 """
 Validation functionality.
 """
@@ -390,29 +595,29 @@ def __isDomainName(s):
     last = '.'
     ok = False # Ok once we've seen a letter.
     partlen = 0
-    i = 0
     containsDot = False
-    while i < len(s):
-        c = s[i]
-        i += 1
+    classes = __charClasses
+    for c in s:
+        o = ord(c)
+        cls = classes[o] if o < 256 else 0
 
-        if ('a' <= c and c <= 'z') or ('A' <= c and c <= 'Z') or c == '_':
+        if cls == __charLetter:
             ok = True
             partlen += 1
 
-        elif '0' <= c and c <= '9':
+        elif cls == __charDigit:
             # TODO: check code here
             # here's probably missing a `if not ok: return False` to avoid
             # labels starting with numbers
             # see rfc https://tools.ietf.org/html/rfc1035 page 8
             partlen += 1
 
-        elif c == '-':
+        elif cls == __charHyphen:
             if last == '.':
                 return False
             partlen += 1
 
-        elif c == '.':
+        elif cls == __charDot:
             if last == '.' or last == '-':
                 return False
             if partlen > 63 or partlen == 0:
@@ -433,72 +638,96 @@ def __isDomainName(s):
     return ok and containsDot
 
 
-def __inIPNet(ip, ipv4nets, ipv6nets):
-    if isinstance(ip, ipaddress.IPv4Address):
-        ipnets = ipv4nets
-    if isinstance(ip, ipaddress.IPv6Address):
-        ipnets = ipv6nets
-
-    for ipnet in ipnets:
-        if ip in ipnet:
-            return True
-    return False
-
-
 def __inTldMap(domain):
-    if not __tldMapInitialized:
+    if not __tldMapInitialized and __tables is None:
         raise UnboundLocalError("tldMap not (or not properly) initialized - use inputtype.InitializeTLDMap(path)")
     pos = domain.rfind('.')
     if pos >= 0:
         domain = domain[pos+1:]
         if domain:
+            if __tables is not None:
+                return __tables.hasTLD(domain)
             return (domain.upper() in __tldMap)
     return False
 
 
-def __validateIP(ip):
+def __validateIP(ip, blocklist=None):
     if not (isinstance(ip, ipaddress.IPv4Address) or isinstance(ip, ipaddress.IPv6Address)):
         raise ValueError("Invalid parameter supplied to __validateIP(ip), must be ipaddress.ip_address")
     if ip.is_loopback:
         return False, Errors.IPisLoopbackError
     if ip.is_unspecified:
         return False, Errors.IPisUnspecifiedError
-    if __inIPNet(ip, __ipv4Nonpublic, __ipv6Nonpublic):
+    if __tables is not None:
+        nonpublic = __tables.isNonpublic(ip)
+    else:
+        nonpublic = ip in __getNonpublicRanges()
+    if nonpublic:
         return False, Errors.IPisNotPublicError
+    if blocklist is not None and str(ip) in blocklist:
+        return False, Errors.BlocklistedError
     return True, None
 
-def __validateDomain(domain):
+def __validateDomain(domain, blocklist=None):
     if not is_ascii(domain):
         return False, Errors.NonAsciiCharacters
     if not __isDomainName(domain):
         return False, Errors.InvalidDomainError
     if not __inTldMap(domain):
         return False, Errors.InvalidTLDError
+    if blocklist is not None and domain.lower() in blocklist:
+        return False, Errors.BlocklistedError
     return True, None
 
 # based on validators library which in turn is based on djangos email validator
 # http://validators.readthedocs.io/en/latest/_modules/validators/email.html#email
 # improved by a domain name parsing function ported from Go
-__email_user_regex = re.compile(
+__email_user_pattern = (
     # dot-atom
     r"(^[-!#$%&'*+/=?^_`{}|~0-9A-Z]+"
     r"(\.[-!#$%&'*+/=?^_`{}|~0-9A-Z]+)*$"
     # quoted-string
     r'|^"([\001-\010\013\014\016-\037!#-\[\]-\177]|'
-    r"""\\[\001-\011\013\014\016-\177])*"$)""",
-    re.IGNORECASE
+    r"""\\[\001-\011\013\014\016-\177])*"$)"""
 )
-def __validateEmail(email):
+__email_user_regex = None
+def __getEmailUserRegex():
+    global __email_user_regex
+    if __email_user_regex is None:
+        __email_user_regex = re.compile(__email_user_pattern, re.IGNORECASE)
+    return __email_user_regex
+
+def __validateEmail(email, blocklist=None, domainCache=None):
     if not isinstance(email, Email):
         raise ValueError("Invalid parameter supplied to __validateEmail(email), must be inputtypes.Email")
-    if not __email_user_regex.match(email.user):
+    if not __getEmailUserRegex().match(email.user):
         return False, Errors.InvalidEmailError
-    ok, err = __validateDomain(email.domain)
+    if domainCache is None:
+        ok, err = __validateDomain(email.domain, blocklist)
+    else:
+        result = domainCache.get(email.domain)
+        if result is None:
+            result = domainCache[email.domain] = __validateDomain(email.domain, blocklist)
+        ok, err = result
     if ok:
+        if blocklist is not None and "{}@{}".format(email.user, email.domain.lower()) in blocklist:
+            return False, Errors.BlocklistedError
         return True, None
     if not email.ip:
         return False, err
-    return __validateIP(email.ip)
+    ok, err = __validateIP(email.ip, blocklist)
+    if ok and blocklist is not None and "{}@[{}]".format(email.user, email.ip) in blocklist:
+        return False, Errors.BlocklistedError
+    return ok, err
+
+def __validateEmails(inputs, blocklist=None):
+    domainCache = {}
+    for email in ParseEmails(inputs):
+        if email is None:
+            yield None, False, Errors.InvalidEmailError
+        else:
+            ok, err = __validateEmail(email, blocklist, domainCache)
+            yield email, ok, err
 
 def __validateFile(file):
     try:
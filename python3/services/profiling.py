@@ -0,0 +1,392 @@
+# imports for tornado
+import tornado
+from tornado import gen, web, ioloop
+
+# imports for profiling, loaded once profiling is used
+import hmac
+import io
+import itertools
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from python3.tools.imports import LazyModule
+
+cProfile    = LazyModule("cProfile")
+pstats      = LazyModule("pstats")
+marshal     = LazyModule("marshal")
+tracemalloc = LazyModule("tracemalloc")
+
+
+class SamplingProfiler(object):
+    """
+    Low overhead statistical profiler: a timer thread records the stacks of
+    all other threads every interval seconds (via sys._current_frames), the
+    profiled code runs unmodified. The result are collapsed stacks, the input
+    format of flamegraph.pl, speedscope and most other flame graph tools.
+
+    Usage:
+        profiler = SamplingProfiler(interval=0.005)
+        profiler.start()
+        ...
+        profiler.stop()
+        profiler.collapsed()   # "MainThread;main (app.py:10);work (app.py:20) 42\n..."
+    """
+
+    def __init__(self, interval=0.01, threads=True):
+        """
+        Parameters:
+            interval - Float: Seconds between two samples
+            threads  - Bool:  Start every stack with the name of its thread
+        """
+        self.interval = interval
+        self.threads  = threads
+        self.counts   = Counter()
+        self.samples  = 0
+        self.started  = None
+        self.duration = 0.0
+        self.labels   = {}
+        self.thread   = None
+        self.stopped  = threading.Event()
+
+    def start(self):
+        self.started = time.monotonic()
+        self.thread = threading.Thread(target=self.__run, name="SamplingProfiler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.duration = time.monotonic() - self.started
+
+    def __run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            if self.threads and not frames.keys() <= names.keys():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self.__label(frame.f_code))
+                    frame = frame.f_back
+                if self.threads:
+                    stack.append(names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def __label(self, code):
+        # "function (file.py:first line)", cached per code object
+        label = self.labels.get(code)
+        if label is None:
+            filename = code.co_filename.rsplit("/", 1)[-1]
+            label = "{} ({}:{})".format(code.co_name, filename, code.co_firstlineno).replace(";", ":")
+            self.labels[code] = label
+        return label
+
+    def collapsed(self):
+        """
+        Returns one line "frame;frame;frame count" per distinct stack, root
+        frame first.
+        """
+        return "".join("{} {}\n".format(stack, count) for stack, count in sorted(self.counts.items()))
+
+    def dict(self):
+        return {
+            "interval": self.interval,
+            "duration": round(self.duration, 3),
+            "samples":  self.samples,
+            "stacks":   dict(self.counts),
+        }
+
+
+class ProfileStore(object):
+    """
+    State of the profiling endpoints of a Router: the last size request
+    profiles captured with cProfile and the last tracemalloc snapshot.
+
+    Only one request is profiled at a time, cProfile supports a single
+    active profiler. The profile covers everything running on the IOLoop
+    while the request is processed (also other requests served concurrently),
+    but not the work delegated to executor threads.
+    """
+    header       = "X-Profile"
+    argument     = "profile"
+    token_header = "X-Profiling-Token"
+
+    def __init__(self, token="", size=16, max_seconds=60):
+        """
+        Parameters:
+            token       - String: Required in the X-Profiling-Token header of
+                                  every profiling request (if not empty)
+            size        - Int:    Number of request profiles kept
+            max_seconds - Int:    Longest run of the sampling profiler
+        """
+        self.token       = token
+        self.size        = size
+        self.max_seconds = max_seconds
+        self.profiles    = OrderedDict()
+        self.counter     = itertools.count(1)
+        self.active      = False
+        self.sampling    = False
+        self.snapshot    = None
+
+    def authorized(self, request):
+        if not self.token:
+            return True
+        return hmac.compare_digest(request.headers.get(self.token_header, ""), self.token)
+
+    def requested(self, handler):
+        """
+        Returns True if the request asks to be profiled.
+        """
+        return bool(handler.request.headers.get(self.header) or handler.get_query_argument(self.argument, None))
+
+    def begin(self):
+        """
+        Returns an enabled cProfile.Profile, None if a request is profiled
+        already.
+        """
+        if self.active:
+            return None
+        self.active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def end(self, profile, request, duration):
+        """
+        Stores the profile of request, returns its id.
+        """
+        profile.disable()
+        profile.create_stats()
+        self.active = False
+        key = str(next(self.counter))
+        self.profiles[key] = {
+            "id":       key,
+            "method":   request.method,
+            "uri":      request.uri,
+            "time":     time.time(),
+            "duration": round(duration, 6),
+            "stats":    profile.stats,
+        }
+        while len(self.profiles) > self.size:
+            self.profiles.popitem(last=False)
+        return key
+
+    def discard(self, profile):
+        profile.disable()
+        self.active = False
+
+    def list(self):
+        return [{k: v for k, v in entry.items() if k != "stats"} for entry in reversed(self.profiles.values())]
+
+
+class ProfilingMixin(object):
+    """
+    Request handler mixin capturing a cProfile profile of requests sending
+    the X-Profile header or the profile parameter. The id of the profile is
+    returned in the X-Profile-Id header ("busy" if another request is being
+    profiled), the profile is available at /debug/profiles/<id>.
+    Do not use directly, see CreateProfilingHandler(handler, profiles).
+    """
+    profiles = None
+
+    _profile         = None
+    _profile_started = None
+
+    def prepare(self):
+        profiles = self.profiles
+        if profiles.requested(self):
+            if not profiles.authorized(self.request):
+                raise tornado.web.HTTPError(403, "Invalid {} header".format(profiles.token_header), reason="Forbidden")
+            self._profile = profiles.begin()
+            self._profile_started = time.perf_counter()
+            if self._profile is None:
+                self.set_header("X-Profile-Id", "busy")
+        return super().prepare()
+
+    def finish(self, chunk=None):
+        if self._profile is not None:
+            profile, self._profile = self._profile, None
+            key = self.profiles.end(profile, self.request, time.perf_counter() - self._profile_started)
+            self.set_header("X-Profile-Id", key)
+        return super().finish(chunk)
+
+    def on_connection_close(self):
+        if self._profile is not None:
+            profile, self._profile = self._profile, None
+            self.profiles.discard(profile)
+        super().on_connection_close()
+
+
+def CreateProfilingHandler(handler, profiles):
+    """
+    Wrap a tornado.web.RequestHandler class so that its requests can be
+    profiled on demand (see ProfilingMixin). The handler code itself stays
+    untouched.
+    """
+    return type(handler.__name__, (ProfilingMixin, handler), {"profiles": profiles})
+
+
+class DebugHandler(tornado.web.RequestHandler):
+    """
+    Base of the /debug/ endpoints, checks the profiling token.
+    """
+    profiles = None
+
+    def prepare(self):
+        if not self.profiles.authorized(self.request):
+            raise tornado.web.HTTPError(403, "Invalid {} header".format(self.profiles.token_header), reason="Forbidden")
+
+    def number(self, name, default, minimum, maximum):
+        value = self.get_argument(name, None)
+        if value is None:
+            return default
+        try:
+            value = float(value)
+        except ValueError:
+            raise tornado.web.HTTPError(400, "Invalid parameter {}: {}".format(name, value), reason="Bad Parameter")
+        return max(minimum, min(value, maximum))
+
+
+class SamplingHandler(DebugHandler):
+    # GET /debug/profile?seconds=10&interval=0.01&format=collapsed|json
+    async def get(self):
+        profiles = self.profiles
+        seconds  = self.number("seconds", 10, 0, profiles.max_seconds)
+        interval = self.number("interval", 0.01, 0.001, 1)
+        output   = self.get_argument("format", "collapsed")
+        if output not in ("collapsed", "json"):
+            raise tornado.web.HTTPError(400, "Unknown format: {}".format(output), reason="Bad Parameter")
+        if profiles.sampling:
+            raise tornado.web.HTTPError(409, "The sampling profiler is already running", reason="Profiler Busy")
+        profiles.sampling = True
+        profiler = SamplingProfiler(interval, threads=self.get_argument("threads", "1") != "0")
+        try:
+            profiler.start()
+            await gen.sleep(seconds)
+        finally:
+            profiler.stop()
+            profiles.sampling = False
+        if output == "json":
+            self.write(profiler.dict())
+        else:
+            self.set_header("Content-Type", "text/plain; charset=UTF-8")
+            self.write(profiler.collapsed())
+
+
+class ProfilesHandler(DebugHandler):
+    # GET /debug/profiles/                       list of the captured profiles
+    # GET /debug/profiles/<id>?sort=cumulative&limit=40
+    # GET /debug/profiles/<id>?format=pstats     marshalled stats, pstats.Stats(path)
+    def get(self, key=None):
+        if not key:
+            self.write({"profiles": self.profiles.list()})
+            return
+        entry = self.profiles.profiles.get(key)
+        if entry is None:
+            raise tornado.web.HTTPError(404, "Unknown profile: {}".format(key), reason="Unknown Profile")
+        if self.get_argument("format", "text") == "pstats":
+            self.set_header("Content-Type", "application/octet-stream")
+            self.set_header("Content-Disposition", 'attachment; filename="profile-{}.pstats"'.format(key))
+            self.write(marshal.dumps(entry["stats"]))
+            return
+        stream = io.StringIO()
+        stats = pstats.Stats(_Stats(entry["stats"]), stream=stream)
+        try:
+            stats.sort_stats(self.get_argument("sort", "cumulative"))
+        except KeyError as e:
+            raise tornado.web.HTTPError(400, "Unknown sort key: {}".format(e), reason="Bad Parameter")
+        stats.print_stats(int(self.number("limit", 40, 1, 10000)))
+        self.set_header("Content-Type", "text/plain; charset=UTF-8")
+        self.write("{} {} ({:.3f}s)\n{}".format(entry["method"], entry["uri"], entry["duration"], stream.getvalue()))
+
+
+class _Stats(object):
+    # source of pstats.Stats, which takes (and clears) the stats of a profile
+    def __init__(self, stats):
+        self.stats = dict(stats)
+
+    def create_stats(self):
+        pass
+
+
+class MemoryHandler(DebugHandler):
+    # GET /debug/memory?action=start&frames=1
+    # GET /debug/memory?action=snapshot&limit=25&group=lineno   (difference to the previous snapshot)
+    # GET /debug/memory?action=stop
+    async def get(self):
+        profiles = self.profiles
+        action = self.get_argument("action", "snapshot")
+        if action == "start":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(int(self.number("frames", 1, 1, 100)))
+            profiles.snapshot = None
+        elif action == "stop":
+            tracemalloc.stop()
+            profiles.snapshot = None
+        elif action == "snapshot":
+            if not tracemalloc.is_tracing():
+                raise tornado.web.HTTPError(409, "Start tracing first (action=start)", reason="Not Tracing")
+            group = self.get_argument("group", "lineno")
+            if group not in ("lineno", "filename", "traceback"):
+                raise tornado.web.HTTPError(400, "Unknown group: {}".format(group), reason="Bad Parameter")
+            limit = int(self.number("limit", 25, 1, 1000))
+            # taking and comparing snapshots takes a while, keep the IOLoop free
+            loop = tornado.ioloop.IOLoop.current()
+            top = await loop.run_in_executor(self.application.executor, self.__compare, group, limit)
+            self.write({"tracing": True, "current": tracemalloc.get_traced_memory()[0],
+                        "peak": tracemalloc.get_traced_memory()[1], "top": top})
+            return
+        else:
+            raise tornado.web.HTTPError(400, "Unknown action: {}".format(action), reason="Bad Parameter")
+        self.write({"tracing": tracemalloc.is_tracing()})
+
+    def __compare(self, group, limit):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        previous, self.profiles.snapshot = self.profiles.snapshot, snapshot
+        if previous is None:
+            statistics = snapshot.statistics(group)
+        else:
+            statistics = snapshot.compare_to(previous, group)
+        top = []
+        for statistic in statistics[:limit]:
+            frame = statistic.traceback[0]
+            entry = {
+                "location":  "{}:{}".format(frame.filename, frame.lineno),
+                "size":      statistic.size,
+                "count":     statistic.count,
+            }
+            if previous is not None:
+                entry["size_diff"]  = statistic.size_diff
+                entry["count_diff"] = statistic.count_diff
+            if group == "traceback":
+                entry["traceback"] = statistic.traceback.format()
+            top.append(entry)
+        return top
+
+
+def CreateDebugHandlers(profiles):
+    """
+    Returns the routes of the profiling endpoints using the given
+    ProfileStore:
+        /debug/profile        sampling profiler, collapsed stacks
+        /debug/profiles/<id>  request profiles captured by cProfile
+        /debug/memory         tracemalloc snapshots
+    """
+    attributes = {"profiles": profiles}
+    return [
+        (r'/debug/profile',           type("SamplingHandler", (SamplingHandler,), attributes)),
+        (r'/debug/profiles/([0-9]*)', type("ProfilesHandler", (ProfilesHandler,), attributes)),
+        (r'/debug/memory',            type("MemoryHandler", (MemoryHandler,), attributes)),
+    ]
@@ -0,0 +1,235 @@
+# Imports for parsing
+import bisect
+import ipaddress
+
+
+_numpyModule = []
+
+def _numpy():
+    # NumPy (optional, used for batch queries) imported on the first batch,
+    # so importing inputtype does not pay for it, None if it is missing
+    if not _numpyModule:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _numpyModule.append(numpy)
+    return _numpyModule[0]
+
+
+class IPRangeSet(object):
+    """
+    Set of IP addresses stored as minimal sorted lists of inclusive integer
+    intervals (one per IP version). Overlapping and adjacent ranges are
+    merged, so hundreds of thousands of CIDRs from a feed collapse into a few
+    intervals, and every lookup is a binary search instead of a linear scan
+    over all networks.
+
+    Accepts CIDR strings, single IPs (as strings or ipaddress objects),
+    ipaddress networks and (first, last) address pairs.
+
+    Usage:
+        ranges = IPRangeSet(["10.0.0.0/8", "10.1.0.0/16", "192.168.0.0/24"])
+        "10.1.2.3" in ranges                 # True
+        ranges.contains(ips)                 # [True, False, ...]
+        ranges | other, ranges & other, ranges - other
+        ranges.networks()                    # minimal list of CIDRs
+
+    Since "in" accepts the string form of an IP, a range set can be passed as
+    blocklist to inputtype.ValidateIP.
+    """
+    __slots__ = ["_starts", "_ends", "_pending", "_arrays"]
+
+    def __init__(self, ranges=None):
+        self._starts   = {4: [], 6: []}
+        self._ends     = {4: [], 6: []}
+        self._pending  = {4: [], 6: []}
+        self._arrays   = None  # NumPy copies of the IPv4 intervals
+        if ranges is not None:
+            self.update(ranges)
+
+    def add(self, item):
+        """
+        Add a CIDR, IP or (first, last) pair. Raises a ValueError if item is
+        neither.
+        """
+        version, first, last = self.__interval(item)
+        self._pending[version].append((first, last))
+
+    def update(self, items):
+        """
+        Add every entry of items (trailing line breaks of strings are
+        removed, so an open file can be passed).
+        """
+        for item in items:
+            if isinstance(item, bytes):
+                item = item.decode()
+            if isinstance(item, str):
+                item = item.rstrip("\r\n")
+            self.add(item)
+
+    def __normalize(self):
+        for version in (4, 6):
+            pending = self._pending[version]
+            if not pending:
+                continue
+            intervals = sorted(list(zip(self._starts[version], self._ends[version])) + pending)
+            self._starts[version], self._ends[version] = self.__merge(intervals)
+            self._pending[version] = []
+            self._arrays = None
+
+    @staticmethod
+    def __merge(intervals):
+        # merge sorted (first, last) pairs into disjoint, non adjacent ones
+        starts, ends = [], []
+        for first, last in intervals:
+            if ends and first <= ends[-1] + 1:
+                if last > ends[-1]:
+                    ends[-1] = last
+            else:
+                starts.append(first)
+                ends.append(last)
+        return starts, ends
+
+    @staticmethod
+    def __interval(item):
+        # returns version, first and last address of item as integers
+        if isinstance(item, tuple):
+            first, last = ipaddress.ip_address(item[0]), ipaddress.ip_address(item[1])
+            if first.version != last.version or first > last:
+                raise ValueError("invalid range: {} - {}".format(*item))
+            return first.version, int(first), int(last)
+        if isinstance(item, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
+            return item.version, int(item), int(item)
+        if not isinstance(item, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+            item = ipaddress.ip_network(item, strict=False)
+        return item.version, int(item.network_address), int(item.broadcast_address)
+
+    def __contains__(self, item):
+        self.__normalize()
+        try:
+            version, first, last = self.__interval(item)
+        except ValueError:
+            return False
+        starts = self._starts[version]
+        i = bisect.bisect_right(starts, first) - 1
+        return i >= 0 and last <= self._ends[version][i]
+
+    def contains(self, ips):
+        """
+        Batch membership test: returns a list of booleans, one per IP
+        (ipaddress object, string or int). With NumPy installed, batches of
+        IPv4 addresses are answered by a single vectorized search.
+        """
+        self.__normalize()
+        ips = [ipaddress.ip_address(ip) if not isinstance(ip, (ipaddress.IPv4Address, ipaddress.IPv6Address)) else ip
+               for ip in ips]
+        numpy = _numpy() if ips else None
+        if numpy is not None and all(ip.version == 4 for ip in ips):
+            if self._arrays is None:
+                self._arrays = (numpy.array(self._starts[4], numpy.uint32), numpy.array(self._ends[4], numpy.uint32))
+            starts, ends = self._arrays
+            values = numpy.array([int(ip) for ip in ips], numpy.uint32)
+            i = numpy.searchsorted(starts, values, side="right") - 1
+            found = (i >= 0) & (values <= ends[numpy.maximum(i, 0)]) if len(starts) else numpy.zeros(len(values), bool)
+            return found.tolist()
+        result = []
+        for ip in ips:
+            value, starts = int(ip), self._starts[ip.version]
+            i = bisect.bisect_right(starts, value) - 1
+            result.append(i >= 0 and value <= self._ends[ip.version][i])
+        return result
+
+    def union(self, other):
+        """
+        Returns a new IPRangeSet containing the addresses of both sets.
+        """
+        return self.__combine(other, lambda a, b: a or b)
+
+    def intersection(self, other):
+        """
+        Returns a new IPRangeSet containing the addresses in both sets.
+        """
+        return self.__combine(other, lambda a, b: a and b)
+
+    def difference(self, other):
+        """
+        Returns a new IPRangeSet containing the addresses of this set which
+        are not in other.
+        """
+        return self.__combine(other, lambda a, b: a and not b)
+
+    __or__  = union
+    __and__ = intersection
+    __sub__ = difference
+
+    def __combine(self, other, operation):
+        # sweep over the interval boundaries of both sets, keeping the parts
+        # for which operation(in self, in other) is true
+        self.__normalize()
+        other.__normalize()
+        result = IPRangeSet()
+        for version in (4, 6):
+            events = []
+            for owner, ranges in ((0, self), (1, other)):
+                for first, last in zip(ranges._starts[version], ranges._ends[version]):
+                    events.append((first, owner))
+                    events.append((last + 1, owner))
+            events.sort()
+            inside = [False, False]
+            intervals = []
+            start = None
+            i = 0
+            while i < len(events):
+                position = events[i][0]
+                while i < len(events) and events[i][0] == position:
+                    inside[events[i][1]] = not inside[events[i][1]]
+                    i += 1
+                selected = operation(inside[0], inside[1])
+                if selected and start is None:
+                    start = position
+                elif not selected and start is not None:
+                    intervals.append((start, position - 1))
+                    start = None
+            result._starts[version], result._ends[version] = IPRangeSet.__merge(intervals)
+        return result
+
+    def __eq__(self, other):
+        if not isinstance(other, IPRangeSet):
+            return NotImplemented
+        self.__normalize()
+        other.__normalize()
+        return self._starts == other._starts and self._ends == other._ends
+
+    def __len__(self):
+        """
+        Number of disjoint intervals.
+        """
+        self.__normalize()
+        return len(self._starts[4]) + len(self._starts[6])
+
+    def __iter__(self):
+        """
+        Yields the intervals as (first, last) ipaddress pairs, IPv4 first.
+        """
+        self.__normalize()
+        for version, factory in ((4, ipaddress.IPv4Address), (6, ipaddress.IPv6Address)):
+            for first, last in zip(self._starts[version], self._ends[version]):
+                yield factory(first), factory(last)
+
+    def size(self):
+        """
+        Number of addresses contained.
+        """
+        self.__normalize()
+        return sum(last - first + 1 for version in (4, 6)
+                   for first, last in zip(self._starts[version], self._ends[version]))
+
+    def networks(self):
+        """
+        Returns the minimal list of ipaddress networks covering the set.
+        """
+        networks = []
+        for first, last in self:
+            networks.extend(ipaddress.summarize_address_range(first, last))
+        return networks
@@ -1,4 +1,7 @@
-from tornado.web import HTTPError
+from python3.tools.imports import LazyModule
+
+# tornado is only needed on errors, do not load it up front
+web = LazyModule("tornado.web")
 
 class ServiceResultSet (object):
     """
@@ -44,7 +47,7 @@ class ServiceResultSet (object):
         elif l > 1:
             self._add_args(self.data, args)
         else:
-            raise HTTPError(
+            raise web.HTTPError(
                 500,
                 "ServiceResultSet.add() not defined for parameters {}".format(args),
                 "Service Exception")
@@ -65,7 +68,7 @@ class ServiceResultSet (object):
             if not (key in _dict):
                 _dict[key] = {}
             if not isinstance(_dict[key], dict):
-                raise HTTPError(
+                raise web.HTTPError(
                     500,
                     "Key={} is not a dict".format(key),
                     "Service Exception")
@@ -5,6 +5,50 @@ from tornado import web, httpserver, ioloop
 # imports for info output
 import os
 
+# imports for admission control
+from python3.services.admission import CreateAdmissionHandler
+
+# imports for streamed request bodies
+import hashlib
+from python3.tools.files import TemporaryFile, MEGABYTE
+
+# imports for batch analysis
+import json
+from concurrent.futures import ThreadPoolExecutor
+from tornado import queues
+from python3.services.results import ServiceResultSet
+
+# imports for request tracing
+import contextvars
+from python3.tools import tracing
+
+# imports for server options
+from python3.services.compression import CreateCompressionTransform
+from python3.services.profiling import ProfileStore, CreateProfilingHandler, CreateDebugHandlers
+
+
+# Server options understood by Router(server=...). Embed them into the
+# service configuration to make them configurable via ParseConfig, e.g.:
+#   config = {"Port": 8080, "Server": dict(DEFAULT_SERVER_OPTIONS)}
+#   cfg = ParseConfig(config)
+#   router = Router(metadata=m, handlers=handlers, server=cfg.server)
+DEFAULT_SERVER_OPTIONS = {
+    "CompressResponse":      True,       # compress text/json responses (gzip, brotli if installed)
+    "CompressMinLength":     1024,       # bytes, smaller responses are sent uncompressed
+    "CompressLevel":         6,          # gzip level 1-9
+    "BrotliQuality":         5,          # brotli quality 0-11
+    "XHeaders":              False,      # trust X-Real-Ip/X-Forwarded-For of a proxy
+    "NoKeepAlive":           False,      # close connections after each request
+    "IdleConnectionTimeout": 3600,       # seconds a kept-alive connection may idle
+    "BodyTimeout":           0,          # seconds to receive a request body, 0 disables
+    "MaxHeaderSize":         65536,      # bytes
+    "MaxBodySize":           104857600,  # bytes (streaming handlers set their own limit)
+    "DecompressRequest":     False,      # accept gzip compressed request bodies
+    "Profiling":             False,      # /debug/ profiling endpoints and per-request profiles
+    "ProfilingToken":        "",         # required in the X-Profiling-Token header if set
+    "ProfilingMaxSeconds":   60,         # longest run of the sampling profiler
+}
+
 
 class DummyHandler(tornado.web.RequestHandler):
     #def get(self):
@@ -12,6 +56,236 @@ class DummyHandler(tornado.web.RequestHandler):
     pass
 
 
+@tornado.web.stream_request_body
+class StreamingBodyHandler(tornado.web.RequestHandler):
+    """
+    Base handler for endpoints receiving samples via POST/PUT.
+
+    Instead of buffering the whole request body in memory, incoming chunks are
+    written straight into a TemporaryFile (kept in memory up to
+    max_memory_size megabytes, spilled to disk beyond) while their SHA-256 is
+    computed on the fly. Bodies larger than max_body_size megabytes are
+    rejected. Note that mapping a body which still resides in memory moves it
+    to disk first. Bodies announced (Content-Length) larger than
+    max_memory_size are written to spill_directory right away. No space is
+    reserved from Content-Length, it is sent by the client before any of
+    the body and may never be followed by it. A TemporaryFilePool set as
+    temp_pool avoids creating and deleting a file per request.
+
+    Usage:
+        class AnalysisHandler(StreamingBodyHandler):
+            max_memory_size = 64
+
+            def post(self):
+                reader = self.body_reader()
+                if reader is None:
+                    raise tornado.web.HTTPError(400, "Missing sample")
+                self.write({
+                    "sha256": self.body_sha256(),
+                    "mz":     reader.startswith(b"MZ"),
+                })
+    """
+    max_memory_size = 16
+    max_body_size   = 4096
+    spill_directory = None   # e.g. a tmpfs mount, default: the tempfile default
+    temp_pool       = None   # TemporaryFilePool shared by the requests
+
+    body_file   = None
+    body_size   = 0
+    _body_temp   = None
+    _body_hash   = None
+
+    def prepare(self):
+        self.request.connection.set_max_body_size(self.max_body_size * MEGABYTE)
+        try:
+            expected = int(self.request.headers.get("Content-Length", 0))
+        except ValueError:
+            expected = 0
+        memory = 0 if expected > self.max_memory_size * MEGABYTE else self.max_memory_size
+        self._body_temp = TemporaryFile(max_memory_size=memory,
+            directory=self.spill_directory, pool=self.temp_pool)
+        self.body_file  = self._body_temp.__enter__()
+        self._body_hash = hashlib.sha256()
+
+    def data_received(self, chunk):
+        if self.body_file is None:
+            return  # request got rejected before the body arrived
+        self.body_file.write(chunk)
+        self._body_hash.update(chunk)
+        self.body_size += len(chunk)
+
+    def body_sha256(self):
+        """
+        Returns the hex encoded SHA-256 of the request body.
+        """
+        return self._body_hash.hexdigest()
+
+    def body_reader(self):
+        """
+        Returns a MmapFileReader over the request body or None if the body is
+        empty. The reader is closed automatically once the request finishes.
+        """
+        if self.body_size == 0:
+            return None
+        return self._body_temp.reader()
+
+    def on_finish(self):
+        self.__releaseBody()
+        super().on_finish()
+
+    def on_connection_close(self):
+        # requests interrupted while their body arrives never reach post() or
+        # on_finish(), release their temporary file (back to the pool) right
+        # away. Once the body is complete the handler may still be using it,
+        # it is released by on_finish()
+        received = getattr(self.request, "_body_future", None)
+        if received is None or not received.done():
+            self.__releaseBody()
+        super().on_connection_close()
+
+    def __releaseBody(self):
+        if self._body_temp is not None:
+            self._body_temp.__exit__(None, None, None)
+            self._body_temp = None
+            self.body_file  = None
+
+
+def CreateBatchHandler(analyze, max_parallel=8):
+    """
+    Create a handler analyzing many objects per request.
+
+    analyze(obj) is called for every object on the executor of the Router,
+    at most max_parallel objects of one request are analyzed at the same time.
+    It returns a ServiceResultSet (or anything JSON serializable) and may
+    raise a tornado.web.HTTPError to report a failure of a single object.
+
+    Objects are either POSTed as JSON array or as newline delimited JSON
+    (NDJSON), or passed as repeated "obj" parameters of a GET request.
+    Results are streamed back as NDJSON in order of completion, one line per
+    object:
+        {"index": 0, "obj": "...", "result": {...}}
+        {"index": 1, "obj": "...", "status": 500, "error": "..."}
+    """
+    def analyzeTraced(index, obj):
+        with tracing.StartSpan("batch.analyze", index=index):
+            return analyze(obj)
+
+    class BatchHandler(tornado.web.RequestHandler):
+        cancelled = False
+
+        def on_connection_close(self):
+            # stop analyzing objects nobody is waiting for anymore
+            self.cancelled = True
+            super().on_connection_close()
+
+        async def get(self):
+            await self.analyze(self.get_arguments("obj", strip=False))
+
+        async def post(self):
+            try:
+                body = self.request.body.decode("utf-8").strip()
+                if body.startswith("["):
+                    objs = json.loads(body)
+                else:
+                    objs = [json.loads(line) for line in body.splitlines() if line.strip()]
+            except Exception as e:
+                raise tornado.web.HTTPError(400, "Error parsing batch: {}".format(e), reason="Bad Batch")
+            await self.analyze(objs)
+
+        async def analyze(self, objs):
+            self.set_header("Content-Type", "application/x-ndjson")
+            executor = self.application.executor
+            loop = tornado.ioloop.IOLoop.current()
+            pending = iter(enumerate(objs))
+            results = queues.Queue()
+
+            async def worker():
+                for index, obj in pending:
+                    if self.cancelled:
+                        break
+                    line = {"index": index, "obj": obj}
+                    try:
+                        # executor threads do not inherit the context, pass it
+                        # on so spans of analyze belong to the request
+                        context = contextvars.copy_context()
+                        result = await loop.run_in_executor(executor, context.run, analyzeTraced, index, obj)
+                        if isinstance(result, ServiceResultSet):
+                            result = result.dict()
+                        line["result"] = result
+                    except tornado.web.HTTPError as e:
+                        line["status"] = e.status_code
+                        line["error"] = e.log_message or e.reason
+                    except Exception as e:
+                        line["status"] = 500
+                        line["error"] = str(e)
+                    await results.put(line)
+                await results.put(None)
+
+            workers = max(1, min(max_parallel, len(objs)))
+            for _ in range(workers):
+                loop.spawn_callback(worker)
+            while workers > 0:
+                line = await results.get()
+                if line is None:
+                    workers -= 1
+                    continue
+                with tracing.StartSpan("json.encode"):
+                    self.write(json.dumps(line) + "\n")
+                await self.flush()
+    return BatchHandler
+
+
+class TracingMixin(object):
+    """
+    Request handler mixin running every request in a tracing span (see
+    tools.tracing), named after the method and path, e.g. "GET /analyze/".
+    Spans of the work done for the request become its children, the JSON
+    encoding of dicts passed to write() is a span of its own.
+    While tracing is off this costs a function call per request.
+    Do not use directly, Router wraps all endpoint handlers.
+    """
+    _span = None
+
+    def prepare(self):
+        span = tracing.StartSpan("{} {}".format(self.request.method, self.request.path), kind="server")
+        if span is not tracing.NOOP:
+            self._span = span.__enter__()
+            span.set("handler", type(self).__name__)
+        return super().prepare()
+
+    def write(self, chunk):
+        if self._span is not None and isinstance(chunk, dict):
+            with tracing.StartSpan("json.encode"):
+                return super().write(chunk)
+        return super().write(chunk)
+
+    def on_finish(self):
+        self.__end()
+        super().on_finish()
+
+    def on_connection_close(self):
+        if self._span is not None:
+            self._span.fail("connection closed")
+        self.__end()
+        super().on_connection_close()
+
+    def __end(self):
+        if self._span is not None:
+            span, self._span = self._span, None
+            span.set("status", self.get_status())
+            if self.get_status() >= 500:
+                span.fail(self._reason)
+            span.__exit__(None, None, None)
+
+
+def CreateTracingHandler(handler):
+    """
+    Wrap a tornado.web.RequestHandler class so that its requests are traced
+    (see TracingMixin). The handler code itself stays untouched.
+    """
+    return type(handler.__name__, (TracingMixin, handler), {})
+
+
 def CreateInfoHandler(metadata):
     name        = str(metadata.name       ).replace("\n", "<br>")
     version     = str(metadata.version    ).replace("\n", "<br>")
@@ -41,30 +315,97 @@ def CreateInfoHandler(metadata):
 
 
 class Router(tornado.web.Application):
-    def __init__(self, metadata, handlers):
+    def __init__(self, metadata, handlers, admission=None, executor=None, server=None):
+        """
+        Parameters:
+            metadata  - Metadata: Service description used for the info output
+            handlers  - Dict:     Endpoint names mapped to their request handler classes
+                                  ("batch" is served at /analyze/batch, see CreateBatchHandler)
+            admission - Dict:     Endpoint names mapped to an AdmissionController
+                                  limiting the load accepted by that endpoint
+            executor  - Executor: concurrent.futures executor for blocking work
+                                  (a ThreadPoolExecutor if omitted)
+            server    - Dict:     Server options overriding DEFAULT_SERVER_OPTIONS
+                                  (case insensitive, e.g. a section of the
+                                  service configuration)
+        """
         for key in ["description", "license"]:
             fpath = metadata.__getattribute__(key)
             if os.path.isfile(fpath):
                 with open(fpath) as file:
                     metadata.__setattr__(key, file.read())
 
-        handlers = [
+        self.admission = admission or {}
+        self.executor  = executor or ThreadPoolExecutor()
+        self.server    = ServerOptions(server)
+        # profiling is off by default, no handler is wrapped then
+        self.profiles  = None
+        if self.server["profiling"]:
+            self.profiles = ProfileStore(token=self.server["profilingtoken"],
+                                         max_seconds=self.server["profilingmaxseconds"])
+        endpoints = [
+            (r'/analyze/',  "analyze"),
+            (r'/analyze/batch', "batch"),
+            (r'/feed/',     "feed"),
+            (r'/check/',    "check"),
+            (r'/results/',  "results"),
+            (r'/status/',   "status"),
+        ]
+        routes = [
             (r'/',          CreateInfoHandler(metadata)),
-            (r'/analyze/',  handlers.get("analyze") or DummyHandler),
-            (r'/feed/',     handlers.get("feed")    or DummyHandler),
-            (r'/check/',    handlers.get("check")   or DummyHandler),
-            (r'/results/',  handlers.get("results") or DummyHandler),
-            (r'/status/',   handlers.get("status")  or DummyHandler),
         ]
+        for path, name in endpoints:
+            handler = handlers.get(name)
+            if handler is None:
+                if name == "batch":
+                    continue
+                handler = DummyHandler
+            if self.profiles is not None:
+                handler = CreateProfilingHandler(handler, self.profiles)
+            if name in self.admission:
+                handler = CreateAdmissionHandler(handler, self.admission[name])
+            handler = CreateTracingHandler(handler)
+            routes.append((path, handler))
+        if self.profiles is not None:
+            routes.extend(CreateDebugHandlers(self.profiles))
 
         settings = dict(
             template_path=os.path.join(os.path.dirname(__file__), 'templates'),
             static_path=os.path.join(os.path.dirname(__file__), 'static'),
         )
-        tornado.web.Application.__init__(self, handlers, **settings)
+        transforms = []
+        if self.server["compressresponse"]:
+            transforms.append(CreateCompressionTransform(
+                min_length=self.server["compressminlength"],
+                level=self.server["compresslevel"],
+                brotli_quality=self.server["brotliquality"]))
+        tornado.web.Application.__init__(self, routes, transforms=transforms, **settings)
         self.engine = None
 
     def ListenAndServe(self, httpbinding):
-        server = tornado.httpserver.HTTPServer(self)
+        server = tornado.httpserver.HTTPServer(self,
+            xheaders=self.server["xheaders"],
+            no_keep_alive=self.server["nokeepalive"],
+            idle_connection_timeout=self.server["idleconnectiontimeout"],
+            body_timeout=self.server["bodytimeout"] or None,
+            max_header_size=self.server["maxheadersize"],
+            max_body_size=self.server["maxbodysize"],
+            decompress_request=self.server["decompressrequest"])
         server.listen(httpbinding)
         tornado.ioloop.IOLoop.instance().start()
+
+
+def ServerOptions(options=None):
+    """
+    Merge the given server options into DEFAULT_SERVER_OPTIONS.
+    Returns a dict with lowercase keys.
+    Raises a ValueError for unknown options.
+    """
+    merged = {}
+    for key in DEFAULT_SERVER_OPTIONS:
+        merged[key.lower()] = DEFAULT_SERVER_OPTIONS[key]
+    for key in (options or {}):
+        if key.lower() not in merged:
+            raise ValueError("Unknown server option: {}".format(key))
+        merged[key.lower()] = options[key]
+    return merged
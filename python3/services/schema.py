@@ -0,0 +1,190 @@
+# Imports for converters
+import ipaddress
+import re
+
+
+"""
+Exported classes and converters. For public use
+"""
+
+class Field(object):
+    """
+    Declares the type of a configuration value for ParseConfig(schema=...).
+
+    The converter is called once at load time with the raw JSON value and
+    returns the ready-to-use object, raising a ValueError (or TypeError) if the
+    value is invalid. Converters accept their own output as well, so applying
+    a schema twice does no harm. Plain types (int, float, str, bool, list, dict) are
+    checked, but not converted. Ranges are checked on the converted value.
+
+    Usage:
+        schema = {
+            "MaxSize":  Field(ByteSize, minimum=1024),
+            "Timeout":  Field(Duration, maximum=300),
+            "Workers":  Field(int, minimum=1),
+            "Pattern":  Field(Regex),
+            "Internal": Field(IPNetworks),
+            "Mode":     Field(str, choices=["fast", "thorough"]),
+            "Limits": {
+                "MaxQueue": Field(int, minimum=0),
+            },
+        }
+        cfg = ParseConfig(config, schema=schema)
+    """
+    __slots__ = ["converter", "minimum", "maximum", "choices"]
+
+    def __init__(self, converter, minimum=None, maximum=None, choices=None):
+        self.converter = converter
+        self.minimum   = minimum
+        self.maximum   = maximum
+        self.choices   = choices
+
+    def convert(self, value):
+        if isinstance(self.converter, type):
+            # bool is a subclass of int, but not a valid number in a config
+            if not isinstance(value, self.converter) or (isinstance(value, bool) and self.converter is not bool):
+                if self.converter is float and isinstance(value, int) and not isinstance(value, bool):
+                    value = float(value)
+                else:
+                    raise ValueError("expected {}, got: {}".format(self.converter.__name__, type(value).__name__))
+        else:
+            value = self.converter(value)
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError("{} is below the minimum of {}".format(value, self.minimum))
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError("{} is above the maximum of {}".format(value, self.maximum))
+        if self.choices is not None and value not in self.choices:
+            raise ValueError("{} is not one of {}".format(value, self.choices))
+        return value
+
+
+def ByteSize(value):
+    """
+    Convert a size like 1048576, "512", "64K", "1.5MB" or "2 GiB" into an
+    integer number of bytes. All units are powers of 1024 (K, KB and KiB are
+    equivalent).
+    """
+    if isinstance(value, int) and not isinstance(value, bool):
+        if value < 0:
+            raise ValueError("negative size: {}".format(value))
+        return value
+    if not isinstance(value, str):
+        raise ValueError("invalid size: {!r}".format(value))
+    match = __sizeRegex.fullmatch(value.strip())
+    if not match:
+        raise ValueError("invalid size: {!r}".format(value))
+    number, unit = match.groups()
+    return int(float(number) * __sizeUnits[unit.upper()[:1]])
+
+def Duration(value):
+    """
+    Convert a duration like 30, 1.5, "250ms", "30s", "5m", "1h" or "1d" into
+    seconds (float). Plain numbers are seconds.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if value < 0:
+            raise ValueError("negative duration: {}".format(value))
+        return float(value)
+    if not isinstance(value, str):
+        raise ValueError("invalid duration: {!r}".format(value))
+    match = __durationRegex.fullmatch(value.strip())
+    if not match:
+        raise ValueError("invalid duration: {!r}".format(value))
+    number, unit = match.groups()
+    return float(number) * __durationUnits[unit.lower()]
+
+def Regex(value):
+    """
+    Compile a regular expression.
+    """
+    if isinstance(value, re.Pattern):
+        return value
+    if not isinstance(value, str):
+        raise ValueError("invalid regular expression: {!r}".format(value))
+    try:
+        return re.compile(value)
+    except re.error as e:
+        raise ValueError("invalid regular expression {!r}: {}".format(value, e))
+
+def IPNetwork(value):
+    """
+    Convert a CIDR string into an ipaddress.IPv4Network or IPv6Network
+    (host bits are allowed to be set).
+    """
+    if isinstance(value, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+        return value
+    if not isinstance(value, str):
+        raise ValueError("invalid network: {!r}".format(value))
+    return ipaddress.ip_network(value.strip(), strict=False)
+
+def IPNetworks(value):
+    """
+    Convert a list of CIDRs (or a comma separated string) into a tuple of
+    ipaddress networks.
+    """
+    if isinstance(value, str):
+        value = [cidr for cidr in value.split(",") if cidr.strip()]
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("invalid network list: {!r}".format(value))
+    return tuple(IPNetwork(cidr) for cidr in value)
+
+
+def ApplySchema(config, schema, path=""):
+    """
+    Validate and convert the values of config in place as declared by schema.
+    Keys are matched case insensitively, nested dictionaries of the schema
+    describe nested dictionaries of the config.
+
+    Raises a ValueError for missing or invalid values.
+    """
+    keymap = {}
+    for key in config:
+        keymap[__toLower(key)] = key
+
+    for key in schema:
+        name = path + str(key)
+        if __toLower(key) not in keymap:
+            raise ValueError("Missing config value {}".format(name))
+        ckey = keymap[__toLower(key)]
+        entry = schema[key]
+        if isinstance(entry, dict):
+            if not isinstance(config[ckey], dict):
+                raise ValueError("Invalid config value {}: expected dict, got: {}".format(name, type(config[ckey]).__name__))
+            ApplySchema(config[ckey], entry, name + ".")
+            continue
+        try:
+            config[ckey] = entry.convert(config[ckey])
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid config value {}: {}".format(name, e))
+
+
+"""
+Private variables and functions. Not for public use.
+"""
+
+def __toLower(key):
+    if isinstance(key, str):
+        return key.lower()
+    return key
+
+__sizeRegex = re.compile(r"(\d+(?:\.\d*)?|\.\d+)\s*((?:[KMGTP]i?)?B?)", re.IGNORECASE)
+__sizeUnits = {
+    "": 1,
+    "B": 1,
+    "K": 2 ** 10,
+    "M": 2 ** 20,
+    "G": 2 ** 30,
+    "T": 2 ** 40,
+    "P": 2 ** 50,
+}
+
+__durationRegex = re.compile(r"(\d+(?:\.\d*)?|\.\d+)\s*(us|ms|s|m|h|d|)", re.IGNORECASE)
+__durationUnits = {
+    "":   1.0,
+    "us": 1e-6,
+    "ms": 1e-3,
+    "s":  1.0,
+    "m":  60.0,
+    "h":  3600.0,
+    "d":  86400.0,
+}
@@ -0,0 +1,263 @@
+"""
+Precompiled lookup tables for inputtype (TLDs, non-public IP ranges and the
+domain name character classes) stored in a single versioned binary file.
+
+The file is mapped read-only, so all service processes on a node share the
+same physical pages instead of each building its own dict and network lists.
+Use inputtype.BuildValidationTables / inputtype.InitializeValidationTables,
+or build the file from the command line:
+
+    python3 -m python3.services.validationtables iana-tld-list.txt validation.tables
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+
+
+MAGIC   = b"HOLMESVT"
+VERSION = 1
+
+# section ids
+TLD_INDEX    = 1
+TLD_DATA     = 2
+IPV4_RANGES  = 3
+IPV6_RANGES  = 4
+CHAR_CLASSES = 5
+TLD_HASH     = 6
+
+# magic, version, byteorder, number of sections, digest of the built-in tables
+HEADER    = struct.Struct("<8sIBxxxI32s")
+# section id, offset, length
+SECTION   = struct.Struct("<IQQ")
+BYTEORDER = 0 if sys.byteorder == "little" else 1
+
+
+class ValidationTables(object):
+    """
+    Read-only view on a validation tables file, see WriteValidationTables.
+
+    Raises a ValueError if the file is not a valid tables file, was written
+    by a different version, on a machine with a different byte order, or
+    from different built-in tables (digest mismatch).
+    """
+    __slots__ = ["path", "tldCount", "charClasses",
+                 "_map", "_tldIndex", "_tldHash", "_tldData", "_ipv4", "_ipv6", "_views"]
+
+    def __init__(self, path, digest):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            self.__parse(digest)
+        except:
+            self.close()
+            raise
+
+    def __parse(self, digest):
+        if len(self._map) < HEADER.size:
+            raise ValueError("{}: file too short".format(self.path))
+        magic, version, byteorder, count, fileDigest = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError("{}: not a validation tables file".format(self.path))
+        if version != VERSION:
+            raise ValueError("{}: unsupported version {}".format(self.path, version))
+        if byteorder != BYTEORDER:
+            raise ValueError("{}: written on a machine with a different byte order".format(self.path))
+        if fileDigest != digest:
+            raise ValueError("{}: built from different tables, rebuild it".format(self.path))
+
+        sections = {}
+        for i in range(count):
+            sid, offset, length = SECTION.unpack_from(self._map, HEADER.size + i * SECTION.size)
+            if offset + length > len(self._map):
+                raise ValueError("{}: section {} out of bounds".format(self.path, sid))
+            sections[sid] = (offset, length)
+        for sid in (TLD_INDEX, TLD_HASH, TLD_DATA, IPV4_RANGES, IPV6_RANGES, CHAR_CLASSES):
+            if sid not in sections:
+                raise ValueError("{}: section {} is missing".format(self.path, sid))
+
+        self._tldIndex = self.__view(sections[TLD_INDEX], "I")
+        self._tldHash  = self.__view(sections[TLD_HASH], "I")
+        self._tldData  = sections[TLD_DATA][0]
+        self.tldCount  = len(self._tldIndex) - 1
+        self._ipv4 = _Ranges(self.__view(sections[IPV4_RANGES], "I"), 1)
+        self._ipv6 = _Ranges(self.__view(sections[IPV6_RANGES], "Q"), 2)
+        self.charClasses = self.__view(sections[CHAR_CLASSES], "B")
+
+    def __view(self, section, fmt):
+        offset, length = section
+        view = memoryview(self._map)[offset:offset+length].cast(fmt)
+        self._views.append(view)
+        return view
+
+    def hasTLD(self, tld):
+        """
+        Check whether tld (without the leading dot, any case) is in the table.
+        """
+        try:
+            key = tld.upper().encode("ascii")
+        except UnicodeEncodeError:
+            return False
+        slots, index, base = self._tldHash, self._tldIndex, self._tldData
+        mask = len(slots) - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            entry = slots[slot]
+            if entry == 0:
+                return False
+            if self._map[base+index[entry-1]:base+index[entry]] == key:
+                return True
+            slot = (slot + 1) & mask
+
+    def isNonpublic(self, ip):
+        """
+        Check whether the ipaddress.IPv4Address or IPv6Address ip lies in one
+        of the non-public ranges.
+        """
+        if ip.version == 4:
+            return int(ip) in self._ipv4
+        return int(ip) in self._ipv6
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._map.close()
+
+
+class _Ranges(object):
+    """
+    Sorted, non-overlapping, inclusive integer ranges stored as a flat array
+    of start values followed by the end values. Every value consists of words
+    unsigned native integers (most significant first).
+    """
+    __slots__ = ["starts", "ends"]
+
+    def __init__(self, view, words):
+        count = len(view) // words // 2
+        self.starts = _Words(view, words, 0, count)
+        self.ends   = _Words(view, words, count, count)
+
+    def __contains__(self, value):
+        i = bisect.bisect_right(self.starts, value) - 1
+        return i >= 0 and value <= self.ends[i]
+
+
+class _Words(object):
+    __slots__ = ["view", "words", "first", "count"]
+
+    def __init__(self, view, words, first, count):
+        self.view  = view
+        self.words = words
+        self.first = first
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0 or i >= self.count:
+            raise IndexError(i)
+        if self.words == 1:
+            return self.view[self.first + i]
+        pos = (self.first + i) * self.words
+        value = 0
+        for word in self.view[pos:pos+self.words]:
+            value = (value << 64) | word
+        return value
+
+
+def WriteValidationTables(path, tlds, ipv4nets, ipv6nets, charClasses, digest):
+    """
+    Write the tables to path. The file is written next to its destination
+    and renamed afterwards, processes still mapping an older version keep
+    their (now unlinked) copy.
+
+    Parameters:
+        tlds        - Iterable of str: top level domains (any case)
+        ipv4nets    - List of ipaddress.IPv4Network
+        ipv6nets    - List of ipaddress.IPv6Network
+        charClasses - Bytes: 256 character class values
+        digest      - Bytes: 32 byte digest identifying the built-in tables
+    """
+    if len(digest) != 32:
+        raise ValueError("digest must be 32 bytes long")
+    if len(charClasses) != 256:
+        raise ValueError("charClasses must contain 256 entries")
+
+    names = sorted(set(tld.upper().encode("ascii") for tld in tlds))
+    index = array("I", [0])
+    for name in names:
+        index.append(index[-1] + len(name))
+
+    # open addressing hash table (linear probing, at most half full), every
+    # slot holds the number of the entry plus one, zero marks an empty slot
+    size = 16
+    while size < 2 * len(names):
+        size *= 2
+    slots = array("I", [0]) * size
+    for i, name in enumerate(names):
+        slot = zlib.crc32(name) & (size - 1)
+        while slots[slot] != 0:
+            slot = (slot + 1) & (size - 1)
+        slots[slot] = i + 1
+
+    sections = [
+        (TLD_INDEX,    index.tobytes()),
+        (TLD_HASH,     slots.tobytes()),
+        (TLD_DATA,     b"".join(names)),
+        (IPV4_RANGES,  __packRanges(ipv4nets, 1).tobytes()),
+        (IPV6_RANGES,  __packRanges(ipv6nets, 2).tobytes()),
+        (CHAR_CLASSES, bytes(charClasses)),
+    ]
+
+    offset = HEADER.size + SECTION.size * len(sections)
+    table, body = [], []
+    for sid, data in sections:
+        padding = -offset % 8  # keep the arrays aligned
+        body.append(b"\0" * padding)
+        offset += padding
+        table.append(SECTION.pack(sid, offset, len(data)))
+        body.append(data)
+        offset += len(data)
+
+    tmp = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BYTEORDER, len(sections), digest))
+        f.write(b"".join(table))
+        f.write(b"".join(body))
+    os.replace(tmp, path)
+
+
+def __packRanges(networks, words):
+    ranges = sorted((int(net.network_address), int(net.broadcast_address)) for net in networks)
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    packed = array("I" if words == 1 else "Q")
+    for column in (0, 1):
+        for entry in merged:
+            value = entry[column]
+            for shift in reversed(range(words)):
+                packed.append((value >> (64 * shift)) & 0xFFFFFFFFFFFFFFFF)
+    return packed
+
+def main():
+    if len(sys.argv) != 3:
+        print("usage: python3 -m python3.services.validationtables TLDLIST OUTPUT", file=sys.stderr)
+        sys.exit(2)
+    from python3.services.inputtype import BuildValidationTables
+    BuildValidationTables(sys.argv[1], sys.argv[2])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import unittest
+from python3.services.admission import AdmissionController
+from python3.services.router import Router
+from python3.services.configuration import Metadata
+
+import tornado.gen
+import tornado.web
+import asyncio
+import threading
+import requests
+import socket
+import time
+
+
+class TServer(threading.Thread):
+    def __init__(self, metadata, analysisHandler, admission, address):
+        self.router = Router(metadata=metadata, handlers={
+            "analyze": analysisHandler
+        }, admission=admission)
+        self.address = address
+        threading.Thread.__init__(self)
+        self.daemon  = True
+    def run(self):
+        self.router.ListenAndServe(self.address)
+
+
+class AdmissionTest(unittest.TestCase):
+
+    def test_0_priorities(self):
+        controller = AdmissionController(max_inflight=1, max_queue=3)
+        order = []
+
+        async def request(name, priority):
+            ok, _ = await controller.admit(controller.priority(priority))
+            self.assertTrue(ok)
+            order.append(name)
+            await asyncio.sleep(0.01)
+            controller.release()
+
+        async def run():
+            await asyncio.gather(
+                request("first",  "normal"),
+                request("low",    "low"),
+                request("normal", "normal"),
+                request("high",   "high"),
+            )
+
+        asyncio.run(run())
+        self.assertEqual(order, ["first", "high", "normal", "low"])
+        self.assertEqual(controller.inflight, 0)
+        self.assertEqual(controller.waiting, 0)
+
+    def test_1_shedding(self):
+        controller = AdmissionController(max_inflight=1, max_queue=1)
+
+        class AnalysisHandler(tornado.web.RequestHandler):
+            async def get(self):
+                await tornado.gen.sleep(0.5)
+                self.write("done")
+
+        port = 7778
+        address = "http://127.0.0.1:"+str(port)
+
+        exampleMetadata = Metadata(
+            name="test-service",
+            version="1.0",
+            description="some fancy description",
+            copyright="you can copy as much as you like",
+            license="provided without any license"
+        )
+        server = TServer(exampleMetadata, AnalysisHandler, {"analyze": controller}, port)
+        server.start()
+        time.sleep(0.5)
+
+        responses = []
+        def fetch():
+            responses.append(requests.get(address+"/analyze/", params={"obj":"x"}))
+        threads = [threading.Thread(target=fetch) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+
+        codes = sorted(r.status_code for r in responses)
+        self.assertEqual(codes, [200, 200, 503])
+        self.assertEqual([r.headers.get("Retry-After") for r in responses if r.status_code == 503], ["1"])
+
+        expired = requests.get(address+"/analyze/", headers={"X-Deadline": str(time.time()-1)})
+        self.assertEqual(expired.status_code, 504)
+
+        self.assertEqual(controller.stats(), {
+            "inflight": 0,
+            "waiting":  0,
+            "admitted": 2,
+            "shed":     1,
+            "expired":  1,
+        })
+
+    def test_2_disconnect(self):
+        controller = AdmissionController(max_inflight=1, max_queue=4)
+        running = []
+        peak = []
+
+        class AnalysisHandler(tornado.web.RequestHandler):
+            async def get(self):
+                running.append(self)
+                peak.append(len(running))
+                await tornado.gen.sleep(0.5)
+                running.remove(self)
+                self.write("done")
+
+        port = 7786
+        address = "http://127.0.0.1:"+str(port)
+
+        exampleMetadata = Metadata(
+            name="test-service",
+            version="1.0",
+            description="some fancy description",
+            copyright="you can copy as much as you like",
+            license="provided without any license"
+        )
+        server = TServer(exampleMetadata, AnalysisHandler, {"analyze": controller}, port)
+        server.start()
+        time.sleep(0.5)
+
+        # the client goes away while its request is processed
+        client = socket.create_connection(("127.0.0.1", port))
+        client.sendall(b"GET /analyze/?obj=x HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+        time.sleep(0.1)
+        client.close()
+        time.sleep(0.1)
+        self.assertEqual(controller.stats()["inflight"], 1)
+
+        response = requests.get(address+"/analyze/", params={"obj":"x"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(max(peak), 1)
+        time.sleep(0.1)  # the slot is released after the response was sent
+        self.assertEqual(controller.stats()["inflight"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import bz2
+import gzip
+import io
+import lzma
+import os
+import tarfile
+import tempfile
+import zipfile
+from python3.tools.files import ArchiveUnpacker, MmapFileReader, UnpackLimitError, MEGABYTE
+
+
+contents = {
+    "a.txt":         b"".join(b"line %d\n" % i for i in range(1000)),
+    "dir/b.bin":     os.urandom(300000),
+    "dir/sub/c.txt": b"",
+}
+
+def zipped(compression=zipfile.ZIP_DEFLATED):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w", compression) as archive:
+        archive.writestr("dir/", b"")
+        for name, content in contents.items():
+            archive.writestr(name, content)
+    return data.getvalue()
+
+def tarred(mode="w"):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode=mode) as archive:
+        for name, content in contents.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+        info = tarfile.TarInfo("link")
+        info.type = tarfile.SYMTYPE
+        info.linkname = "a.txt"
+        archive.addfile(info)
+    return data.getvalue()
+
+def unpack(source, **kwargs):
+    with ArchiveUnpacker(source, **kwargs) as unpacker:
+        return {member.name: member.read() for member in unpacker}
+
+
+class ArchiveUnpackerTest(unittest.TestCase):
+
+    def test_0_formats(self):
+        for data in (zipped(), zipped(zipfile.ZIP_BZIP2), zipped(zipfile.ZIP_LZMA), tarred(),
+                     tarred("w:gz"), tarred("w:bz2"), tarred("w:xz")):
+            self.assertEqual(unpack(data), contents)
+            self.assertEqual(unpack(io.BytesIO(data)), contents)
+        self.assertEqual(unpack(zipped(), workers=3), contents)
+        payload = contents["a.txt"]
+        for compress in (gzip.compress, bz2.compress, lzma.compress):
+            self.assertEqual(unpack(compress(payload)), {"data": payload})
+        self.assertEqual(unpack(b"not an archive"), {"data": b"not an archive"})
+
+    def test_1_sources(self):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as file:
+            file.write(b"prefix" + zipped())
+        try:
+            with open(path, "rb") as file:
+                file.seek(6)
+                self.assertEqual(unpack(file), contents)
+            with MmapFileReader(path) as reader:
+                self.assertEqual(unpack(reader.subfile(6)), contents)
+                with ArchiveUnpacker(reader.subfile(6), max_memory_size=0) as unpacker:
+                    for member in unpacker:
+                        if member.size:
+                            self.assertEqual(member.reader()[0:member.size], contents[member.name])
+                        else:
+                            self.assertIsNone(member.reader())
+        finally:
+            os.remove(path)
+
+    def test_2_limits(self):
+        bomb = gzip.compress(bytes(20 * MEGABYTE))
+        with self.assertRaises(UnpackLimitError):
+            unpack(bomb)
+        self.assertEqual(len(unpack(bomb, max_ratio=10000)["data"]), 20 * MEGABYTE)
+        with self.assertRaises(UnpackLimitError):
+            unpack(bomb, max_ratio=10000, max_total_size=MEGABYTE)
+        with self.assertRaises(UnpackLimitError):
+            unpack(tarred(), max_members=2)
+        with self.assertRaises(UnpackLimitError):
+            unpack(zipped(), max_members=2)
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("zeros", bytes(5 * MEGABYTE))
+            archive.writestr("random", os.urandom(MEGABYTE))
+        with self.assertRaises(UnpackLimitError):
+            unpack(data.getvalue(), max_ratio=50)  # the zeros member alone exceeds the ratio
+
+    def test_3_forged_sizes(self):
+        # sizes in the headers claim 512 MB per member, no space may be reserved for them
+        data = io.BytesIO()
+        with zipfile.ZipFile(data, "w", zipfile.ZIP_STORED) as archive:
+            for i in range(5):
+                archive.writestr("member{}".format(i), b"x" * 100)
+            for info in archive.infolist():
+                info.file_size = 512 * MEGABYTE
+        with ArchiveUnpacker(data.getvalue(), max_memory_size=0, max_total_size=1024*MEGABYTE) as unpacker:
+            members = list(unpacker)
+            self.assertEqual([member.size for member in members], [100] * 5)
+            for member in members:
+                self.assertLess(os.fstat(member.file.fileno()).st_blocks * 512, MEGABYTE)
+
+
+if __name__ == '__main__':
+    unittest.main()
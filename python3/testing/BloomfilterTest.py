@@ -0,0 +1,115 @@
+import unittest
+import hashlib
+import ipaddress
+import os
+import tempfile
+import requests
+from tornado.web import HTTPError
+from python3.tools.bloomfilter import BloomFilter, Prechecked
+from python3.tools.storageutils import Storage
+from python3.services.inputtype import (
+    Errors,
+    ParseEmail,
+    ValidateIP,
+    ValidateDomain,
+    ValidateEmail,
+    __initTldMapHelper as initTldMapHelper, # normally don't do that, instead import InitializeTLDMap(path)
+)
+
+
+def sha256(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+
+class BloomfilterTest(unittest.TestCase):
+
+    def test_0_membership(self):
+        bloom = BloomFilter(capacity=10000, error_rate=0.01)
+        bloom.update(sha256(i) for i in range(10000))
+        self.assertEqual(len(bloom), 10000)
+        for i in range(10000):
+            self.assertIn(sha256(i), bloom)
+        falsePositives = sum(sha256(i) in bloom for i in range(10000, 30000))
+        self.assertLess(falsePositives / 20000, 0.02)
+
+        with self.assertRaises(ValueError):
+            BloomFilter(0)
+        with self.assertRaises(ValueError):
+            BloomFilter(10, error_rate=1)
+
+    def test_1_merge(self):
+        a, b = BloomFilter(1000), BloomFilter(1000)
+        a.add("a")
+        b.add(b"b")
+        merged = a | b
+        self.assertIn("a", merged)
+        self.assertIn("b", merged)
+        self.assertNotIn("b", a)
+        a.merge(b)
+        self.assertIn("b", a)
+        with self.assertRaises(ValueError):
+            a.merge(BloomFilter(2000))
+        # bit arrays spanning several merge blocks
+        keys = [sha256(i) for i in range(200000)]
+        a, b = BloomFilter(200000), BloomFilter(200000)
+        a.update(keys[::2])
+        b.update(keys[1::2])
+        expected = bytes(x | y for x, y in zip(a.bits, b.bits))
+        a.merge(b)
+        self.assertEqual(bytes(a.bits), expected)
+        self.assertTrue(all(key in a for key in keys))
+
+    def test_2_persistence(self):
+        bloom = BloomFilter(1000, 0.001)
+        bloom.update(sha256(i) for i in range(1000))
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, "samples.bloom")
+        bloom.save(path)
+
+        loaded = BloomFilter.load(path)
+        self.assertTrue(loaded.readonly)
+        self.assertEqual((loaded.size, loaded.hashes, len(loaded)), (bloom.size, bloom.hashes, 1000))
+        self.assertTrue(all(sha256(i) in loaded for i in range(1000)))
+        with self.assertRaises(TypeError):
+            loaded.add("new")
+        loaded.close()
+
+        writable = BloomFilter.load(path, writable=True)
+        writable.add("new")
+        self.assertIn("new", writable)
+
+        with open(path, "r+b") as f:
+            f.truncate(100)
+        with self.assertRaises(ValueError):
+            BloomFilter.load(path)
+        directory.cleanup()
+
+    def test_3_storage(self):
+        known = BloomFilter(100)
+        # nothing listens on this port, a request would fail with a connection error
+        storage = Storage(address="http://127.0.0.1:1", user_id="user-1", known_samples=known)
+        with self.assertRaises(HTTPError):
+            storage.getSample(sha256(1))
+        # known hashes are looked up in lowercase, as submitSample adds them
+        known.add(sha256(2))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            storage.getSample(sha256(2).upper())
+
+    def test_4_blocklist(self):
+        initTldMapHelper("COM\nDE\n")
+        blocked = {"evil.com", "spam@good.com", "8.8.4.4"}
+        bloom = BloomFilter(100)
+        bloom.update(blocked)
+        for blocklist in (blocked, Prechecked(bloom, blocked)):
+            self.assertEqual(ValidateDomain("EVIL.com", blocklist=blocklist), (False, Errors.BlocklistedError))
+            self.assertEqual(ValidateDomain("good.com", blocklist=blocklist), (True, None))
+            self.assertEqual(ValidateIP(ipaddress.ip_address("8.8.4.4"), blocklist=blocklist), (False, Errors.BlocklistedError))
+            self.assertEqual(ValidateIP(ipaddress.ip_address("8.8.8.8"), blocklist=blocklist), (True, None))
+            self.assertEqual(ValidateEmail(ParseEmail("spam@good.com"), blocklist=blocklist), (False, Errors.BlocklistedError))
+            self.assertEqual(ValidateEmail(ParseEmail("anyone@evil.com"), blocklist=blocklist), (False, Errors.BlocklistedError))
+            self.assertEqual(ValidateEmail(ParseEmail("ham@good.com"), blocklist=blocklist), (True, None))
+            self.assertEqual(ValidateEmail(ParseEmail("x@[8.8.4.4]"), blocklist=blocklist), (False, Errors.BlocklistedError))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import ipaddress
+import sys
+from python3.services.inputtype import (
+    Detect,
+    Types,
+    ParseEmails,
+    __initTldMapHelper as initTldMapHelper, # normally don't do that, instead import InitializeTLDMap(path)
+)
+from python3.services.detections import DetectionBatch, StringTable
+
+
+def fields(result):
+    t, obj, err = result
+    if t == Types.Email:
+        obj = (obj.fullname, obj.user, obj.domain, obj.ip)
+    return t, obj, err
+
+
+class DetectionsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        initTldMapHelper("COM\nDE\n")
+
+    def test_0_roundtrip(self):
+        inputs = [
+            "www.domain.de",
+            "127.0.0.1",
+            "2001:db8::1",
+            "ffff:ffff:ffff:ffff:ffff:ffff:ffff:ffff",
+            "10.1.2.3/8",
+            "2001:db8::/32",
+            "somename@somedomain.com",
+            "Max Musterman <max@musterman.com>",
+            "somename@[34.128.94.77]",
+            "somename@[::1]",
+            "webmaster123ya##ösäf@somedomain.com",
+            "",
+            b"bytes.example.com",
+        ]
+        batch = DetectionBatch()
+        for _input in inputs:
+            batch.append(_input)
+        self.assertEqual(len(batch), len(inputs))
+        for i, _input in enumerate(inputs):
+            self.assertEqual(fields(batch[i]), fields(Detect(_input)), repr(_input))
+            self.assertEqual(batch.type(i), Detect(_input)[0])
+        self.assertEqual([fields(r) for r in batch], [fields(Detect(_input)) for _input in inputs])
+
+    def test_1_memory(self):
+        lines = []
+        for i in range(20000):
+            lines.append("user{}@domain{}.com\n".format(i % 100, i % 10))
+            lines.append("10.{}.{}.{}\n".format(i % 256, i // 256 % 256, i % 7))
+            lines.append("host{}.example.com\n".format(i % 500))
+
+        batch = DetectionBatch()
+        batch.extend(lines)
+        self.assertEqual(len(batch), len(lines))
+        # 100 users, 10 domains, the empty full name and 500 hosts
+        self.assertEqual(len(batch.table), 611)
+        self.assertEqual(batch[1], (Types.IP, ipaddress.ip_address("10.0.0.0"), None))
+
+        results = [Detect(line.rstrip("\n")) for line in lines]
+        size = sys.getsizeof(results)
+        for t, obj, err in results:
+            size += sys.getsizeof((t, obj, err)) + sys.getsizeof(obj)
+            if t == Types.Email:
+                size += sum(sys.getsizeof(v) for v in (obj.fullname, obj.user, obj.domain))
+        self.assertLess(batch.memoryUsage(), size / 4)
+
+    def test_2_intern(self):
+        table = StringTable()
+        emails = list(ParseEmails(["a@example.com", "b@example.com", "a@example.com"], table=table))
+        self.assertIs(emails[0].domain, emails[1].domain)
+        self.assertIs(emails[0].user, emails[2].user)
+        self.assertEqual(len(table), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
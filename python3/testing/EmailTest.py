@@ -0,0 +1,172 @@
+import unittest
+import random
+import re
+import ipaddress
+from python3.services.inputtype import (
+    Detect,
+    Email,
+    Errors,
+    Types,
+    ParseEmail,
+    ParseEmails,
+    ValidateEmail,
+    ValidateEmails,
+    __initTldMapHelper as initTldMapHelper, # normally don't do that, instead import InitializeTLDMap(path)
+    __isDomainName as isDomainName,
+)
+
+
+"""
+Reference implementation: the multi-pass parser the single pass parser
+replaced. Kept here verbatim (apart from the empty domain, which crashed with
+an IndexError) to check both produce the same results.
+"""
+
+def referenceIsAscii(s):
+    return isinstance(s, str) and len(s) == len(s.encode())
+
+def referenceDetectIP(_input):
+    try:
+        return ipaddress.ip_address(_input)
+    except ValueError:
+        return None
+
+def referenceDetectEmail(_input):
+    if _input:
+        fullname = ""
+        if _input[-1] == '>':
+            pos = _input.rfind('<')
+            if pos >= 0:
+                fullname = _input[:pos].strip()
+                _input = (_input[pos+1:-1]).strip()
+        if '@' in _input:
+            user, domain = _input.rsplit('@', 1)
+            if referenceIsAscii(_input):
+                if isDomainName(domain):
+                    return Email(fullname, user, domain)
+                if domain and domain[0]=="[" and domain[-1] == "]":
+                    ip = referenceDetectIP(domain[1:-1])
+                    if ip:
+                        return Email(fullname, user, None, ip)
+    return None
+
+
+alphabet = "aZ_09-.@<>[] \t\"\\!#ä"
+def randomInput():
+    return "".join(random.choice(alphabet) for _ in range(random.randint(0, 24)))
+
+def randomAddress():
+    labels = [
+        "".join(random.choice("ab1-_") for _ in range(random.randint(0, 5)))
+        for _ in range(random.randint(1, 4))
+    ]
+    address = random.choice(["user", "a.b", "x y", "\"q\"", "", "@"]) + "@" + ".".join(labels)
+    return random.choice([
+        "{}",
+        "Name <{}>",
+        " Some Name< {} > ",
+        "<{}>",
+        "a<b> <{}>",
+        "{} <x>",
+        "{}.",
+        "{}-",
+        "{}@[127.0.0.1]",
+        "user@[{}]",
+    ]).format(address)
+
+def fields(email):
+    if email is None:
+        return None
+    return (email.fullname, email.user, email.domain, email.ip)
+
+
+class EmailTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        initTldMapHelper("COM\nDE\n")
+
+    def test_0_equivalence(self):
+        random.seed(4711)
+        inputs = [
+            "somename@somedomain.com",
+            "Max Musterman <max@musterman.com>",
+            "Max Musterman <max@musterman.com",
+            "Max Musterman max@musterman.com>",
+            "somename@[34.128.94.77]",
+            "somename@[::1]",
+            "somename@[]",
+            "somename@",
+            "@",
+            "a@b@c.de",
+            "webmaster123ya##ösäf@somedomain.com",
+            "x@" + "a." * 127 + "de",
+            "x@" + "a." * 128 + "de",
+            "x@" + "a" * 63 + ".de",
+            "x@" + "a" * 64 + ".de",
+            "x@1.2",
+            "x@1.a",
+            "x@a.",
+            "x@.a",
+            "x@a..de",
+            "x@-a.de",
+            "x@a-.de",
+            "\ud800@a.de",
+            "a\n<b@c.de>\n",
+            "<\n b@c.de \n>",
+        ]
+        inputs += [randomInput() for _ in range(20000)]
+        inputs += [randomAddress() for _ in range(20000)]
+
+        for _input in inputs:
+            try:
+                expected = referenceDetectEmail(_input)
+            except UnicodeEncodeError:
+                expected = None  # lone surrogates crashed the old is_ascii check
+            self.assertEqual(fields(ParseEmail(_input)), fields(expected), repr(_input))
+
+    def test_1_domains(self):
+        random.seed(4712)
+        for _ in range(20000):
+            domain = "".join(random.choice("aZ_09-.") for _ in range(random.randint(0, 12)))
+            email = ParseEmail("x@" + domain)
+            self.assertEqual(email is not None, isDomainName(domain), repr(domain))
+
+    def test_2_bulk(self):
+        lines = [
+            b"somename@somedomain.com\n",
+            "Max Musterman <max@musterman.com>\r\n",
+            "invalid\n",
+            "some name@domain.de\n",
+            "other@[10.0.0.1]\n",
+            "user@invalidtld.eu",
+        ]
+        self.assertEqual([fields(e) for e in ParseEmails(lines)], [
+            ("", "somename", "somedomain.com", None),
+            ("Max Musterman", "max", "musterman.com", None),
+            None,
+            ("", "some name", "domain.de", None),
+            ("", "other", None, ipaddress.ip_address("10.0.0.1")),
+            ("", "user", "invalidtld.eu", None),
+        ])
+        results = [(ok, err) for _, ok, err in ValidateEmails(lines)]
+        self.assertEqual(results, [
+            (True,  None),
+            (True,  None),
+            (False, Errors.InvalidEmailError),
+            (False, Errors.InvalidEmailError),
+            (False, Errors.IPisNotPublicError),
+            (False, Errors.InvalidTLDError),
+        ])
+        for email, ok, err in ValidateEmails(lines):
+            if email is not None:
+                self.assertEqual(ValidateEmail(email), (ok, err))
+
+        t, email, err = Detect("Max Musterman <max@musterman.com>")
+        self.assertEqual(t, Types.Email)
+        with self.assertRaises(AttributeError):
+            email.extra = True  # compact record, no __dict__
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+import math
+import os
+import random
+import tempfile
+from collections import Counter
+from python3.tools import entropy
+from python3.tools.entropy import ByteHistogram, Entropy, EntropyProfile, EntropyAnalysis
+from python3.tools.files import MmapFileReader
+
+
+def referenceEntropy(data):
+    if not data:
+        return 0.0
+    return -sum(c / len(data) * math.log2(c / len(data)) for c in Counter(data).values())
+
+def referenceProfile(data, window, step):
+    return [referenceEntropy(data[i:i+window]) for i in range(0, len(data) - window + 1, step)]
+
+
+class EntropyTest(unittest.TestCase):
+
+    def setUp(self):
+        rand = random.Random(7)
+        # low entropy text, random data and zeros
+        self.data = (b"some text " * 500) + bytes(rand.getrandbits(8) for _ in range(7000)) + bytes(3001)
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as file:
+            file.write(self.data)
+        self.numpy = entropy.numpy
+
+    def tearDown(self):
+        entropy.numpy = self.numpy
+        os.remove(self.path)
+
+    def check(self):
+        data = self.data
+        histogram = [data.count(bytes([value])) for value in range(256)]
+        with MmapFileReader(self.path) as reader:
+            for source in (data, reader):
+                self.assertEqual(ByteHistogram(source, chunk_size=1000), histogram)
+                self.assertAlmostEqual(Entropy(source), referenceEntropy(data))
+                for window, step, chunk_size in ((256, None, 4096), (1024, 256, 1000), (4096, 512, 3000), (100, 1, 997)):
+                    profile = EntropyProfile(source, window, step, precision=6, chunk_size=chunk_size)
+                    expected = referenceProfile(data, window, step or window)
+                    self.assertEqual(len(profile), len(expected))
+                    for value, reference in zip(profile, expected):
+                        self.assertAlmostEqual(value, reference, places=5)
+            subfile = reader.subfile(5000)
+            self.assertEqual(ByteHistogram(subfile), [data[5000:].count(bytes([v])) for v in range(256)])
+        self.assertEqual(Entropy(b""), 0.0)
+        self.assertEqual(EntropyProfile(b"abc", 4), [])
+        self.assertEqual(Entropy(bytes(100)), 0.0)
+        self.assertEqual(Entropy(bytes(range(256))), 8.0)
+        with self.assertRaises(ValueError):
+            EntropyProfile(data, 100, 30)
+
+    def test_0_numpy(self):
+        if entropy.numpy is None:
+            self.skipTest("numpy not installed")
+        self.check()
+
+    def test_1_python(self):
+        entropy.numpy = None
+        self.check()
+
+    def test_2_analysis(self):
+        result = EntropyAnalysis(self.data, window=1024, precision=2)
+        self.assertEqual(result["size"], len(self.data))
+        self.assertEqual(result["entropy"], round(referenceEntropy(self.data), 2))
+        self.assertEqual(len(result["histogram"]), 256)
+        self.assertEqual(result["profile"]["step"], 1024)
+        self.assertEqual(len(result["profile"]["entropy"]), len(self.data) // 1024)
+        self.assertEqual(result["profile"]["entropy"][0], round(referenceEntropy(self.data[:1024]), 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
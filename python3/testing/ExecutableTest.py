@@ -0,0 +1,130 @@
+import unittest
+import os
+import struct
+import sys
+import tempfile
+from python3.tools.files import MmapFileReader
+from python3.tools.executable import ExecutableFormatError, ExecutableParser, ParseExecutable, PEFile, ELFFile
+
+
+def buildPE():
+    # PE32+ DLL with one section holding an import and an export table
+    data = bytearray(0x600)
+    data[0:2] = b"MZ"
+    struct.pack_into("<I", data, 0x3c, 0x40)
+    struct.pack_into("<4sHHIIIHH", data, 0x40, b"PE\x00\x00", 0x8664, 1, 0x12345678, 0, 0, 240, 0x2022)
+    struct.pack_into("<HBBIIIIIQIIHHHHHHIIIIHHQQQQII", data, 0x58, 0x20b, 14, 0, 0x400, 0, 0, 0x1010, 0x1000,
+                     0x180000000, 0x1000, 0x200, 6, 0, 0, 0, 6, 0, 0, 0x2000, 0x200, 0, 2, 0x160,
+                     0x100000, 0x1000, 0x100000, 0x1000, 0, 16)
+    struct.pack_into("<II", data, 0x58 + 112, 0x1100, 0x100)      # export directory
+    struct.pack_into("<II", data, 0x58 + 120, 0x1000, 0x28)       # import directory
+    struct.pack_into("<8sIIIIIIHHI", data, 0x148, b".text", 0x400, 0x1000, 0x400, 0x200, 0, 0, 0, 0, 0x60000020)
+
+    def put(rva, fmt, *values):
+        struct.pack_into(fmt, data, rva - 0x1000 + 0x200, *values)
+    put(0x1000, "<IIIII", 0x1040, 0, 0, 0x1080, 0x1040)
+    put(0x1040, "<QQQ", 0x1090, (1 << 63) | 7, 0)
+    put(0x1080, "13s", b"KERNEL32.dll")
+    put(0x1090, "<H12s", 0, b"ExitProcess")
+    put(0x1100, "<IIHHIIIIIII", 0, 0, 0, 0, 0x1140, 1, 2, 2, 0x1160, 0x1170, 0x1180)
+    put(0x1140, "9s", b"test.dll")
+    put(0x1160, "<II", 0x1010, 0x11a0)
+    put(0x1170, "<II", 0x1190, 0x1198)
+    put(0x1180, "<HH", 0, 1)
+    put(0x1190, "4s", b"Run")
+    put(0x1198, "4s", b"Fwd")
+    put(0x11a0, "14s", b"NTDLL.RtlExit")
+    return bytes(data)
+
+
+class ExecutableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.files = []
+
+    def tearDown(self):
+        for path in self.files:
+            os.remove(path)
+
+    def write(self, data):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        self.files.append(path)
+        return path
+
+    def test_0_pe(self):
+        data = buildPE()
+        with MmapFileReader(self.write(data)) as reader:
+            pe = ParseExecutable(reader)
+            self.assertIsInstance(pe, PEFile)
+            self.assertEqual((pe.bits, pe.machine, pe.type, pe.entry_point), (64, "amd64", "dll", 0x1010))
+            self.assertEqual(pe.file_header.TimeDateStamp, 0x12345678)
+            self.assertEqual(pe.optional_header.ImageBase, 0x180000000)
+            self.assertEqual(len(pe.data_directories), 16)
+            self.assertEqual(pe.rvaToOffset(0x1010), 0x210)
+            self.assertIsNone(pe.rvaToOffset(0x5000))
+
+            section = pe.section(".text")
+            self.assertEqual((section.address, section.offset, section.size), (0x1000, 0x200, 0x400))
+            subfile = section.reader()
+            self.assertEqual(len(subfile) - subfile.tell(), 0x400)
+            self.assertEqual(subfile[0x80:0x8c], b"KERNEL32.dll")
+            self.assertEqual(subfile.find(b"KERNEL32"), 0x80)
+
+            self.assertEqual(pe.imports, [
+                {"library": "KERNEL32.dll", "name": "ExitProcess", "ordinal": None},
+                {"library": "KERNEL32.dll", "name": None, "ordinal": 7},
+            ])
+            self.assertEqual(pe.libraries, ["KERNEL32.dll"])
+            self.assertEqual(pe.exports, [
+                {"name": "Run", "ordinal": 1, "address": 0x1010, "forwarder": None},
+                {"name": "Fwd", "ordinal": 2, "address": 0x11a0, "forwarder": "NTDLL.RtlExit"},
+            ])
+            info = pe.info()
+            self.assertEqual(info["sections"][0]["name"], ".text")
+            self.assertEqual(info["headers"]["file_header"]["NumberOfSections"], 1)
+
+        # executables inside other files are parsed relative to the subfile
+        with MmapFileReader(self.write(b"\x00" * 100 + data)) as reader:
+            pe = ParseExecutable(reader.subfile(100))
+            self.assertEqual(pe.imports[0]["name"], "ExitProcess")
+            self.assertEqual(pe.section(".text").reader()[0x80:0x88], b"KERNEL32")
+
+    def test_1_malformed(self):
+        data = buildPE()
+        for contents in (b"not an executable", data[:0x60], data[:0x40] + b"XX" + data[0x42:]):
+            with MmapFileReader(self.write(contents)) as reader:
+                with self.assertRaises(ExecutableFormatError):
+                    ParseExecutable(reader)
+        # tables cut off by the end of the file keep what was parsed
+        with MmapFileReader(self.write(data[:0x220])) as reader:
+            pe = ParseExecutable(reader)
+            self.assertEqual(pe.imports, [])
+            self.assertEqual(pe.exports, [])
+            self.assertEqual(pe.section(".text").reader()[0:4], data[0x200:0x204])
+
+    @unittest.skipUnless(open(sys.executable, "rb").read(4) == b"\x7fELF", "the interpreter is no ELF file")
+    def test_2_elf(self):
+        with MmapFileReader(sys.executable) as reader:
+            elf = ParseExecutable(reader)
+            self.assertIsInstance(elf, ELFFile)
+            self.assertIn(elf.type, ("executable", "shared object"))
+            self.assertEqual(elf.bits, 64 if sys.maxsize > 2**32 else 32)
+            text = elf.section(".text")
+            self.assertIsNotNone(text)
+            subfile = text.reader()
+            self.assertEqual(len(subfile) - subfile.tell(), text.size)
+            self.assertEqual(subfile[0:16], reader[text.offset:text.offset+16])
+            self.assertTrue(elf.segments)
+            self.assertTrue(any(entry["name"] for entry in elf.imports) or not elf.libraries)
+
+    def test_3_cache(self):
+        path = self.write(buildPE())
+        parser = ExecutableParser(cache_size=1)
+        info = parser.info(path, sha256="a" * 64)
+        self.assertIs(parser.info("/nonexistent", sha256="a" * 64), info)
+        parser.info(path, sha256="b" * 64)
+        self.assertNotIn("a" * 64, parser.cache)
+        with self.assertRaises(ExecutableFormatError):
+            parser.info(self.write(b"\x00" * 64))
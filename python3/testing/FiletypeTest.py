@@ -0,0 +1,114 @@
+import unittest
+import io
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+from python3.tools.files import MmapFileReader
+from python3.tools.filetype import FileType, FileTypeIdentifier, Identify, UNKNOWN
+
+
+def pe(dll=False, plus=False, lfanew=0x80):
+    header = bytearray(b"MZ" + bytes(lfanew - 2))
+    struct.pack_into("<I", header, 0x3c, lfanew)
+    characteristics = 0x2102 if dll else 0x0102
+    return bytes(header) + b"PE\x00\x00" + struct.pack("<HHIIIHH", 0x14c, 1, 0, 0, 0, 0xe0, characteristics) + \
+        struct.pack("<H", 0x20b if plus else 0x10b) + bytes(200)
+
+def elf(kind):
+    return b"\x7fELF\x02\x01\x01" + bytes(9) + struct.pack("<H", kind) + bytes(100)
+
+def zipped(*names, mimetype=None):
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        if mimetype:
+            archive.writestr("mimetype", mimetype)
+        for name in names:
+            archive.writestr(name, b"x" * 10)
+    return data.getvalue()
+
+
+samples = [
+    (pe(),                                  "pe",         "PE32 executable"),
+    (pe(dll=True, plus=True),               "pe",         "PE32+ executable (DLL)"),
+    (pe(lfanew=0x2000),                     "pe",         "PE32 executable"),  # header beyond the first read
+    (b"MZ" + bytes(100),                    "msdos",      "MS-DOS executable"),
+    (elf(2),                                "elf",        "ELF 64-bit executable"),
+    (elf(3),                                "elf",        "ELF 64-bit shared object"),
+    (b"\xcf\xfa\xed\xfe" + bytes(28),       "macho",      "Mach-O 64-bit"),
+    (b"\xca\xfe\xba\xbe\x00\x00\x00\x02",   "macho-fat",  "Mach-O universal binary"),
+    (b"\xca\xfe\xba\xbe\x00\x00\x00\x34",   "java-class", "Java class file"),
+    (zipped("a.txt"),                       "zip",        "Zip archive"),
+    (zipped("[Content_Types].xml", "word/document.xml"), "docx", "Microsoft Word document"),
+    (zipped("[Content_Types].xml", "xl/workbook.xml"),   "xlsx", "Microsoft Excel spreadsheet"),
+    (zipped("META-INF/MANIFEST.MF", "a.class"),          "jar",  "Java archive"),
+    (zipped("AndroidManifest.xml", "META-INF/MANIFEST.MF", "classes.dex"), "apk", "Android package"),
+    (zipped("content.xml", mimetype="application/vnd.oasis.opendocument.text"), "odt", "OpenDocument text"),
+    (b"%PDF-1.7\n",                         "pdf",        "PDF document"),
+    (b"\x1f\x8b\x08\x00" + bytes(10),       "gzip",       "gzip compressed data"),
+    (b"BZh91AY&SY",                         "bzip2",      "bzip2 compressed data"),
+    (b"\xfd7zXZ\x00\x00",                   "xz",         "XZ compressed data"),
+    (b"7z\xbc\xaf\x27\x1c\x00\x04",         "7z",         "7-zip archive"),
+    (b"Rar!\x1a\x07\x01\x00",               "rar",        "RAR archive"),
+    (bytes(257) + b"ustar\x0000" + bytes(240), "tar",     "tar archive"),
+    (bytes(0x8001) + b"CD001" + bytes(10),  "iso9660",    "ISO 9660 CD-ROM image"),
+    (b"#!/usr/bin/env python3\nprint(1)\n", "python",     "Python script"),
+    (b"#!/bin/bash\necho\n",                "shell",      "Bash script"),
+    (b"#!/usr/bin/perl -w\n",               "perl",       "Perl script"),
+    (b"#!/opt/tcl/tclsh\n",                 "script",     "tclsh script"),
+    (b"<?php echo 1; ?>",                   "php",        "PHP script"),
+    (b"<?xml version='1.0'?><a/>",          "xml",        "XML document"),
+    (b"\n<!DOCTYPE html><html></html>",     "html",       "HTML document"),
+    (b"plain text\n",                       "text",       "text"),
+    (b"\x00\x01\x02\x03",                   "data",       "data"),
+    (b"",                                   "data",       "data"),
+]
+
+
+class FiletypeTest(unittest.TestCase):
+
+    def test_0_identify(self):
+        identifier = FileTypeIdentifier()
+        for data, name, description in samples:
+            filetype = identifier.identify(data)
+            self.assertEqual((filetype.name, filetype.description), (name, description), data[:16])
+
+    def test_1_sources(self):
+        directory = tempfile.mkdtemp()
+        try:
+            paths = []
+            for i, (data, name, description) in enumerate(samples):
+                if not data:
+                    continue
+                path = os.path.join(directory, "{:064x}".format(i))
+                with open(path, "wb") as file:
+                    file.write(data)
+                paths.append((path, name))
+                self.assertEqual(Identify(path).name, name)
+                with MmapFileReader(path) as reader:
+                    self.assertEqual(Identify(reader).name, name)
+            with MmapFileReader(paths[0][0]) as reader:
+                self.assertEqual(Identify(reader.subfile(1)), UNKNOWN)
+
+            identifier = FileTypeIdentifier()
+            results = identifier.identifyDirectory(directory, workers=4)
+            self.assertEqual({name: filetype.name for name, filetype in results.items()},
+                             {os.path.basename(path): name for path, name in paths})
+            self.assertEqual(len(identifier.cache), len(paths))  # named by their sha256
+        finally:
+            shutil.rmtree(directory)
+
+    def test_2_cache(self):
+        identifier = FileTypeIdentifier(cache_size=2)
+        self.assertEqual(identifier.identify(b"%PDF-", sha256="a").name, "pdf")
+        self.assertEqual(identifier.identify(b"text", sha256="a").name, "pdf")  # cached
+        identifier.identify(b"text", sha256="b")
+        identifier.identify(b"text", sha256="c")
+        self.assertEqual(list(identifier.cache), ["b", "c"])
+        self.assertEqual(identifier.identify(b"text", sha256="a").name, "text")
+        self.assertEqual(FileType("a", "b", "c").dict(), {"name": "a", "mime": "b", "description": "c"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import os
+import random
+import tempfile
+from python3.tools import fuzzyhash
+from python3.tools.files import MmapFileReader
+from python3.tools.fuzzyhash import FuzzyHash, FuzzyHasher, Compare, FuzzyHashIndex
+from python3.tools.hashing import HashData
+
+
+def sample(seed, size=200000):
+    generator = random.Random(seed)
+    return bytes(generator.getrandbits(8) for _ in range(size))
+
+
+def mutate(data, seed, count=3, length=64):
+    generator = random.Random(seed)
+    data = bytearray(data)
+    for _ in range(count):
+        position = generator.randrange(len(data) - length)
+        data[position:position+length] = bytes(generator.getrandbits(8) for _ in range(length))
+    return bytes(data)
+
+
+class FuzzyhashTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = sample(1)
+
+    def test_0_format(self):
+        self.assertEqual(FuzzyHash(b""), "3::")
+        blocksize, first, second = FuzzyHash(self.data).split(":")
+        self.assertEqual(int(blocksize) % 3, 0)
+        self.assertTrue(32 <= len(first) <= 64)
+        self.assertTrue(len(second) <= 32)
+
+    def test_1_streaming(self):
+        expected = FuzzyHash(self.data)
+        hasher = FuzzyHasher()
+        for start in range(0, len(self.data), 777):
+            hasher.update(self.data[start:start+777])
+        self.assertEqual(hasher.hexdigest(), expected)
+        self.assertEqual(FuzzyHash(self.data, chunk_size=4096), expected)
+        self.assertEqual(HashData(self.data, ["sha256", "ctph"])["ctph"], expected)
+
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(self.data)
+            self.assertEqual(FuzzyHash(path), expected)
+            with MmapFileReader(path) as reader:
+                self.assertEqual(FuzzyHash(reader, chunk_size=10000), expected)
+        finally:
+            os.remove(path)
+
+    def test_2_pure_python(self):
+        data = self.data[:30000]
+        expected = FuzzyHash(data, chunk_size=1000)
+        numpy, fuzzyhash.numpy = fuzzyhash.numpy, None
+        try:
+            self.assertEqual(FuzzyHash(data, chunk_size=1000), expected)
+        finally:
+            fuzzyhash.numpy = numpy
+
+    def test_3_compare(self):
+        original = FuzzyHash(self.data)
+        self.assertEqual(Compare(original, original), 100)
+        self.assertGreater(Compare(original, FuzzyHash(mutate(self.data, 2))), 70)
+        self.assertEqual(Compare(original, FuzzyHash(sample(3))), 0)
+        # comparable with the double block size, not beyond
+        self.assertGreater(Compare(original, FuzzyHash(self.data + self.data[:150000])), 0)
+        self.assertEqual(Compare("3:abc:ab", "12:abc:ab"), 0)
+        with self.assertRaises(ValueError):
+            Compare("nonsense", original)
+
+    def test_4_index(self):
+        index = FuzzyHashIndex()
+        families = {}
+        for family in range(5):
+            base = sample(100 + family)
+            for variant in range(3):
+                key = "{}-{}".format(family, variant)
+                families[key] = FuzzyHash(mutate(base, variant) if variant else base)
+                index.add(key, families[key])
+        self.assertEqual(len(index), 15)
+
+        results = index.search(FuzzyHash(mutate(sample(102), 9)), threshold=50)
+        self.assertEqual(sorted(key for key, score in results), ["2-0", "2-1", "2-2"])
+        self.assertEqual(results, sorted(results, key=lambda result: -result[1]))
+        self.assertEqual(index.search(FuzzyHash(sample(999))), [])
+
+        # the index finds exactly what comparing all pairs finds
+        for key, query in families.items():
+            expected = sorted(other for other, h in families.items() if Compare(query, h) >= 1)
+            self.assertEqual(sorted(other for other, score in index.search(query)), expected)
+
+        index.remove("2-0")
+        self.assertNotIn("2-0", index)
+        self.assertEqual(len(index.search(families["2-1"], limit=1)), 1)
@@ -0,0 +1,85 @@
+import unittest
+import hashlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+from python3.tools.files import MmapFileReader
+from python3.tools.hashing import DEFAULT_ALGORITHMS, MultiHash, HashData, HashFile, HashFiles
+from python3.tools.storageutils import StorageSample
+
+
+def expected(data, algorithms=DEFAULT_ALGORITHMS):
+    return {a: hashlib.new(a, data).hexdigest() for a in algorithms}
+
+
+class HashingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.files = []
+        for size in (1, 1000, 3 * 2**20 + 17):
+            fd, path = tempfile.mkstemp()
+            with os.fdopen(fd, "wb") as file:
+                file.write(os.urandom(size))
+            self.files.append(path)
+
+    def tearDown(self):
+        for path in self.files:
+            os.remove(path)
+
+    def contents(self, path):
+        with open(path, "rb") as file:
+            return file.read()
+
+    def test_0_sources(self):
+        for path in self.files:
+            data = self.contents(path)
+            self.assertEqual(HashFile(path), expected(data))
+            self.assertEqual(HashFile(io.BytesIO(data), ["sha1"], chunk_size=4096), expected(data, ["sha1"]))
+            self.assertEqual(HashData(data, chunk_size=100), expected(data))
+            self.assertEqual(HashData(bytearray(data), ["md5"]), expected(data, ["md5"]))
+            with MmapFileReader(path) as reader:
+                self.assertEqual(HashFile(reader, chunk_size=333), expected(data))
+                self.assertEqual(HashFile(reader.subfile(len(data) // 2), ["sha256"]), expected(data[len(data) // 2:], ["sha256"]))
+        hashes = MultiHash(["sha512"])
+        hashes.update(b"hello ")
+        hashes.update(memoryview(b"world"))
+        self.assertEqual(hashes.hexdigests(), expected(b"hello world", ["sha512"]))
+        with self.assertRaises(ValueError):
+            MultiHash(["nohash"])
+
+    def test_1_batch(self):
+        results = [expected(self.contents(path)) for path in self.files]
+        self.assertEqual(HashFiles(self.files), results)
+        self.assertEqual(HashFiles(self.files, workers=3), results)
+
+    def test_2_sample(self):
+        data = self.contents(self.files[1])
+        sample = StorageSample(filepath=self.files[1])
+        self.assertEqual(sample.sha256(), hashlib.sha256(data).hexdigest())
+        self.assertEqual(sample.filecontents, b"")  # hashed without loading the file
+        self.assertEqual(sample.getHashes(), expected(data))
+        self.assertEqual(sample.getHashes("md5", "sha1"), expected(data, ["md5", "sha1"]))
+        sample.hashes["md5"] = "cached"
+        self.assertEqual(sample.getHashes("md5"), {"md5": "cached"})
+        self.assertEqual(StorageSample(filecontents=data).getHashes("sha256"), expected(data, ["sha256"]))
+        # new contents invalidate the cached digests
+        sample.filecontents = b"other"
+        self.assertEqual(sample.getHashes("md5", "sha256"), expected(b"other", ["md5", "sha256"]))
+        sample.filecontents = b""
+        sample.filepath = self.files[0]
+        self.assertEqual(sample.sha256(), hashlib.sha256(self.contents(self.files[0])).hexdigest())
+        sample.getContent()
+        self.assertIn("sha256", sample.hashes)  # loading the file keeps them
+
+    def test_3_lazy_fuzzyhash(self):
+        # fuzzyhash (and numpy) is only imported when "ctph" is requested
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        code = "import sys, python3.tools.storageutils; print('numpy' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "False")
+
+
+if __name__ == '__main__':
+    unittest.main()
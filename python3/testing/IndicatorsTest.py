@@ -0,0 +1,94 @@
+import unittest
+import os
+import random
+import tempfile
+import numpy
+from python3.services.indicators import IndicatorSet
+
+
+def indicators(n, seed):
+    rand = random.Random(seed)
+    result = []
+    for _ in range(n):
+        kind = rand.randrange(4)
+        if kind == 0:
+            result.append("{}.{}.{}.{}".format(*(rand.randrange(256) for _ in range(4))))
+        elif kind == 1:
+            result.append("2001:db8::{:x}".format(rand.randrange(2**16)))
+        elif kind == 2:
+            result.append("host{}.example.com".format(rand.randrange(n)))
+        else:
+            result.append("user{}@example.com".format(rand.randrange(n)))
+    return result
+
+
+class IndicatorsTest(unittest.TestCase):
+
+    def test_0_operations(self):
+        a, b = indicators(5000, 1), indicators(5000, 2) + indicators(1000, 1)
+        sa, sb = IndicatorSet(a), IndicatorSet(b)
+        self.assertEqual(len(sa), len(set(a)))
+        self.assertEqual(set(sa), set(a))
+        self.assertEqual(set(sa | sb), set(a) | set(b))
+        self.assertEqual(set(sa & sb), set(a) & set(b))
+        self.assertEqual(set(sa - sb), set(a) - set(b))
+        self.assertEqual(set(sb - sa), set(b) - set(a))
+        for indicator in a[:100]:
+            self.assertIn(indicator, sa)
+        self.assertNotIn("missing.example.com", sa)
+        self.assertNotIn("10.0.0.0/8", sa)
+        self.assertFalse(sa.add("not an indicator"))
+
+    def test_1_normalization(self):
+        s = IndicatorSet(["WWW.Example.COM", "www.example.com", "User@EXAMPLE.com", "::1", "0::1", "10.0.0.1"])
+        self.assertEqual(s.counts(), {"ipv4": 1, "ipv6": 1, "domain": 1, "email": 1})
+        self.assertIn("User@example.com", s)
+        self.assertNotIn("user@example.com", s)
+
+    def test_2_persistence(self):
+        a = indicators(5000, 3)
+        s = IndicatorSet(a) - IndicatorSet(indicators(2000, 3))
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, "indicators.set")
+        s.save(path)
+        for mmap in (True, False):
+            loaded = IndicatorSet.load(path, mmap=mmap)
+            self.assertEqual(set(loaded), set(s))
+            self.assertEqual(loaded.counts(), s.counts())
+            loaded.add("new.example.com")
+            self.assertIn("new.example.com", loaded)
+            self.assertIn(next(iter(s)), loaded)
+        with open(path, "r+b") as f:
+            f.write(b"X")
+        with self.assertRaises(ValueError):
+            IndicatorSet.load(path)
+        directory.cleanup()
+
+    def test_3_spill(self):
+        directory = tempfile.TemporaryDirectory()
+        a = indicators(5000, 4)
+        s = IndicatorSet(a, spill=directory.name, max_memory_size=0)
+        self.assertTrue(all(isinstance(c, numpy.memmap) for c in s._columns.values() if len(c)))
+        self.assertEqual(set(s & IndicatorSet(a)), set(a))
+        self.assertEqual(os.listdir(directory.name), [])  # anonymous files
+        directory.cleanup()
+
+    def test_4_duplicates(self):
+        a = indicators(5000, 5)
+        s = IndicatorSet(a)
+        heap = len(s._columns["heap"])
+        for _ in range(5):
+            s = s | IndicatorSet(a)
+            s.update(a)
+        self.assertEqual(len(s._columns["heap"]), heap)
+        self.assertEqual(set(s), set(a))
+        # lookups of pending indicators do not flush
+        s.add("fresh.example.com")
+        self.assertIn("fresh.example.com", s)
+        self.assertIn(a[0], s)
+        self.assertEqual(s._pending["domain"], {"fresh.example.com"})
+        self.assertEqual(len(s), len(set(a)) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+from python3.services.profiling import SamplingProfiler
+from python3.services.router import Router
+from python3.services.configuration import Metadata
+
+import tornado.web
+import marshal
+import pstats
+import tempfile
+import threading
+import requests
+import time
+import os
+
+
+class TServer(threading.Thread):
+    def __init__(self, metadata, analysisHandler, address, server=None):
+        self.router = Router(metadata=metadata, handlers={
+            "analyze": analysisHandler
+        }, server=server)
+        self.address = address
+        threading.Thread.__init__(self)
+        self.daemon  = True
+    def run(self):
+        self.router.ListenAndServe(self.address)
+
+
+def busy(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        sum(range(1000))
+
+
+class ProfilingTest(unittest.TestCase):
+
+    metadata = Metadata(
+        name="test-service",
+        version="1.0",
+        description="some fancy description",
+        copyright="you can copy as much as you like",
+        license="provided without any license"
+    )
+
+    class AnalysisHandler(tornado.web.RequestHandler):
+        def get(self):
+            busy(0.05)
+            self.write("analyzed")
+
+    def test_0_sampler(self):
+        worker = threading.Thread(target=busy, args=(0.3,), name="Worker")
+        profiler = SamplingProfiler(interval=0.005)
+        profiler.start()
+        worker.start()
+        worker.join()
+        profiler.stop()
+        self.assertGreater(profiler.samples, 10)
+        lines = profiler.collapsed().splitlines()
+        worker = [line for line in lines if line.startswith("Worker;")]
+        self.assertTrue(worker)
+        self.assertTrue(any(";busy (ProfilingTest.py:" in line for line in worker))
+        stack, count = worker[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertNotIn("SamplingProfiler", "".join(lines))
+        self.assertEqual(profiler.dict()["samples"], profiler.samples)
+
+    def test_1_disabled(self):
+        port = 7783
+        address = "http://127.0.0.1:"+str(port)
+        server = TServer(self.metadata, self.AnalysisHandler, port)
+        server.start()
+        time.sleep(0.5)
+        self.assertIsNone(server.router.profiles)
+        response = requests.get(address+"/analyze/", headers={"X-Profile": "1"})
+        self.assertEqual(response.text, "analyzed")
+        self.assertNotIn("X-Profile-Id", response.headers)
+        self.assertEqual(requests.get(address+"/debug/profile").status_code, 404)
+
+    def test_2_enabled(self):
+        port = 7784
+        address = "http://127.0.0.1:"+str(port)
+        server = TServer(self.metadata, self.AnalysisHandler, port, server={"Profiling": True, "ProfilingToken": "secret"})
+        server.start()
+        time.sleep(0.5)
+        token = {"X-Profiling-Token": "secret"}
+
+        # unprofiled requests are untouched, profiling needs the token
+        self.assertNotIn("X-Profile-Id", requests.get(address+"/analyze/").headers)
+        self.assertEqual(requests.get(address+"/analyze/", params={"profile": 1}).status_code, 403)
+        self.assertEqual(requests.get(address+"/debug/profiles/").status_code, 403)
+
+        # per-request cProfile
+        response = requests.get(address+"/analyze/", params={"profile": 1}, headers=token)
+        self.assertEqual(response.text, "analyzed")
+        key = response.headers["X-Profile-Id"]
+        listing = requests.get(address+"/debug/profiles/", headers=token).json()["profiles"]
+        self.assertEqual(listing[0]["id"], key)
+        self.assertEqual(listing[0]["uri"], "/analyze/?profile=1")
+        text = requests.get(address+"/debug/profiles/"+key, params={"sort": "tottime", "limit": 5}, headers=token).text
+        self.assertIn("busy", text)
+        self.assertEqual(requests.get(address+"/debug/profiles/"+key, params={"sort": "nonsense"}, headers=token).status_code, 400)
+        self.assertEqual(requests.get(address+"/debug/profiles/999", headers=token).status_code, 404)
+        dump = requests.get(address+"/debug/profiles/"+key, params={"format": "pstats"}, headers=token).content
+        fd, path = tempfile.mkstemp()
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(dump)
+            self.assertTrue(any(function == "busy" for _, _, function in pstats.Stats(path).stats))
+        finally:
+            os.remove(path)
+
+        # sampling profiler while requests are served
+        def load():
+            for _ in range(5):
+                requests.get(address+"/analyze/")
+        client = threading.Thread(target=load)
+        client.start()
+        sampled = requests.get(address+"/debug/profile", params={"seconds": 0.5, "interval": 0.005}, headers=token)
+        client.join()
+        self.assertEqual(sampled.headers["Content-Type"], "text/plain; charset=UTF-8")
+        self.assertIn("busy (ProfilingTest.py:", sampled.text)
+        sampled = requests.get(address+"/debug/profile", params={"seconds": 0.1, "format": "json"}, headers=token).json()
+        self.assertGreater(sampled["samples"], 0)
+        self.assertEqual(requests.get(address+"/debug/profile", params={"seconds": "x"}, headers=token).status_code, 400)
+
+        # tracemalloc snapshots
+        self.assertEqual(requests.get(address+"/debug/memory", headers=token).status_code, 409)
+        self.assertEqual(requests.get(address+"/debug/memory", params={"action": "start"}, headers=token).json(), {"tracing": True})
+        first = requests.get(address+"/debug/memory", params={"limit": 5}, headers=token).json()
+        self.assertTrue(first["top"])
+        self.assertNotIn("size_diff", first["top"][0])
+        leak = [bytearray(1000) for _ in range(1000)]
+        second = requests.get(address+"/debug/memory", params={"limit": 5}, headers=token).json()
+        self.assertIn("size_diff", second["top"][0])
+        self.assertEqual(requests.get(address+"/debug/memory", params={"action": "stop"}, headers=token).json(), {"tracing": False})
+        del leak
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import ipaddress
+import os
+import random
+import subprocess
+import sys
+from python3.services.ranges import IPRangeSet
+from python3.services.inputtype import Errors, ValidateIP
+
+
+def randomNetworks(rand, n, base=0x0A000000):
+    # networks within 10.0.0.0/24, small enough to compare against sets
+    networks = []
+    for _ in range(n):
+        prefix = rand.randint(26, 32)
+        address = base + rand.randrange(256)
+        networks.append(ipaddress.ip_network((address, prefix), strict=False))
+    return networks
+
+def addresses(networks):
+    return set(int(ip) for network in networks for ip in network)
+
+
+class RangesTest(unittest.TestCase):
+
+    def test_0_collapse(self):
+        ranges = IPRangeSet(["10.0.0.0/8", "10.1.0.0/16", "10.255.255.255", "11.0.0.0/8", "192.168.0.0/24",
+                             "fc00::/7", "fd00::1", ("2001:db8::1", "2001:db8::ff")])
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges.networks(), [
+            ipaddress.ip_network("10.0.0.0/7"),
+            ipaddress.ip_network("192.168.0.0/24"),
+            ipaddress.ip_network("2001:db8::1/128"),
+            ipaddress.ip_network("2001:db8::2/127"),
+            ipaddress.ip_network("2001:db8::4/126"),
+            ipaddress.ip_network("2001:db8::8/125"),
+            ipaddress.ip_network("2001:db8::10/124"),
+            ipaddress.ip_network("2001:db8::20/123"),
+            ipaddress.ip_network("2001:db8::40/122"),
+            ipaddress.ip_network("2001:db8::80/121"),
+            ipaddress.ip_network("fc00::/7"),
+        ])
+        self.assertIn("10.1.2.3", ranges)
+        self.assertIn(ipaddress.ip_address("11.255.255.255"), ranges)
+        self.assertIn("10.2.0.0/16", ranges)
+        self.assertNotIn("9.255.255.255", ranges)
+        self.assertNotIn("10.0.0.0/6", ranges)
+        self.assertNotIn("no ip", ranges)
+        self.assertIn("fd12::1", ranges)
+        self.assertEqual(ranges.size(), 2 * 2**24 + 256 + 255 + 2**121)
+        with self.assertRaises(ValueError):
+            ranges.add(("10.0.0.2", "10.0.0.1"))
+
+    def test_1_operations(self):
+        rand = random.Random(42)
+        for _ in range(50):
+            a, b = randomNetworks(rand, 10), randomNetworks(rand, 10)
+            ra, rb = IPRangeSet(a), IPRangeSet(b)
+            sa, sb = addresses(a), addresses(b)
+            for result, expected in ((ra | rb, sa | sb), (ra & rb, sa & sb), (ra - rb, sa - sb), (rb - ra, sb - sa)):
+                self.assertEqual(addresses(result.networks()), expected)
+                self.assertEqual(result.networks(), list(ipaddress.collapse_addresses(result.networks())))
+            self.assertEqual(ra | rb, rb | ra)
+
+    def test_2_batch(self):
+        rand = random.Random(43)
+        networks = randomNetworks(rand, 30)
+        ranges, expected = IPRangeSet(networks), addresses(networks)
+        ips = [ipaddress.ip_address(0x0A000000 + i) for i in range(256)]
+        self.assertEqual(ranges.contains(ips), [int(ip) in expected for ip in ips])
+        self.assertEqual(ranges.contains([str(ip) for ip in ips] + ["::1"]), [int(ip) in expected for ip in ips] + [False])
+        self.assertEqual(IPRangeSet().contains(ips[:3]), [False, False, False])
+
+    def test_3_blocklist(self):
+        blocklist = IPRangeSet(["8.8.4.0/24"])
+        self.assertEqual(ValidateIP(ipaddress.ip_address("8.8.4.4"), blocklist=blocklist), (False, Errors.BlocklistedError))
+        self.assertEqual(ValidateIP(ipaddress.ip_address("8.8.8.8"), blocklist=blocklist), (True, None))
+
+    def test_4_lazy_numpy(self):
+        # numpy is only imported by batch queries, not by importing inputtype
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        code = "import sys, python3.services.inputtype; print('numpy' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), "False")
+
+
+if __name__ == '__main__':
+    unittest.main()
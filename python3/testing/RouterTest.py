@@ -1,18 +1,25 @@
 import unittest
-from python3.services.router import Router
-from python3.services.configuration import Metadata
+from python3.services.router import Router, StreamingBodyHandler, CreateBatchHandler, DEFAULT_SERVER_OPTIONS
+from python3.services.configuration import Metadata, ParseConfig
+from python3.services.results import ServiceResultSet
+from python3.tools.files import TemporaryFilePool
 
 import tornado.web
 import threading
 import requests
 import time
+import hashlib
+import json
+import os
+import socket
 
 
 class TServer(threading.Thread):
-    def __init__(self, metadata, analysisHandler, address):
+    def __init__(self, metadata, analysisHandler, address, batch=None, server=None):
         self.router = Router(metadata=metadata, handlers={
-            "analyze": analysisHandler
-        })
+            "analyze": analysisHandler,
+            "batch":   batch,
+        }, server=server)
         self.address = address
         threading.Thread.__init__(self)
         self.daemon  = True
@@ -56,6 +63,199 @@ class TestServiceConfig(unittest.TestCase):
         """.strip())
         self.assertEqual(analyze.text, "Hello I'm analyzing your input: IT'S FREAKY!")
 
+    def test_streamingBody(self):
+        exampleMetadata = Metadata(
+            name="test-service",
+            version="1.0",
+            description="some fancy description",
+            copyright="you can copy as much as you like",
+            license="provided without any license"
+        )
+
+        class AnalysisHandler(StreamingBodyHandler):
+            max_memory_size = 1
+
+            def post(self):
+                reader = self.body_reader()
+                self.write({
+                    "size":   self.body_size,
+                    "sha256": self.body_sha256(),
+                    "found":  reader.find(b"needle"),
+                })
+
+        port = 7779
+        address = "http://127.0.0.1:"+str(port)
+
+        server = TServer(exampleMetadata, AnalysisHandler, port)
+        server.start()
+        time.sleep(0.5)
+
+        # larger than max_memory_size, so it gets spilled to disk
+        data = b"\x00" * (3*2**20) + b"needle" + b"\x00" * 100
+        def chunks():
+            for i in range(0, len(data), 2**16):
+                yield data[i:i+2**16]
+        analyze = requests.post(address+"/analyze/", data=chunks()).json()
+
+        self.assertEqual(analyze["size"], len(data))
+        self.assertEqual(analyze["sha256"], hashlib.sha256(data).hexdigest())
+        self.assertEqual(analyze["found"], 3*2**20)
+
+    def test_streamingHeadersOnly(self):
+        exampleMetadata = Metadata(
+            name="test-service",
+            version="1.0",
+            description="some fancy description",
+            copyright="you can copy as much as you like",
+            license="provided without any license"
+        )
+        handlers = []
+
+        class AnalysisHandler(StreamingBodyHandler):
+            max_memory_size = 1
+
+            def prepare(self):
+                super().prepare()
+                handlers.append(self)
+
+            def post(self):
+                self.write({"size": self.body_size})
+
+        port = 7787
+
+        server = TServer(exampleMetadata, AnalysisHandler, port)
+        server.start()
+        time.sleep(0.5)
+
+        # a body of 1 GB is announced but never sent, nothing may be reserved for it
+        client = socket.create_connection(("127.0.0.1", port))
+        client.sendall(b"POST /analyze/ HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: 1073741824\r\n\r\n")
+        time.sleep(0.2)
+        self.assertEqual(len(handlers), 1)
+        body = handlers[0].body_file
+        self.assertTrue(handlers[0]._body_temp.spilled())
+        self.assertEqual(os.fstat(body.fileno()).st_blocks, 0)
+        client.close()
+
+    def test_streamingInterrupted(self):
+        exampleMetadata = Metadata(
+            name="test-service",
+            version="1.0",
+            description="some fancy description",
+            copyright="you can copy as much as you like",
+            license="provided without any license"
+        )
+        pool = TemporaryFilePool(size=4)
+        handlers = []
+
+        class AnalysisHandler(StreamingBodyHandler):
+            max_memory_size = 0
+            temp_pool = pool
+
+            def prepare(self):
+                super().prepare()
+                handlers.append(self)
+
+            def post(self):
+                self.write({"size": self.body_size})
+
+        port = 7788
+
+        server = TServer(exampleMetadata, AnalysisHandler, port)
+        server.start()
+        time.sleep(0.5)
+
+        # the connection is dropped in the middle of the body
+        client = socket.create_connection(("127.0.0.1", port))
+        client.sendall(b"POST /analyze/ HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Length: 100000\r\n\r\n")
+        client.sendall(b"x" * 50000)
+        time.sleep(0.2)
+        body = handlers[0].body_file
+        self.assertEqual(len(pool.files), 0)
+        client.close()
+        time.sleep(0.2)
+        self.assertIsNone(handlers[0].body_file)
+        self.assertEqual(pool.files, [body])  # back in the pool
+
+    def test_batch(self):
+        exampleMetadata = Metadata(
+            name="test-service",
+            version="1.0",
+            description="some fancy description",
+            copyright="you can copy as much as you like",
+            license="provided without any license"
+        )
+
+        def analyze(obj):
+            if obj == "bad":
+                raise tornado.web.HTTPError(500, "Invalid object: bad")
+            result = ServiceResultSet()
+            result.add("length", len(obj))
+            return result
+
+        port = 7780
+        address = "http://127.0.0.1:"+str(port)
+
+        server = TServer(exampleMetadata, None, port, batch=CreateBatchHandler(analyze, max_parallel=2))
+        server.start()
+        time.sleep(0.5)
+
+        objs = ["a", "bb", "bad", "dddd"]
+        expected = {
+            0: {"index": 0, "obj": "a",    "result": {"length": 1}},
+            1: {"index": 1, "obj": "bb",   "result": {"length": 2}},
+            2: {"index": 2, "obj": "bad",  "status": 500, "error": "Invalid object: bad"},
+            3: {"index": 3, "obj": "dddd", "result": {"length": 4}},
+        }
+        responses = [
+            requests.post(address+"/analyze/batch", data=json.dumps(objs)),
+            requests.post(address+"/analyze/batch", data="\n".join(json.dumps(o) for o in objs)),
+            requests.get(address+"/analyze/batch", params={"obj": objs}),
+        ]
+        for response in responses:
+            self.assertEqual(response.headers["Content-Type"], "application/x-ndjson")
+            lines = [json.loads(line) for line in response.text.splitlines()]
+            self.assertEqual({line["index"]: line for line in lines}, expected)
+
+        self.assertEqual(requests.post(address+"/analyze/batch", data="[").status_code, 400)
+
+    def test_serverOptions(self):
+        exampleMetadata = Metadata(
+            name="test-service",
+            version="1.0",
+            description="some fancy description",
+            copyright="you can copy as much as you like",
+            license="provided without any license"
+        )
+
+        class AnalysisHandler(tornado.web.RequestHandler):
+            def get(self):
+                self.write({"data": "x" * int(self.get_argument("size"))})
+
+        config = {"Port": 8080, "Server": dict(DEFAULT_SERVER_OPTIONS)}
+        cfg = ParseConfig(config, data='{"server": {"compressminlength": 100, "xheaders": true}}')
+        with self.assertRaises(ValueError):
+            Router(metadata=exampleMetadata, handlers={}, server={"NoSuchOption": 1})
+
+        port = 7781
+        address = "http://127.0.0.1:"+str(port)
+
+        server = TServer(exampleMetadata, AnalysisHandler, port, server=cfg.server)
+        server.start()
+        time.sleep(0.5)
+        self.assertEqual(server.router.server["xheaders"], True)
+
+        big = requests.get(address+"/analyze/", params={"size": 1000}, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(big.headers.get("Content-Encoding"), "gzip")
+        self.assertEqual(big.json(), {"data": "x" * 1000})
+
+        small = requests.get(address+"/analyze/", params={"size": 10}, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(small.headers.get("Content-Encoding"), None)
+
+        identity = requests.get(address+"/analyze/", params={"size": 1000}, headers={"Accept-Encoding": "gzip;q=0, identity"})
+        self.assertEqual(identity.headers.get("Content-Encoding"), None)
+        self.assertEqual(identity.json(), {"data": "x" * 1000})
+
 
 if __name__ == '__main__':
     unittest.main()
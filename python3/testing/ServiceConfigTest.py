@@ -1,5 +1,10 @@
 import unittest
-from python3.services.configuration import ParseConfig
+import tempfile
+import os
+from python3.services.configuration import ParseConfig, ConfigWatcher
+from python3.tools.structs import CompileStruct
+from python3.services.schema import Field, ByteSize, Duration, Regex, IPNetworks
+import ipaddress
 
 
 exampleConfiguration = """
@@ -49,6 +54,117 @@ class TestServiceConfig(unittest.TestCase):
         self.assertEqual(cfg.extrasettinGs.KEYB, "B")
         self.assertEqual(cfg.extrasettiNgs.keYC, "C")
 
+    def test_schema(self):
+        schema = {
+            "MaxSize":  Field(ByteSize, minimum=1024),
+            "Timeout":  Field(Duration, maximum=300),
+            "Workers":  Field(int, minimum=1),
+            "Pattern":  Field(Regex),
+            "Limits": {
+                "Internal": Field(IPNetworks),
+            },
+        }
+        config = {
+            "MaxSize": "1MB",
+            "Timeout": "30s",
+            "Workers": 4,
+            "Pattern": "^$",
+            "Limits":  {"Internal": []},
+        }
+        cfg = ParseConfig(config, schema=schema, data="""
+        {
+            "maxsize": 2048,
+            "timeout": "250ms",
+            "pattern": "^[a-f0-9]{64}$",
+            "limits": {"internal": ["10.0.0.0/8", "fc00::/7"]}
+        }
+        """)
+        self.assertEqual(cfg.maxsize, 2048)
+        self.assertEqual(cfg.timeout, 0.25)
+        self.assertEqual(cfg.workers, 4)
+        self.assertTrue(cfg.pattern.match("a"*64))
+        self.assertEqual(list(cfg.limits.internal), [ipaddress.ip_network("10.0.0.0/8"), ipaddress.ip_network("fc00::/7")])
+
+        invalid = [
+            '{"maxsize": "12 parsecs"}',
+            '{"maxsize": 10}',
+            '{"timeout": "1h"}',
+            '{"workers": 0}',
+            '{"workers": true}',
+            '{"pattern": "("}',
+            '{"limits": {"internal": ["10.0.0.0/33"]}}',
+        ]
+        for data in invalid:
+            config = {
+                "MaxSize": "1MB",
+                "Timeout": "30s",
+                "Workers": 4,
+                "Pattern": "^$",
+                "Limits":  {"Internal": []},
+            }
+            with self.assertRaises(ValueError, msg=data):
+                ParseConfig(config, schema=schema, data=data)
+
+    def test_compiled(self):
+        config = {
+            "Port": 8016,
+            "Hosts": ["a", {"Name": "b"}],
+            "Extra-Settings": {"KeyA": "--empty--", "class": None},
+        }
+        ParseConfig(config, data='{"extra-settings": {"keya": "A"}, "hosts": ["x", "y", {"name": "z"}]}')
+        cfg = CompileStruct(config)
+
+        self.assertEqual(cfg.port, 8016)
+        self.assertEqual(cfg.hosts, ("x", "y", CompileStruct({"name": "z"})))
+        self.assertEqual(cfg.hosts[2].name, "z")
+        self.assertEqual(cfg.extra_settings.keya, "A")
+        self.assertEqual(cfg.extra_settings.class_, None)
+        self.assertEqual(cfg["EXTRA-SETTINGS"]["keyA"], "A")
+        self.assertEqual(cfg.dict(), config)
+        with self.assertRaises(TypeError):
+            cfg.port = 1
+        with self.assertRaises(AttributeError):
+            cfg.PORT
+        with self.assertRaises(ValueError):
+            CompileStruct({"port": 1, "Port": 2})
+
+    def test_watcher(self):
+        file = tempfile.NamedTemporaryFile(mode="w", suffix=".conf", delete=False)
+        file.write(exampleConfiguration)
+        file.close()
+        config = {
+            "port": 8016,
+            "limit": 1000,
+            "Extrasettings": {"KeyA": "--empty--"},
+        }
+        try:
+            watcher = ConfigWatcher(config, file.name)
+            self.assertEqual(watcher.config.port, 5666)
+            self.assertEqual(watcher.config.extrasettings.keya, "A")
+            self.assertEqual(config["port"], 8016)
+            with self.assertRaises(TypeError):
+                watcher.config.port = 1
+            self.assertFalse(watcher.check())
+
+            updates = []
+            watcher.subscribe(lambda new, old: updates.append((new.limit, old.limit)))
+
+            with open(file.name, "w") as fh:
+                fh.write('{"Limit": 20000}')
+            self.assertTrue(watcher.check())
+            self.assertEqual(watcher.config.limit, 20000)
+            self.assertEqual(watcher.config.port, 8016)
+            self.assertEqual(updates, [(20000, 5000)])
+
+            # mismatching types are rejected, the old config stays active
+            with open(file.name, "w") as fh:
+                fh.write('{"Limit": "many"}')
+            self.assertFalse(watcher.check())
+            self.assertEqual(watcher.config.limit, 20000)
+            self.assertEqual(len(updates), 1)
+        finally:
+            os.remove(file.name)
+
 
 if __name__ == '__main__':
     unittest.main()
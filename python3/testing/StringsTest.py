@@ -0,0 +1,78 @@
+import unittest
+import os
+import random
+import re
+import tempfile
+from python3.tools.files import MmapFileReader
+from python3.tools.strings import ExtractStrings
+
+
+def reference(data, min_length, encodings=("ascii", "utf-16le")):
+    results = []
+    if "ascii" in encodings:
+        for m in re.finditer(b"[\t\x20-\x7e]{%d,}" % min_length, data):
+            results.append((m.start(), "ascii", m.group().decode("ascii")))
+    if "utf-16le" in encodings:
+        for m in re.finditer(b"(?:[\t\x20-\x7e]\x00){%d,}" % min_length, data):
+            results.append((m.start(), "utf-16le", m.group().decode("utf-16le")))
+    return sorted(results)
+
+
+class StringsTest(unittest.TestCase):
+
+    def setUp(self):
+        rand = random.Random(11)
+        parts = []
+        for _ in range(400):
+            kind = rand.random()
+            text = "".join(rand.choice("abcXYZ 019\t.-") for _ in range(rand.randint(1, 40)))
+            if kind < 0.4:
+                parts.append(text.encode("ascii"))
+            elif kind < 0.7:
+                parts.append(text.encode("utf-16le"))
+            else:
+                parts.append(bytes(rand.choice([0, 1, 0xff, 0x41]) for _ in range(rand.randint(1, 30))))
+        self.data = b"".join(parts)
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as file:
+            file.write(self.data)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_0_chunks(self):
+        for min_length in (1, 4, 10):
+            expected = reference(self.data, min_length)
+            for chunk_size in (1, 7, 64, 1000, len(self.data)):
+                self.assertEqual(list(ExtractStrings(self.data, min_length, chunk_size=chunk_size)), expected,
+                                 (min_length, chunk_size))
+        self.assertEqual(list(ExtractStrings(self.data, 5, encodings=["utf-16le"], chunk_size=33)),
+                         reference(self.data, 5, ["utf-16le"]))
+        self.assertEqual(list(ExtractStrings(b"ab\x00cdefg\x01hi", 3)), [(3, "ascii", "cdefg")])
+        self.assertEqual(list(ExtractStrings(b"", 3)), [])
+        with self.assertRaises(ValueError):
+            list(ExtractStrings(self.data, encodings=["latin-1"]))
+
+    def test_1_reader(self):
+        expected = reference(self.data, 4)
+        with MmapFileReader(self.path) as reader:
+            self.assertEqual(list(ExtractStrings(reader, chunk_size=500)), expected)
+            self.assertEqual(list(ExtractStrings(reader, chunk_size=500, workers=3)), expected)
+            subfile = reader.subfile(1000)
+            self.assertEqual(list(ExtractStrings(subfile, chunk_size=300)), reference(self.data[1000:], 4))
+
+    def test_2_limit(self):
+        expected = reference(self.data, 4)
+        total, count = 0, 0
+        for _, _, string in expected:
+            if total + len(string) > 500:
+                break
+            total += len(string)
+            count += 1
+        self.assertEqual(list(ExtractStrings(self.data, max_total=500, chunk_size=100)), expected[:count])
+        strings = ExtractStrings(self.data)
+        self.assertEqual(next(strings), expected[0])  # lazy
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,18 @@
 import unittest
-from python3.tools.files import TemporaryFile
+import os
+import shutil
+import tempfile
+from python3.tools.files import TemporaryFile, TemporaryFilePool, Preallocate, MEGABYTE
 
 
 class TemporaryFileTest(unittest.TestCase):
 
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
     def test_1_createWriteRead(self):
         with TemporaryFile() as file:
             file.write(b"Test content of this file")
@@ -11,6 +20,58 @@ class TemporaryFileTest(unittest.TestCase):
             file.seek(0)
             self.assertEqual(file.read(), b"Test content of this file")
 
+    def test_2_spill(self):
+        temp = TemporaryFile(max_memory_size=1, directory=self.directory)
+        with temp as file:
+            file.write(b"x" * 100)
+            self.assertFalse(temp.spilled())
+            file.write(b"y" * MEGABYTE)
+            self.assertTrue(temp.spilled())
+            reader = temp.reader()
+            self.assertEqual(len(reader), MEGABYTE + 100)
+            self.assertEqual(reader.find(b"y"), 100)
+            self.assertIs(temp.reader(), reader)
+        self.assertEqual(os.listdir(self.directory), [])  # unlinked
+
+        temp = TemporaryFile(max_memory_size=0, directory=self.directory)
+        with temp as file:
+            self.assertTrue(temp.spilled())
+            self.assertIsNone(temp.reader())
+            file.write(b"content")
+            self.assertEqual(temp.reader()[0:7], b"content")
+
+    def test_3_preallocate(self):
+        temp = TemporaryFile(max_memory_size=1, directory=self.directory, preallocate=4 * MEGABYTE)
+        with temp as file:
+            self.assertTrue(temp.spilled())
+            self.assertEqual(os.fstat(file.fileno()).st_size, 0)  # size unchanged
+            file.write(b"abc")
+            self.assertEqual(len(temp.reader()), 3)
+        temp = TemporaryFile(max_memory_size=1, preallocate=100)
+        with temp as file:
+            self.assertFalse(temp.spilled())  # fits into memory
+        with tempfile.TemporaryFile(dir=self.directory) as file:
+            if Preallocate(file, MEGABYTE):
+                self.assertGreaterEqual(os.fstat(file.fileno()).st_blocks * 512, MEGABYTE)
+
+    def test_4_pool(self):
+        with TemporaryFilePool(size=2, directory=self.directory) as pool:
+            temps = [TemporaryFile(pool=pool) for _ in range(3)]
+            files = [temp.__enter__() for temp in temps]
+            for i, (temp, file) in enumerate(zip(temps, files)):
+                file.write(b"file %d" % i)
+                self.assertEqual(temp.reader()[0:6], b"file %d" % i)
+            for temp in temps:
+                temp.__exit__(None, None, None)
+            self.assertEqual(len(pool), 2)
+            with TemporaryFile(pool=pool) as file:
+                self.assertIn(file, files)  # reused
+                self.assertEqual(file.read(), b"")  # truncated
+                file.write(b"new")
+            self.assertEqual(len(pool), 2)
+        self.assertEqual(len(pool), 0)
+        self.assertTrue(all(file.closed for file in files))
+
 
 if __name__ == '__main__':
     unittest.main()
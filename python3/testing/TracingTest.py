@@ -0,0 +1,241 @@
+import unittest
+from python3.tools import tracing
+from python3.tools.tracing import (ConfigureTracing, StartSpan, CurrentSpan, Traced,
+                                   RingBufferSink, JSONLogSink, OTLPFileSink, NOOP)
+from python3.tools.files import MmapFileReader
+from python3.services.inputtype import Detect, __initTldMapHelper as initTldMapHelper
+from python3.services.router import Router, CreateBatchHandler
+from python3.services.configuration import Metadata
+from python3.services.results import ServiceResultSet
+
+import tornado.web
+import asyncio
+import io
+import json
+import os
+import tempfile
+import threading
+import requests
+import time
+
+
+class TServer(threading.Thread):
+    def __init__(self, metadata, handlers, address):
+        self.router = Router(metadata=metadata, handlers=handlers)
+        self.address = address
+        threading.Thread.__init__(self)
+        self.daemon  = True
+    def run(self):
+        self.router.ListenAndServe(self.address)
+
+
+def waitFor(sink, name):
+    # the span of a request ends after its response was sent
+    for _ in range(100):
+        if sink.spans(name):
+            return sink.spans(name)
+        time.sleep(0.01)
+    return []
+
+
+class TracingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = RingBufferSink(1000)
+        ConfigureTracing([self.sink])
+
+    def tearDown(self):
+        ConfigureTracing(None)
+
+    def test_0_spans(self):
+        with StartSpan("outer", kind="server", user="test") as outer:
+            self.assertIs(CurrentSpan(), outer)
+            with StartSpan("inner") as inner:
+                inner.set("count", 3)
+            with self.assertRaises(KeyError):
+                with StartSpan("failing"):
+                    raise KeyError("missing")
+        self.assertIsNone(CurrentSpan())
+
+        inner, failing, outer = self.sink.spans()
+        self.assertEqual([span.name for span in (inner, failing, outer)], ["inner", "failing", "outer"])
+        self.assertEqual(inner.trace_id, outer.trace_id)
+        self.assertEqual(inner.parent_id, outer.span_id)
+        self.assertIsNone(outer.parent_id)
+        self.assertEqual(failing.error, "KeyError: 'missing'")
+        self.assertGreaterEqual(outer.duration, inner.duration + failing.duration)
+        self.assertEqual(outer.dict()["attributes"], {"user": "test"})
+        self.assertEqual(inner.dict()["parent_id"], "{:016x}".format(outer.span_id))
+
+        @Traced()
+        def work(x):
+            return x * 2
+        self.assertEqual(work(2), 4)
+        self.assertEqual(self.sink.spans()[-1].name, "TracingTest.test_0_spans.<locals>.work")
+
+        ConfigureTracing(None)
+        self.assertIs(StartSpan("off"), NOOP)
+        self.assertEqual(work(3), 6)
+
+    def test_1_contexts(self):
+        # threads and asyncio tasks have their own current span
+        async def task(name):
+            with StartSpan(name):
+                await asyncio.sleep(0.01)
+                with StartSpan(name + ".child"):
+                    pass
+
+        async def run():
+            with StartSpan("root"):
+                await asyncio.gather(task("a"), task("b"))
+        asyncio.run(run())
+        spans = {span.name: span for span in self.sink.spans()}
+        self.assertEqual(spans["a.child"].parent_id, spans["a"].span_id)
+        self.assertEqual(spans["b.child"].parent_id, spans["b"].span_id)
+        self.assertEqual(spans["a"].parent_id, spans["root"].span_id)
+
+        thread = threading.Thread(target=lambda: StartSpan("thread").__enter__().__exit__(None, None, None))
+        with StartSpan("main"):
+            thread.start()
+            thread.join()
+        self.assertIsNone(self.sink.spans("thread")[0].parent_id)
+
+    def test_2_sampling(self):
+        ConfigureTracing([self.sink], sample_rate=0.0)
+        with StartSpan("root") as root:
+            with StartSpan("child") as child:
+                self.assertIs(child, NOOP)
+        self.assertEqual(self.sink.spans(), [])
+        self.assertIsNone(CurrentSpan())
+
+        ConfigureTracing([self.sink], sample_rate=0.5)
+        for _ in range(400):
+            with StartSpan("root"):
+                with StartSpan("child"):
+                    pass
+        roots, children = len(self.sink.spans("root")), len(self.sink.spans("child"))
+        self.assertEqual(roots, children)
+        self.assertTrue(100 < roots < 300)
+        with self.assertRaises(ValueError):
+            ConfigureTracing([self.sink], sample_rate=2)
+
+    def test_3_sinks(self):
+        stream = io.StringIO()
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            otlp = OTLPFileSink(path, service_name="test", batch_size=2)
+            log = JSONLogSink(path + ".jsonl")
+            ConfigureTracing([JSONLogSink(stream), otlp, log])
+            for name in ("a", "b", "c"):
+                with StartSpan(name, kind="client", size=10, ratio=0.5, ok=True, url="x"):
+                    pass
+            # written per complete batch
+            with open(path) as file:
+                self.assertEqual(len(file.readlines()), 1)
+            with self.assertRaises(ValueError):
+                with StartSpan("d"):
+                    raise ValueError("bad")
+            lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+            self.assertEqual([line["name"] for line in lines], ["a", "b", "c", "d"])
+            self.assertEqual(lines[0]["attributes"]["size"], 10)
+            with StartSpan("e"):
+                pass
+            # reconfiguring keeps sinks passed again open
+            ConfigureTracing([otlp], sample_rate=0.5)
+            self.assertFalse(otlp.file.closed)
+            self.assertTrue(log.stream.closed)
+            ConfigureTracing(None)  # closes the sinks, writing the partial batch
+            self.assertTrue(otlp.file.closed)
+            self.assertFalse(stream.closed)
+            otlp.close()
+            with open(path + ".jsonl") as file:
+                self.assertEqual(len(file.readlines()), 5)
+            with open(path) as file:
+                requests_ = [json.loads(line) for line in file]
+            self.assertEqual(len(requests_), 3)
+            resource = requests_[0]["resourceSpans"][0]
+            self.assertEqual(resource["resource"]["attributes"][0], {"key": "service.name", "value": {"stringValue": "test"}})
+            spans = [span for request in requests_ for span in request["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+            self.assertEqual([span["name"] for span in spans], ["a", "b", "c", "d", "e"])
+            self.assertEqual(len(spans[0]["traceId"]), 32)
+            self.assertEqual(len(spans[0]["spanId"]), 16)
+            self.assertEqual(spans[0]["kind"], 3)
+            self.assertGreaterEqual(int(spans[0]["endTimeUnixNano"]), int(spans[0]["startTimeUnixNano"]))
+            self.assertEqual(spans[0]["attributes"], [
+                {"key": "size", "value": {"intValue": "10"}},
+                {"key": "ratio", "value": {"doubleValue": 0.5}},
+                {"key": "ok", "value": {"boolValue": True}},
+                {"key": "url", "value": {"stringValue": "x"}},
+            ])
+            self.assertEqual(spans[3]["status"], {"code": 2, "message": "ValueError: bad"})
+        finally:
+            os.remove(path)
+            os.remove(path + ".jsonl")
+
+    def test_4_instrumentation(self):
+        initTldMapHelper("COM\n")
+        with StartSpan("request"):
+            Detect("www.example.com")
+            fd, path = tempfile.mkstemp()
+            with os.fdopen(fd, "wb") as file:
+                file.write(b"abc needle")
+            try:
+                with MmapFileReader(path) as reader:
+                    self.assertEqual(reader.find(b"needle"), 4)
+            finally:
+                os.remove(path)
+        request = self.sink.spans("request")[0]
+        detect = self.sink.spans("inputtype.Detect")[0]
+        find = self.sink.spans("MmapFileReader.find")[0]
+        self.assertEqual(detect.parent_id, request.span_id)
+        self.assertEqual(find.parent_id, request.span_id)
+        self.assertEqual(find.attributes, {"offset": 0, "size": 10, "found": 4})
+
+    def test_5_router(self):
+        metadata = Metadata(
+            name="test-service",
+            version="1.0",
+            description="some fancy description",
+            copyright="you can copy as much as you like",
+            license="provided without any license"
+        )
+
+        class AnalysisHandler(tornado.web.RequestHandler):
+            def get(self):
+                with StartSpan("analysis"):
+                    result = ServiceResultSet()
+                    result.add("type", str(Detect(self.get_argument("obj"))[0]))
+                self.write(result.dict())
+
+        def analyze(obj):
+            with StartSpan("analysis"):
+                return {"length": len(obj)}
+
+        initTldMapHelper("COM\n")
+        port = 7785
+        address = "http://127.0.0.1:"+str(port)
+        server = TServer(metadata, {"analyze": AnalysisHandler, "batch": CreateBatchHandler(analyze)}, port)
+        server.start()
+        time.sleep(0.5)
+
+        self.assertEqual(requests.get(address+"/analyze/", params={"obj": "www.example.com"}).status_code, 200)
+        waitFor(self.sink, "GET /analyze/")
+        spans = {span.name: span for span in self.sink.spans()}
+        root = spans["GET /analyze/"]
+        self.assertEqual(root.kind, "server")
+        self.assertEqual(root.attributes, {"handler": "AnalysisHandler", "status": 200})
+        self.assertEqual(spans["analysis"].parent_id, root.span_id)
+        self.assertEqual(spans["inputtype.Detect"].parent_id, spans["analysis"].span_id)
+        self.assertEqual(spans["json.encode"].parent_id, root.span_id)
+
+        self.sink.clear()
+        requests.post(address+"/analyze/batch", data='["a", "bb"]')
+        root = waitFor(self.sink, "POST /analyze/batch")[0]
+        batch = self.sink.spans("batch.analyze")
+        self.assertEqual(sorted(span.attributes["index"] for span in batch), [0, 1])
+        self.assertTrue(all(span.parent_id == root.span_id for span in batch))
+        self.assertEqual({span.parent_id for span in self.sink.spans("analysis")}, {span.span_id for span in batch})
+
+        self.assertEqual(requests.get(address+"/feed/").status_code, 405)
+        self.assertEqual(waitFor(self.sink, "GET /feed/")[0].attributes, {"handler": "DummyHandler", "status": 405})
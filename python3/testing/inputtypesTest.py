@@ -3,6 +3,7 @@ import random
 import ipaddress
 import tempfile
 import os
+from python3.services import inputtype
 from python3.services.inputtype import (
     Detect,
     Errors,
@@ -11,6 +12,8 @@ from python3.services.inputtype import (
     ValidateDomain,
     ValidateEmail,
     ValidateFile,
+    BuildValidationTables,
+    InitializeValidationTables,
     __initTldMapHelper as initTldMapHelper # normally don't do that, instead import InitializeTLDMap(path)
 )
 
@@ -257,6 +260,50 @@ hello world!
 
         os.remove(path)
 
+    def test_4_tables(self):
+        # the loaded tables and the TLD map are module globals, restore them
+        # so the following tests do not run with the 4 TLDs of this test
+        # (getattr, the names would be mangled inside of the class)
+        saved = {name: getattr(inputtype, name) for name in ("__tables", "__charClasses", "__tldMapInitialized")}
+        tldMap = dict(getattr(inputtype, "__tldMap"))
+        def restore():
+            tables = getattr(inputtype, "__tables")
+            if tables is not None and tables is not saved["__tables"]:
+                tables.close()
+            for name, value in saved.items():
+                setattr(inputtype, name, value)
+            getattr(inputtype, "__tldMap").clear()
+            getattr(inputtype, "__tldMap").update(tldMap)
+        self.addCleanup(restore)
+
+        directory = tempfile.TemporaryDirectory()
+        tldpath = os.path.join(directory.name, "tlds.txt")
+        path = os.path.join(directory.name, "validation.tables")
+        with open(tldpath, "w") as f:
+            f.write("# some sample tlds\nCOM\nDE\nXN--PUNYCODEY2342\nORG\n")
+
+        # missing and invalid files fall back to the in-process tables
+        self.assertFalse(InitializeValidationTables(path, tldpath))
+        with open(path, "wb") as f:
+            f.write(b"HOLMESVT" + b"\0" * 100)
+        self.assertFalse(InitializeValidationTables(path, tldpath))
+
+        ips = [makeIP(rand(0, 2**32-1), 4) for _ in range(2000)]
+        ips += [makeIP(rand(0, 2**128-1), 16) for _ in range(500)]
+        ips += [ipaddress.ip_address(a) for a in [
+            "10.0.0.1", "172.31.255.255", "172.32.0.0", "192.168.1.1", "100.64.0.0",
+            "100.127.255.255", "100.128.0.0", "255.255.255.255", "8.8.8.8",
+            "fc00::1", "fe80::1", "ff02::1", "2001:db8::1", "2001:4860::8888",
+            "::ffff:8.8.8.8", "2001:20::1", "2001:30::1",
+        ]]
+        domains = ["www.domain.de", "a.b.org", "x.eu", "XN--punycodey2342", "test.xn--punycodey2342", "co.m"]
+        expected = [ValidateIP(ip) for ip in ips] + [ValidateDomain(d) for d in domains]
+
+        BuildValidationTables(tldpath, path)
+        self.assertTrue(InitializeValidationTables(path))
+        self.assertEqual([ValidateIP(ip) for ip in ips] + [ValidateDomain(d) for d in domains], expected)
+        directory.cleanup()
+
 
 """
 some masks for easier ip auto-generation
@@ -428,5 +475,6 @@ __masks6 = [
     int("11111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111111", 2),
 ]
 
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,204 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+
+
+class BloomFilter (object):
+    """
+    Probabilistic set answering "definitely not present" or "possibly
+    present" for str or bytes keys (e.g. sample SHA-256s or indicators)
+    using a fixed amount of memory.
+
+    The size of the bit array and the number of hash functions are derived
+    from the expected number of keys (capacity) and the acceptable false
+    positive rate (error_rate). Adding more keys than capacity still works,
+    but the false positive rate grows.
+
+    Usage:
+        known = BloomFilter(capacity=1000000, error_rate=0.001)
+        known.add(sha256)
+        if sha256 not in known:
+            ...  # definitely never added
+        known.save("known-samples.bloom")
+        known = BloomFilter.load("known-samples.bloom")  # mapped read-only
+    """
+    def __init__ (self, capacity, error_rate=0.01):
+        """
+        Parameters:
+            capacity   - Int:   Expected number of keys
+            error_rate - Float: False positive rate at capacity (0 < error_rate < 1)
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity   = capacity
+        self.error_rate = error_rate
+        self.size       = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes     = max(1, int(round(self.size / capacity * math.log(2))))
+        self.count      = 0
+        self.bits       = bytearray((self.size + 7) // 8)
+        self.map        = None
+
+    def __positions (self, key):
+        # double hashing: position i = h1 + i * h2 (mod size)
+        if isinstance(key, str):
+            key = key.encode()
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add (self, key):
+        """
+        Add a key (str or bytes). Raises a TypeError if the filter was loaded
+        read-only.
+        """
+        bits = self.bits
+        for pos in self.__positions(key):
+            bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update (self, keys):
+        """
+        Add all keys of an iterable.
+        """
+        for key in keys:
+            self.add(key)
+
+    def __contains__ (self, key):
+        bits = self.bits
+        for pos in self.__positions(key):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def __len__ (self):
+        """
+        Number of keys added (duplicates included).
+        """
+        return self.count
+
+    @property
+    def readonly (self):
+        return self.map is not None
+
+    def compatible (self, other):
+        return self.size == other.size and self.hashes == other.hashes
+
+    def merge (self, other):
+        """
+        Add all keys of other, which must have been created with the same
+        capacity and error_rate. Raises a ValueError if the filters are not
+        compatible.
+        """
+        if not self.compatible(other):
+            raise ValueError("cannot merge bloom filters of different size or number of hashes")
+        # OR the bit arrays in place, block by block, so only a block at a
+        # time is converted to Python ints
+        with memoryview(self.bits) as target, memoryview(other.bits) as source:
+            for start in range(0, len(target), _MERGE_BLOCK):
+                block = target[start:start+_MERGE_BLOCK]
+                merged = int.from_bytes(block, "little") | int.from_bytes(source[start:start+_MERGE_BLOCK], "little")
+                block[:] = merged.to_bytes(len(block), "little")
+        self.count += other.count
+
+    def __or__ (self, other):
+        result = self.copy()
+        result.merge(other)
+        return result
+
+    def copy (self):
+        """
+        Returns a writable in-memory copy of the filter.
+        """
+        result = BloomFilter.__new__(BloomFilter)
+        result.capacity   = self.capacity
+        result.error_rate = self.error_rate
+        result.size       = self.size
+        result.hashes     = self.hashes
+        result.count      = self.count
+        result.bits       = bytearray(self.bits)
+        result.map        = None
+        return result
+
+    def save (self, path):
+        """
+        Write the filter to path. The file is written next to path and
+        renamed afterwards, so readers mapping the old file are not affected.
+        """
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, _VERSION, self.hashes, self.size,
+                self.capacity, self.count, self.error_rate))
+            file.write(self.bits)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load (cls, path, writable=False):
+        """
+        Load a filter written by save(path). The bit array is mapped
+        read-only and shared between processes, unless writable is True, in
+        which case it is read into memory.
+
+        Raises a ValueError if the file is not a bloom filter.
+        """
+        result = cls.__new__(cls)
+        with open(path, "rb") as file:
+            header = file.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise ValueError("{}: not a bloom filter".format(path))
+            magic, version, result.hashes, result.size, result.capacity, \
+                result.count, result.error_rate = _HEADER.unpack(header)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError("{}: not a bloom filter (or unsupported version)".format(path))
+            length = (result.size + 7) // 8
+            if os.fstat(file.fileno()).st_size != _HEADER.size + length:
+                raise ValueError("{}: truncated bloom filter".format(path))
+            if writable:
+                result.bits = bytearray(file.read())
+                result.map = None
+            else:
+                result.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                result.bits = memoryview(result.map)[_HEADER.size:]
+        return result
+
+    def close (self):
+        """
+        Release the mapping of a filter loaded read-only.
+        """
+        if self.map is not None:
+            self.bits.release()
+            self.map.close()
+            self.map = None
+            self.bits = bytearray()
+
+
+class Prechecked (object):
+    """
+    Membership test against an exact but expensive container (a large set,
+    a database lookup, ...) guarded by a BloomFilter: keys the filter knows to
+    be absent are answered without asking the container.
+
+    Usage:
+        blocklist = Prechecked(BloomFilter.load("blocklist.bloom"), database)
+        ok, err = ValidateDomain(domain, blocklist=blocklist)
+    """
+    def __init__ (self, filter, container):
+        self.filter    = filter
+        self.container = container
+
+    def __contains__ (self, key):
+        return key in self.filter and key in self.container
+
+
+# magic, version, hashes, size in bits, capacity, count, error rate
+_HEADER  = struct.Struct("<8sIIQQQd")
+_MAGIC   = b"HOLMESBF"
+_VERSION = 1
+
+# bytes of the bit arrays OR-ed at once by merge
+_MERGE_BLOCK = 65536
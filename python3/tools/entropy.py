@@ -0,0 +1,161 @@
+import math
+from collections import Counter
+from python3.tools.files import MmapFileReader, MEGABYTE
+
+# Optional, vectorizes the counting (pure Python otherwise)
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# bytes processed at once, bounds the memory used for large files
+CHUNK_SIZE = 4 * MEGABYTE
+
+# maximum number of block histograms of a chunk computed at once (32 MB)
+_MAX_BLOCKS = 16384
+
+
+def ByteHistogram(source, chunk_size=CHUNK_SIZE):
+    """
+    Returns a list of 256 ints, the number of occurrences of each byte value.
+
+    Parameters:
+        source     - MmapFileReader: counted from its current offset on
+                     Bytes-like:     e.g. bytes, bytearray or memoryview
+        chunk_size - Int:            Bytes processed at once
+    """
+    if numpy is not None:
+        counts = numpy.zeros(256, numpy.int64)
+        for chunk in _chunks(source, chunk_size):
+            counts += numpy.bincount(chunk, minlength=256)
+        return counts.tolist()
+    counts = Counter()
+    for chunk in _chunks(source, chunk_size):
+        counts.update(chunk)
+    return [counts[value] for value in range(256)]
+
+
+def Entropy(source, chunk_size=CHUNK_SIZE, histogram=None):
+    """
+    Returns the Shannon entropy of source in bits per byte (0.0 - 8.0), 0.0
+    for empty input. A histogram computed before by ByteHistogram can be
+    passed to avoid counting again.
+    """
+    if histogram is None:
+        histogram = ByteHistogram(source, chunk_size)
+    return _entropy(histogram, sum(histogram))
+
+
+def EntropyProfile(source, window=256, step=None, precision=3, chunk_size=CHUNK_SIZE):
+    """
+    Returns a list with the entropy of every window of source, rounded to
+    precision digits. Windows start every step bytes (default: window, i.e.
+    non-overlapping), only complete windows are included.
+
+    Parameters:
+        window - Int: Window size in bytes
+        step   - Int: Distance of two windows, must divide window
+    Raises a ValueError for invalid window or step sizes.
+    """
+    step = step or window
+    if window < 1 or step < 1 or window % step:
+        raise ValueError("window must be a positive multiple of step")
+    chunk_size = max(step, chunk_size - chunk_size % step)
+    if numpy is not None:
+        # one 256 entry histogram per block, limit their number per chunk
+        chunk_size = min(chunk_size, step * _MAX_BLOCKS)
+        return _numpyProfile(source, window, step, precision, chunk_size)
+    profile = []
+    tail = b""
+    for chunk in _chunks(source, chunk_size):
+        data = tail + bytes(chunk)
+        position = 0
+        while position + window <= len(data):
+            profile.append(round(_entropy(Counter(data[position:position+window]).values(), window), precision))
+            position += step
+        tail = data[position:]
+    return profile
+
+
+def EntropyAnalysis(source, window=256, step=None, precision=3, chunk_size=CHUNK_SIZE):
+    """
+    Returns histogram, entropy and entropy profile of source as a dict ready
+    to be added to a ServiceResultSet:
+        {"size": 1024, "entropy": 7.95, "histogram": [...256 ints],
+         "profile": {"window": 256, "step": 256, "entropy": [...]}}
+
+    Usage:
+        with MmapFileReader(path) as reader:
+            resultset.add("entropy", EntropyAnalysis(reader))
+    """
+    histogram = ByteHistogram(source, chunk_size)
+    size = sum(histogram)
+    return {
+        "size":      size,
+        "entropy":   round(_entropy(histogram, size), precision),
+        "histogram": histogram,
+        "profile":   {
+            "window":  window,
+            "step":    step or window,
+            "entropy": EntropyProfile(source, window, step, precision, chunk_size),
+        },
+    }
+
+
+def _chunks(source, chunk_size):
+    # Yields consecutive chunks of source: zero-copy numpy views of the
+    # mapping (or of the buffer) if numpy is available, bytes otherwise.
+    if isinstance(source, MmapFileReader):
+        buffer, start, stop = source.datamap, source.offset, source.filesize
+    else:
+        buffer = memoryview(source).cast("B")
+        start, stop = 0, len(buffer)
+    for position in range(start, stop, chunk_size):
+        length = min(chunk_size, stop - position)
+        if numpy is not None:
+            yield numpy.frombuffer(buffer, numpy.uint8, length, position)
+        else:
+            yield buffer[position:position+length]
+
+
+def _entropy(counts, total):
+    # Shannon entropy of a histogram in bits: log2(n) - sum(c log2 c) / n
+    if total == 0:
+        return 0.0
+    return max(0.0, math.log2(total) - sum(c * math.log2(c) for c in counts if c) / total)
+
+
+def _numpyProfile(source, window, step, precision, chunk_size):
+    # Histograms of the step sized blocks of every chunk are summed up into
+    # window histograms with a cumulative sum, the last blocks of a chunk are
+    # carried over to the windows starting in it.
+    blocks = window // step
+    carry = numpy.zeros((0, 256), numpy.int64)
+    # c * log2(c) for every possible count c of a window
+    weights = numpy.arange(window + 1, dtype=numpy.float64)
+    weights[1:] *= numpy.log2(weights[1:])
+    logWindow = math.log2(window)
+    profile = []
+    for chunk in _chunks(source, chunk_size):
+        count = len(chunk) // step
+        if count == 0:
+            continue  # final partial block, no complete window
+        # offset the bytes of block i by 256 * i, one bincount counts all blocks
+        values = chunk[:count * step].reshape(count, step).astype(numpy.int32)
+        values += (numpy.arange(count, dtype=numpy.int32) * 256)[:, None]
+        histograms = numpy.bincount(values.ravel(), minlength=count * 256).reshape(count, 256)
+        if blocks > 1:
+            histograms = numpy.concatenate((carry, histograms))
+            if len(histograms) >= blocks:
+                summed = numpy.cumsum(histograms, axis=0)
+                counts = summed[blocks-1:].copy()
+                counts[1:] -= summed[:-blocks]
+            else:
+                counts = histograms[:0]
+            carry = histograms[max(0, len(histograms) - (blocks - 1)):]
+        else:
+            counts = histograms
+        entropy = logWindow - weights[counts].sum(axis=1) / window
+        profile.extend(numpy.round(numpy.maximum(entropy, 0.0), precision).tolist())
+    return profile
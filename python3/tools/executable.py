@@ -0,0 +1,675 @@
+import struct
+import threading
+from collections import OrderedDict
+from python3.tools.files import MmapFileReader
+
+
+# upper bound for the entries of any table (sections, imports, exports,
+# symbols), protects against loops over forged counts
+MAX_ENTRIES = 65536
+
+# longest name read from a string table
+MAX_NAME_LENGTH = 4096
+
+
+class ExecutableFormatError (ValueError):
+    """
+    Raised if a file is not a PE or ELF file, or if its headers are truncated.
+    """
+
+
+class Layout (object):
+    """
+    Fields of a C structure without padding: the offset and a compiled
+    struct.Struct of every field.
+
+    Usage:
+        HEADER = Layout("<", [("magic", "H"), ("count", "I")])
+        HEADER.size   # 6
+    """
+    __slots__ = ["fields", "names", "size"]
+
+    def __init__ (self, order, fields):
+        """
+        Parameters:
+            order  - String:             "<" little or ">" big endian
+            fields - [(String, String)]: Name and struct format of every field
+        """
+        self.fields = {}
+        self.names  = []
+        offset = 0
+        for name, fmt in fields:
+            compiled = struct.Struct(order + fmt)
+            self.fields[name] = (offset, compiled)
+            self.names.append(name)
+            offset += compiled.size
+        self.size = offset
+
+
+class Structure (object):
+    """
+    A structure in the mapping, a field is decoded with struct.unpack_from
+    whenever it is accessed, nothing is copied before.
+
+    Usage:
+        header = Structure(reader.datamap, position, HEADER)
+        header.magic
+        header.dict()   # all fields
+    """
+    __slots__ = ["buffer", "position", "layout"]
+
+    def __init__ (self, buffer, position, layout):
+        self.buffer   = buffer
+        self.position = position
+        self.layout   = layout
+
+    def __getattr__ (self, name):
+        try:
+            offset, compiled = self.layout.fields[name]
+        except KeyError:
+            raise AttributeError(name)
+        return compiled.unpack_from(self.buffer, self.position + offset)[0]
+
+    def dict (self):
+        return {name: getattr(self, name) for name in self.layout.names}
+
+
+class Section (object):
+    """
+    A section of an executable. The data is available as a subfile of the
+    reader of the executable.
+
+    Usage:
+        for section in executable.sections:
+            section.name, section.address, section.offset, section.size
+            data = section.reader()    # MmapFileReader.subfile, no copy
+    """
+    __slots__ = ["executable", "header", "name", "address", "offset", "size", "virtual_size", "flags"]
+
+    def __init__ (self, executable, header, name, address, offset, size, virtual_size, flags):
+        self.executable   = executable
+        self.header       = header
+        self.name         = name
+        self.address      = address
+        self.offset       = offset
+        self.size         = size
+        self.virtual_size = virtual_size
+        self.flags        = flags
+
+    def reader (self):
+        """
+        Returns a subfile reader over the data of the section in the file
+        (cut at the end of the file), None for sections without data.
+        """
+        if self.size == 0 or self.offset >= self.executable.size:
+            return None
+        return self.executable.reader.subfile(self.offset, self.size)
+
+    def dict (self):
+        return {
+            "name":         self.name,
+            "address":      self.address,
+            "offset":       self.offset,
+            "size":         self.size,
+            "virtual_size": self.virtual_size,
+            "flags":        self.flags,
+        }
+
+
+class Executable (object):
+    """
+    Base of the parsers: the reader, bounds checked access to its mapping and
+    the lazily computed tables.
+    """
+    format = None
+
+    def __init__ (self, reader):
+        self.reader    = reader
+        self.buffer    = reader.datamap
+        self.base      = reader.offset
+        self.size      = reader.filesize - reader.offset
+        self._sections = None
+        self._imports  = None
+        self._exports  = None
+
+    def structure (self, layout, offset):
+        """
+        Returns the Structure of layout at offset (relative to the reader).
+        Raises an ExecutableFormatError if it exceeds the file.
+        """
+        if offset < 0 or offset + layout.size > self.size:
+            raise ExecutableFormatError("truncated structure at offset {:#x}".format(offset))
+        return Structure(self.buffer, self.base + offset, layout)
+
+    def string (self, offset, limit=MAX_NAME_LENGTH):
+        """
+        Returns the zero terminated string at offset (relative to the reader),
+        decoded as latin-1, at most limit characters.
+        """
+        if offset < 0 or offset >= self.size:
+            return ""
+        start = self.base + offset
+        stop = min(start + limit, self.base + self.size)
+        end = self.buffer.find(b"\x00", start, stop)
+        return self.buffer[start:end if end != -1 else stop].decode("latin-1")
+
+    @property
+    def sections (self):
+        if self._sections is None:
+            self._sections = self._parseSections()
+        return self._sections
+
+    @property
+    def imports (self):
+        """
+        [{"library": String, "name": String, "ordinal": Int}], library is None
+        for ELF files (see libraries), name is None for imports by ordinal.
+        """
+        if self._imports is None:
+            self._imports = self._parseImports()
+        return self._imports
+
+    @property
+    def exports (self):
+        """
+        [{"name": String, "ordinal": Int, "address": Int, "forwarder": String}]
+        """
+        if self._exports is None:
+            self._exports = self._parseExports()
+        return self._exports
+
+    def section (self, name):
+        """
+        Returns the first section called name, None if there is none.
+        """
+        for section in self.sections:
+            if section.name == name:
+                return section
+        return None
+
+    def info (self):
+        """
+        Returns the metadata as plain dict, ready to be added to a
+        ServiceResultSet or cached.
+        """
+        return {
+            "format":      self.format,
+            "bits":        self.bits,
+            "machine":     self.machine,
+            "type":        self.type,
+            "entry_point": self.entry_point,
+            "headers":     self.headers(),
+            "sections":    [section.dict() for section in self.sections],
+            "libraries":   self.libraries,
+            "imports":     self.imports,
+            "exports":     self.exports,
+        }
+
+
+# PE layouts, all little endian
+_DOS_HEADER = Layout("<", [
+    ("e_magic", "H"), ("e_cblp", "H"), ("e_cp", "H"), ("e_crlc", "H"), ("e_cparhdr", "H"),
+    ("e_minalloc", "H"), ("e_maxalloc", "H"), ("e_ss", "H"), ("e_sp", "H"), ("e_csum", "H"),
+    ("e_ip", "H"), ("e_cs", "H"), ("e_lfarlc", "H"), ("e_ovno", "H"), ("e_res", "8s"),
+    ("e_oemid", "H"), ("e_oeminfo", "H"), ("e_res2", "20s"), ("e_lfanew", "I"),
+])
+_FILE_HEADER = Layout("<", [
+    ("Signature", "4s"), ("Machine", "H"), ("NumberOfSections", "H"), ("TimeDateStamp", "I"),
+    ("PointerToSymbolTable", "I"), ("NumberOfSymbols", "I"), ("SizeOfOptionalHeader", "H"),
+    ("Characteristics", "H"),
+])
+
+def _optionalHeader (pe64):
+    address = "Q" if pe64 else "I"
+    fields = [
+        ("Magic", "H"), ("MajorLinkerVersion", "B"), ("MinorLinkerVersion", "B"), ("SizeOfCode", "I"),
+        ("SizeOfInitializedData", "I"), ("SizeOfUninitializedData", "I"), ("AddressOfEntryPoint", "I"),
+        ("BaseOfCode", "I"),
+    ]
+    if not pe64:
+        fields.append(("BaseOfData", "I"))
+    fields += [
+        ("ImageBase", address), ("SectionAlignment", "I"), ("FileAlignment", "I"),
+        ("MajorOperatingSystemVersion", "H"), ("MinorOperatingSystemVersion", "H"),
+        ("MajorImageVersion", "H"), ("MinorImageVersion", "H"), ("MajorSubsystemVersion", "H"),
+        ("MinorSubsystemVersion", "H"), ("Win32VersionValue", "I"), ("SizeOfImage", "I"),
+        ("SizeOfHeaders", "I"), ("CheckSum", "I"), ("Subsystem", "H"), ("DllCharacteristics", "H"),
+        ("SizeOfStackReserve", address), ("SizeOfStackCommit", address), ("SizeOfHeapReserve", address),
+        ("SizeOfHeapCommit", address), ("LoaderFlags", "I"), ("NumberOfRvaAndSizes", "I"),
+    ]
+    return Layout("<", fields)
+
+_OPTIONAL_HEADER32 = _optionalHeader(False)
+_OPTIONAL_HEADER64 = _optionalHeader(True)
+_DATA_DIRECTORY = Layout("<", [("VirtualAddress", "I"), ("Size", "I")])
+_SECTION_HEADER = Layout("<", [
+    ("Name", "8s"), ("VirtualSize", "I"), ("VirtualAddress", "I"), ("SizeOfRawData", "I"),
+    ("PointerToRawData", "I"), ("PointerToRelocations", "I"), ("PointerToLinenumbers", "I"),
+    ("NumberOfRelocations", "H"), ("NumberOfLinenumbers", "H"), ("Characteristics", "I"),
+])
+_IMPORT_DESCRIPTOR = Layout("<", [
+    ("OriginalFirstThunk", "I"), ("TimeDateStamp", "I"), ("ForwarderChain", "I"), ("Name", "I"),
+    ("FirstThunk", "I"),
+])
+_EXPORT_DIRECTORY = Layout("<", [
+    ("Characteristics", "I"), ("TimeDateStamp", "I"), ("MajorVersion", "H"), ("MinorVersion", "H"),
+    ("Name", "I"), ("Base", "I"), ("NumberOfFunctions", "I"), ("NumberOfNames", "I"),
+    ("AddressOfFunctions", "I"), ("AddressOfNames", "I"), ("AddressOfNameOrdinals", "I"),
+])
+_UINT16 = struct.Struct("<H")
+_UINT32 = struct.Struct("<I")
+_UINT64 = struct.Struct("<Q")
+
+_PE_MACHINES = {0x14c: "i386", 0x8664: "amd64", 0x1c0: "arm", 0x1c4: "armnt", 0xaa64: "arm64", 0x200: "ia64"}
+
+_DIRECTORY_EXPORT = 0
+_DIRECTORY_IMPORT = 1
+
+
+class PEFile (Executable):
+    """
+    Portable Executable (Windows executables and DLLs). Headers are decoded
+    when this is created, everything else on first access.
+
+    Usage:
+        pe = PEFile(reader)
+        pe.file_header.TimeDateStamp
+        pe.optional_header.AddressOfEntryPoint
+        pe.data_directories[1].VirtualAddress
+        pe.imports   # [{"library": "KERNEL32.dll", "name": "ExitProcess", "ordinal": None}, ...]
+    Raises an ExecutableFormatError if the headers are missing or truncated.
+    """
+    format = "pe"
+
+    def __init__ (self, reader):
+        super().__init__(reader)
+        self.dos_header = self.structure(_DOS_HEADER, 0)
+        if self.dos_header.e_magic != 0x5a4d:
+            raise ExecutableFormatError("missing MZ signature")
+        offset = self.dos_header.e_lfanew
+        self.file_header = self.structure(_FILE_HEADER, offset)
+        if self.file_header.Signature != b"PE\x00\x00":
+            raise ExecutableFormatError("missing PE signature")
+        offset += _FILE_HEADER.size
+        magic = self.structure(Layout("<", [("Magic", "H")]), offset).Magic
+        if magic not in (0x10b, 0x20b):
+            raise ExecutableFormatError("unknown optional header magic {:#x}".format(magic))
+        self.bits = 64 if magic == 0x20b else 32
+        self.optional_header = self.structure(_OPTIONAL_HEADER64 if self.bits == 64 else _OPTIONAL_HEADER32, offset)
+        directories = offset + self.optional_header.layout.size
+        count = min(self.optional_header.NumberOfRvaAndSizes, 16,
+                    max(0, (self.file_header.SizeOfOptionalHeader - self.optional_header.layout.size) // _DATA_DIRECTORY.size))
+        self.data_directories = [self.structure(_DATA_DIRECTORY, directories + i * _DATA_DIRECTORY.size) for i in range(count)]
+        self.section_table = offset + self.file_header.SizeOfOptionalHeader
+
+    @property
+    def machine (self):
+        return _PE_MACHINES.get(self.file_header.Machine, hex(self.file_header.Machine))
+
+    @property
+    def type (self):
+        return "dll" if self.file_header.Characteristics & 0x2000 else "executable"
+
+    @property
+    def entry_point (self):
+        return self.optional_header.AddressOfEntryPoint
+
+    @property
+    def libraries (self):
+        libraries = []
+        for entry in self.imports:
+            if entry["library"] not in libraries:
+                libraries.append(entry["library"])
+        return libraries
+
+    def headers (self):
+        return {
+            "file_header":      {name: value for name, value in self.file_header.dict().items() if name != "Signature"},
+            "optional_header":  self.optional_header.dict(),
+            "data_directories": [directory.dict() for directory in self.data_directories],
+        }
+
+    def rvaToOffset (self, rva):
+        """
+        Returns the file offset of a relative virtual address, None if it is
+        not backed by the file.
+        """
+        for section in self.sections:
+            if section.address <= rva < section.address + max(section.virtual_size, section.size):
+                if rva - section.address >= section.size:
+                    return None
+                offset = section.offset + rva - section.address
+                return offset if offset < self.size else None
+        if rva < min(self.optional_header.SizeOfHeaders, self.size):
+            return rva
+        return None
+
+    def _parseSections (self):
+        sections = []
+        for i in range(min(self.file_header.NumberOfSections, MAX_ENTRIES)):
+            header = self.structure(_SECTION_HEADER, self.section_table + i * _SECTION_HEADER.size)
+            name = header.Name.rstrip(b"\x00").decode("latin-1")
+            sections.append(Section(self, header, name, header.VirtualAddress, header.PointerToRawData,
+                                    header.SizeOfRawData, header.VirtualSize, header.Characteristics))
+        return sections
+
+    def _directory (self, index):
+        # file offset and size of a data directory, None if absent
+        if index >= len(self.data_directories):
+            return None, 0
+        directory = self.data_directories[index]
+        if directory.VirtualAddress == 0:
+            return None, 0
+        return self.rvaToOffset(directory.VirtualAddress), directory.Size
+
+    def _read (self, compiled, offset):
+        if offset is None or offset < 0 or offset + compiled.size > self.size:
+            raise ExecutableFormatError("truncated table")
+        return compiled.unpack_from(self.buffer, self.base + offset)[0]
+
+    def _parseImports (self):
+        imports = []
+        offset, size = self._directory(_DIRECTORY_IMPORT)
+        if offset is None:
+            return imports
+        thunk, flag = (_UINT64, 1 << 63) if self.bits == 64 else (_UINT32, 1 << 31)
+        # tables cut off by the end of the file end the parsing, the
+        # entries found so far are kept
+        try:
+            for i in range(MAX_ENTRIES):
+                descriptor = self.structure(_IMPORT_DESCRIPTOR, offset + i * _IMPORT_DESCRIPTOR.size)
+                if descriptor.Name == 0 and descriptor.FirstThunk == 0:
+                    break
+                library = self.string(self.rvaToOffset(descriptor.Name) or -1)
+                table = self.rvaToOffset(descriptor.OriginalFirstThunk or descriptor.FirstThunk)
+                for j in range(MAX_ENTRIES):
+                    value = self._read(thunk, table + j * thunk.size if table is not None else None)
+                    if value == 0:
+                        break
+                    if value & flag:
+                        imports.append({"library": library, "name": None, "ordinal": value & 0xffff})
+                    else:
+                        name = self.rvaToOffset(value & 0x7fffffff)
+                        imports.append({"library": library, "name": self.string(name + 2) if name is not None else None,
+                                        "ordinal": None})
+                    if len(imports) >= MAX_ENTRIES:
+                        return imports
+        except ExecutableFormatError:
+            pass
+        return imports
+
+    def _parseExports (self):
+        exports = []
+        offset, size = self._directory(_DIRECTORY_EXPORT)
+        if offset is None:
+            return exports
+        start = self.data_directories[_DIRECTORY_EXPORT].VirtualAddress
+        try:
+            directory = self.structure(_EXPORT_DIRECTORY, offset)
+            names = {}
+            namesOffset = self.rvaToOffset(directory.AddressOfNames)
+            ordinalsOffset = self.rvaToOffset(directory.AddressOfNameOrdinals)
+            for i in range(min(directory.NumberOfNames, MAX_ENTRIES)):
+                index = self._read(_UINT16, ordinalsOffset + i * 2 if ordinalsOffset is not None else None)
+                name = self.rvaToOffset(self._read(_UINT32, namesOffset + i * 4 if namesOffset is not None else None))
+                names.setdefault(index, self.string(name) if name is not None else None)
+            functions = self.rvaToOffset(directory.AddressOfFunctions)
+            for i in range(min(directory.NumberOfFunctions, MAX_ENTRIES)):
+                address = self._read(_UINT32, functions + i * 4 if functions is not None else None)
+                if address == 0:
+                    continue
+                # addresses inside the export directory are forwarders ("DLL.Function")
+                forwarder = None
+                if start <= address < start + size:
+                    forwarder = self.string(self.rvaToOffset(address) or -1)
+                exports.append({"name": names.get(i), "ordinal": directory.Base + i, "address": address,
+                                "forwarder": forwarder})
+        except ExecutableFormatError:
+            pass
+        return exports
+
+
+# ELF layouts per class (32/64 bit) and byte order
+def _elfLayouts (bits, order):
+    word = "Q" if bits == 64 else "I"
+    header = Layout(order, [
+        ("e_ident", "16s"), ("e_type", "H"), ("e_machine", "H"), ("e_version", "I"), ("e_entry", word),
+        ("e_phoff", word), ("e_shoff", word), ("e_flags", "I"), ("e_ehsize", "H"), ("e_phentsize", "H"),
+        ("e_phnum", "H"), ("e_shentsize", "H"), ("e_shnum", "H"), ("e_shstrndx", "H"),
+    ])
+    section = Layout(order, [
+        ("sh_name", "I"), ("sh_type", "I"), ("sh_flags", word), ("sh_addr", word), ("sh_offset", word),
+        ("sh_size", word), ("sh_link", "I"), ("sh_info", "I"), ("sh_addralign", word), ("sh_entsize", word),
+    ])
+    if bits == 64:
+        segment = Layout(order, [
+            ("p_type", "I"), ("p_flags", "I"), ("p_offset", "Q"), ("p_vaddr", "Q"), ("p_paddr", "Q"),
+            ("p_filesz", "Q"), ("p_memsz", "Q"), ("p_align", "Q"),
+        ])
+        symbol = Layout(order, [
+            ("st_name", "I"), ("st_info", "B"), ("st_other", "B"), ("st_shndx", "H"), ("st_value", "Q"),
+            ("st_size", "Q"),
+        ])
+        dynamic = Layout(order, [("d_tag", "q"), ("d_val", "Q")])
+    else:
+        segment = Layout(order, [
+            ("p_type", "I"), ("p_offset", "I"), ("p_vaddr", "I"), ("p_paddr", "I"), ("p_filesz", "I"),
+            ("p_memsz", "I"), ("p_flags", "I"), ("p_align", "I"),
+        ])
+        symbol = Layout(order, [
+            ("st_name", "I"), ("st_value", "I"), ("st_size", "I"), ("st_info", "B"), ("st_other", "B"),
+            ("st_shndx", "H"),
+        ])
+        dynamic = Layout(order, [("d_tag", "i"), ("d_val", "I")])
+    return header, section, segment, symbol, dynamic
+
+_ELF_LAYOUTS = {(bits, order): _elfLayouts(bits, order) for bits in (32, 64) for order in "<>"}
+
+_ELF_MACHINES = {3: "i386", 8: "mips", 20: "ppc", 21: "ppc64", 40: "arm", 62: "amd64", 183: "arm64", 243: "riscv"}
+_ELF_TYPES = {1: "relocatable", 2: "executable", 3: "shared object", 4: "core"}
+
+_SHT_DYNAMIC = 6
+_SHT_DYNSYM  = 11
+_DT_NEEDED   = 1
+_STB_GLOBAL  = 1
+_STB_WEAK    = 2
+
+
+class ELFFile (Executable):
+    """
+    Executable and Linkable Format (Linux and most Unix executables and
+    shared objects), 32 or 64 bit, either byte order. Imports and exports
+    are the undefined and the defined global symbols of the dynamic symbol
+    table, libraries the DT_NEEDED entries.
+
+    Usage:
+        elf = ELFFile(reader)
+        elf.header.e_machine
+        elf.section(".text").reader()
+        elf.segments[0].p_type
+    Raises an ExecutableFormatError if the header is missing or truncated.
+    """
+    format = "elf"
+
+    def __init__ (self, reader):
+        super().__init__(reader)
+        if self.size < 16 or self.buffer[self.base:self.base+4] != b"\x7fELF":
+            raise ExecutableFormatError("missing ELF signature")
+        bits = {1: 32, 2: 64}.get(self.buffer[self.base+4])
+        order = {1: "<", 2: ">"}.get(self.buffer[self.base+5])
+        if bits is None or order is None:
+            raise ExecutableFormatError("unknown ELF class or data encoding")
+        self.bits = bits
+        header, self._section, self._segment, self._symbol, self._dynamic = _ELF_LAYOUTS[(bits, order)]
+        self.header = self.structure(header, 0)
+        self._libraries = None
+
+    @property
+    def machine (self):
+        return _ELF_MACHINES.get(self.header.e_machine, str(self.header.e_machine))
+
+    @property
+    def type (self):
+        return _ELF_TYPES.get(self.header.e_type, str(self.header.e_type))
+
+    @property
+    def entry_point (self):
+        return self.header.e_entry
+
+    @property
+    def segments (self):
+        """
+        The program headers, as Structures.
+        """
+        size = max(self.header.e_phentsize, self._segment.size)
+        return [self.structure(self._segment, self.header.e_phoff + i * size)
+                for i in range(min(self.header.e_phnum, MAX_ENTRIES)) if self.header.e_phoff]
+
+    @property
+    def libraries (self):
+        if self._libraries is None:
+            self._libraries = []
+            for section in self.sections:
+                if section.header.sh_type != _SHT_DYNAMIC:
+                    continue
+                strings = self._linked(section)
+                size = max(section.header.sh_entsize, self._dynamic.size)
+                try:
+                    for i in range(min(section.size // size, MAX_ENTRIES)):
+                        entry = self.structure(self._dynamic, section.offset + i * size)
+                        if entry.d_tag == 0:
+                            break
+                        if entry.d_tag == _DT_NEEDED and strings is not None:
+                            self._libraries.append(self.string(strings.offset + entry.d_val))
+                except ExecutableFormatError:
+                    pass
+        return self._libraries
+
+    def headers (self):
+        return {
+            "header":   {name: value for name, value in self.header.dict().items() if name != "e_ident"},
+            "segments": [segment.dict() for segment in self.segments],
+        }
+
+    def _linked (self, section):
+        # the section referenced by sh_link (e.g. the string table of a symbol table)
+        link = section.header.sh_link
+        return self.sections[link] if 0 < link < len(self.sections) else None
+
+    def _parseSections (self):
+        offset = self.header.e_shoff
+        if offset == 0:
+            return []
+        size = max(self.header.e_shentsize, self._section.size)
+        count = self.header.e_shnum
+        names = self.header.e_shstrndx
+        # more than 0xff00 sections: count and string table index are in
+        # the first section header
+        if count == 0 or names == 0xffff:
+            first = self.structure(self._section, offset)
+            count = count or first.sh_size
+            names = first.sh_link if names == 0xffff else names
+        headers = [self.structure(self._section, offset + i * size) for i in range(min(count, MAX_ENTRIES))]
+        strings = headers[names].sh_offset if names < len(headers) else None
+        sections = []
+        for header in headers:
+            name = self.string(strings + header.sh_name) if strings is not None else ""
+            # SHT_NOBITS (.bss) occupies no space in the file
+            size = 0 if header.sh_type == 8 else header.sh_size
+            sections.append(Section(self, header, name, header.sh_addr, header.sh_offset, size, header.sh_size,
+                                    header.sh_flags))
+        return sections
+
+    def _symbols (self):
+        # (symbol, name) of the dynamic symbol table
+        for section in self.sections:
+            if section.header.sh_type != _SHT_DYNSYM:
+                continue
+            strings = self._linked(section)
+            size = max(section.header.sh_entsize, self._symbol.size)
+            try:
+                for i in range(1, min(section.size // size, MAX_ENTRIES)):
+                    symbol = self.structure(self._symbol, section.offset + i * size)
+                    name = self.string(strings.offset + symbol.st_name) if strings is not None else ""
+                    if name:
+                        yield symbol, name
+            except ExecutableFormatError:
+                pass
+
+    def _parseImports (self):
+        return [{"library": None, "name": name, "ordinal": None}
+                for symbol, name in self._symbols() if symbol.st_shndx == 0]
+
+    def _parseExports (self):
+        return [{"name": name, "ordinal": None, "address": symbol.st_value, "forwarder": None}
+                for symbol, name in self._symbols()
+                if symbol.st_shndx != 0 and symbol.st_info >> 4 in (_STB_GLOBAL, _STB_WEAK)]
+
+
+def ParseExecutable (reader):
+    """
+    Returns a PEFile or ELFFile of an MmapFileReader (from its offset on).
+    The parser only holds views of the mapping, it must not be used after
+    the reader is closed.
+    Raises an ExecutableFormatError for other files.
+    """
+    magic = reader[0:4] if len(reader) - reader.tell() >= 4 else b""
+    if magic[:2] == b"MZ":
+        return PEFile(reader)
+    if magic == b"\x7fELF":
+        return ELFFile(reader)
+    raise ExecutableFormatError("neither a PE nor an ELF file")
+
+
+class ExecutableParser (object):
+    """
+    Parses executables into plain metadata dicts (see Executable.info),
+    cached per sha256 (if given) in a LRU cache of cache_size entries.
+
+    Usage:
+        parser = ExecutableParser()
+        with MmapFileReader(path) as reader:
+            info = parser.info(reader, sha256=sha256)
+    """
+    def __init__ (self, cache_size=4096):
+        self.cache      = OrderedDict()
+        self.cache_size = cache_size
+        self.lock       = threading.Lock()
+
+    def info (self, source, sha256=None):
+        """
+        Returns the metadata of source (MmapFileReader or path).
+        Raises an ExecutableFormatError for files which are no (valid)
+        executables.
+        """
+        if sha256 is not None:
+            with self.lock:
+                if sha256 in self.cache:
+                    self.cache.move_to_end(sha256)
+                    return self.cache[sha256]
+
+        if isinstance(source, MmapFileReader):
+            info = ParseExecutable(source).info()
+        else:
+            with MmapFileReader(source) as reader:
+                info = ParseExecutable(reader).info()
+
+        if sha256 is not None:
+            with self.lock:
+                self.cache[sha256] = info
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return info
+
+
+# parser used by ExecutableInfo, created on first use
+_default = []
+
+def ExecutableInfo (source, sha256=None):
+    """
+    Returns the metadata of source (MmapFileReader or path) using a shared
+    ExecutableParser, see ExecutableParser.info.
+    """
+    if not _default:
+        _default.append(ExecutableParser())
+    return _default[0].info(source, sha256)
@@ -1,5 +1,19 @@
+import io
 import mmap
-import tempfile
+import os
+import threading
+from python3.tools import tracing
+from python3.tools.imports import LazyModule
+
+tempfile = LazyModule("tempfile")
+
+# only needed for unpacking archives
+zipfile  = LazyModule("zipfile")
+tarfile  = LazyModule("tarfile")
+gzip     = LazyModule("gzip")
+bz2      = LazyModule("bz2")
+lzma     = LazyModule("lzma")
+futures  = LazyModule("concurrent.futures")
 
 
 MEGABYTE = 2 ** 20
@@ -13,7 +27,7 @@ class TemporaryFile(object):
     The temporary file is stored in memory until it either exceeds the maximum
     size or functions like fileno() are called.
     The parameter defining the maximum in memory size is in megabytes.
-    The default value is 1GB.
+    The default value is 1GB, 0 writes to the spill directory right away.
 
     Usage:
         with TemporaryFile(max_memory_size=1) as file:
@@ -21,24 +35,174 @@ class TemporaryFile(object):
             file.flush()
             file.seek(0)
             print(file.read())
+
+        # spill to tmpfs, map the file without copying it
+        temp = TemporaryFile(max_memory_size=0, directory="/dev/shm")
+        with temp as file:
+            file.write(data)
+            reader = temp.reader()
     """
 
-    def __init__(self, max_memory_size=1024):
-        self.max_size = max_memory_size * MEGABYTE
+    def __init__(self, max_memory_size=1024, directory=None, preallocate=0, pool=None):
+        """
+        Parameters:
+            max_memory_size - Int:    Megabytes kept in memory before the file
+                                      is moved to directory
+            directory       - String: Spill directory, e.g. a tmpfs mount
+                                      (default: the tempfile default)
+            preallocate     - Int:    Expected size in bytes, disk space is
+                                      reserved up front (fallocate, Linux) and
+                                      larger files skip the in-memory phase
+            pool            - TemporaryFilePool: Reuse spilled files of the
+                                      pool instead of creating new ones
+        """
+        self.max_size    = max_memory_size * MEGABYTE
+        self.directory   = directory
+        self.preallocate = preallocate
+        self.pool        = pool
+        self.file        = None
+        self._reader     = None
 
     def __enter__(self):
         """
         Create the temporary file in memory first, when it uses too much memory
         it is automatically relocated to the filesystem.
         """
-        self.file = tempfile.SpooledTemporaryFile(max_size=self.max_size)
+        if self.pool is not None:
+            self.file = self.pool.acquire()
+        elif self.max_size <= 0 or self.preallocate > self.max_size:
+            self.file = tempfile.TemporaryFile(dir=self.directory)
+        else:
+            self.file = tempfile.SpooledTemporaryFile(max_size=self.max_size, dir=self.directory)
+        if self.preallocate > 0 and self.spilled():
+            Preallocate(self.file, self.preallocate)
         return self.file
 
     def __exit__(self, type, value, traceback):
         """
         Cleanup temporary file.
         """
-        self.file.close()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self.pool is not None:
+            self.pool.release(self.file)
+        else:
+            self.file.close()
+
+    def spilled(self):
+        """
+        Returns True if the file resides in the spill directory.
+        """
+        return getattr(self.file, "_rolled", True)
+
+    def reader(self):
+        """
+        Returns a MmapFileReader mapping the spilled file directly (None if
+        the file is empty). Files still in memory are moved to the spill
+        directory first. The reader is closed together with the file.
+        """
+        if self._reader is None:
+            self.file.flush()
+            position = self.file.tell()
+            size = self.file.seek(0, os.SEEK_END)
+            self.file.seek(position)
+            if size == 0:
+                return None
+            self._reader = MmapFileReader(self.file)
+        return self._reader
+
+
+class TemporaryFilePool(object):
+    """
+    Pool of (unlinked) temporary files in a spill directory, reused instead of
+    creating and deleting a file for every request. Released files are
+    truncated, which frees their space.
+
+    Usage:
+        pool = TemporaryFilePool(size=32, directory="/dev/shm")
+        with TemporaryFile(pool=pool) as file:
+            ...
+    """
+    def __init__(self, size=16, directory=None):
+        """
+        Parameters:
+            size      - Int:    Maximum number of idle files kept
+            directory - String: Directory of the files (default: the tempfile default)
+        """
+        self.size      = size
+        self.directory = directory
+        self.files     = []
+        self.lock      = threading.Lock()
+
+    def acquire(self):
+        """
+        Returns an empty binary file, reused if possible.
+        """
+        with self.lock:
+            if self.files:
+                return self.files.pop()
+        return tempfile.TemporaryFile(dir=self.directory)
+
+    def release(self, file):
+        """
+        Truncate file and keep it for reuse (closed if the pool is full).
+        Mappings of the file must be closed before.
+        """
+        if not file.closed:
+            file.seek(0)
+            file.truncate()
+            with self.lock:
+                if len(self.files) < self.size:
+                    self.files.append(file)
+                    return
+        file.close()
+
+    def close(self):
+        with self.lock:
+            files, self.files = self.files, []
+        for file in files:
+            file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.files)
+
+
+def Preallocate(file, size):
+    """
+    Reserve size bytes of disk space for file without changing its size
+    (fallocate with FALLOC_FL_KEEP_SIZE), so writing it later does not fail
+    with a full disk half way and its blocks are allocated contiguously.
+    Returns False where this is not supported (not Linux, file system
+    without fallocate).
+    """
+    fallocate = _fallocate()
+    if fallocate is None:
+        return False
+    return fallocate(file.fileno(), _FALLOC_FL_KEEP_SIZE, 0, size) == 0
+
+_FALLOC_FL_KEEP_SIZE = 1
+_fallocateFunction = []
+
+def _fallocate():
+    # libc fallocate(2) via ctypes, looked up once
+    if not _fallocateFunction:
+        function = None
+        try:
+            import ctypes
+            function = ctypes.CDLL(None, use_errno=True).fallocate
+            function.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+            function.restype = ctypes.c_int
+        except (ImportError, OSError, AttributeError):
+            function = None
+        _fallocateFunction.append(function)
+    return _fallocateFunction[0]
 
 
 class MmapFileReader (object):
@@ -47,6 +211,9 @@ class MmapFileReader (object):
     Reading and finding does not advance the offset, however, it is position
     aware.
 
+    Instead of a path an opened binary file object can be supplied, it stays
+    open when the reader is closed.
+
     Usage:
         # open
         file = MmapFileReader("/filepath")
@@ -54,16 +221,22 @@ class MmapFileReader (object):
         start = file.find(b"needle")
         # access data, still offset 0
         file[32987000:2323493493]
-        # create a subfile at offset start
+        # create a subfile at offset start (optionally of size bytes)
         subfile = file.subfile(start)
         # find a needle somewhere after the offset, relative to the offset
         position = subfile.find("second needle")
         # adjust offset in the subfile to after the previous find
         subfile.seek_relative(position+1)
     """
-    __slots__ = ["file","datamap","filesize","offset"]
+    __slots__ = ["file","datamap","filesize","offset","ownsfile"]
     def __init__ (self, filename):
-        self.file     = open(filename, "rb")
+        # an already opened binary file (e.g. a TemporaryFile) can be mapped
+        # directly, it is not closed together with the reader
+        self.ownsfile = not hasattr(filename, "fileno")
+        if self.ownsfile:
+            self.file = open(filename, "rb")
+        else:
+            self.file = filename
         self.datamap  = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
         self.offset   = 0
         self.filesize = self.datamap.size()
@@ -77,7 +250,8 @@ class MmapFileReader (object):
     def close (self):
         self.datamap.close()
         del(self.datamap)
-        self.file.close()
+        if self.ownsfile:
+            self.file.close()
         del(self.file)
         del(self.offset)
         del(self.filesize)
@@ -120,8 +294,16 @@ class MmapFileReader (object):
         return self.offset
 
     def find (self, needle):
+        if tracing.tracer is not None:
+            with tracing.StartSpan("MmapFileReader.find", offset=self.offset, size=self.filesize-self.offset) as span:
+                result = self.__find(needle)
+                span.set("found", result)
+                return result
+        return self.__find(needle)
+
+    def __find (self, needle):
         self.datamap.seek(0)
-        result = self.datamap.find(needle, self.offset)
+        result = self.datamap.find(needle, self.offset, self.filesize)
         self.datamap.seek(self.offset)
         if result != -1:
             result -= self.offset
@@ -149,7 +331,8 @@ class MmapFileReader (object):
                 start = 0
             return self.read(start, start+1)
 
-    def subfile (self, start):
+    def subfile (self, start, size=None):
+        # the subfile ends with the file (or subfile), or after size bytes if given
         class MmapFileSubReader (MmapFileReader):
             __slots__ = ["file","datamap","size","offset"]
             # lightweight subtype of LargeFileReader offering adjusted offset
@@ -160,10 +343,274 @@ class MmapFileReader (object):
                 self.offset   = max(0, min(start, size))
             def close (self):
                 pass  # remove close ability
-            def subfile (self, start):
-                pass  # remove subfile ability
-        return MmapFileSubReader(self.file, self.datamap, self.offset+start, self.filesize)
+        end = self.filesize
+        if size is not None:
+            end = max(0, min(self.offset+start+size, end))
+        return MmapFileSubReader(self.file, self.datamap, self.offset+start, end)
 
     # provide standard functions
     def __len__ (self):
         return self.filesize
+
+
+class UnpackLimitError (ValueError):
+    """
+    Raised by ArchiveUnpacker if an archive exceeds one of its limits.
+    """
+    pass
+
+
+class ArchiveMember (object):
+    """
+    A decompressed member of an archive, stored in a TemporaryFile (in memory
+    up to the unpacker's max_memory_size, on disk beyond).
+    """
+    __slots__ = ["name", "size", "file", "_temp"]
+
+    def __init__ (self, name, max_memory_size, directory=None):
+        self.name  = name
+        self.size  = 0
+        self._temp = TemporaryFile(max_memory_size=max_memory_size, directory=directory)
+        self.file  = self._temp.__enter__()
+
+    def reader (self):
+        """
+        Returns a MmapFileReader over the member (None if it is empty). The
+        reader is closed together with the member.
+        """
+        return self._temp.reader()
+
+    def read (self):
+        """
+        Returns the contents of the member as bytes.
+        """
+        self.file.seek(0)
+        return self.file.read()
+
+    def close (self):
+        if self._temp is not None:
+            self._temp.__exit__(None, None, None)
+            self._temp = None
+            self.file  = None
+
+
+class ArchiveUnpacker (object):
+    """
+    Streams the members of zip, tar (also gzip/bzip2/xz compressed) archives
+    and of gzip, bzip2 and xz compressed files into TemporaryFiles, instead
+    of decompressing them into memory. Input that is neither is returned
+    as a single member.
+
+    Decompression stops with an UnpackLimitError as soon as the decompressed
+    data exceeds max_total_size, max_ratio times the size of the input (or
+    of a zip member's compressed size), or the archive has more than
+    max_members members. Sizes stated in archive headers are not trusted.
+
+    Usage:
+        with ArchiveUnpacker("/path/sample.zip", max_total_size=512*MEGABYTE) as unpacker:
+            for member in unpacker:
+                reader = member.reader()   # MmapFileReader
+                ...
+    Members stay valid until the unpacker is closed (or member.close()).
+    """
+    def __init__ (self, source, max_total_size=1024*MEGABYTE, max_ratio=100, max_members=10000,
+                  max_memory_size=16, workers=None, directory=None):
+        """
+        Parameters:
+            source          - String:         Path of the archive
+                              Bytes:          Contents of the archive
+                              MmapFileReader: Read from its current offset
+                              File object:    Binary stream (zip needs it to be seekable)
+            max_total_size  - Int:   Bytes all members may take decompressed
+            max_ratio       - Float: Maximum ratio of decompressed to compressed size
+            max_members     - Int:   Maximum number of members
+            max_memory_size - Int:   Megabytes a member is kept in memory before
+                                     it is moved to disk
+            workers         - Int:   Decompress zip members in this many threads
+                                     (zlib, bz2 and lzma release the GIL)
+            directory       - String: Spill directory of large members (see
+                                     TemporaryFile)
+        """
+        self.max_total_size  = max_total_size
+        self.max_ratio       = max_ratio
+        self.max_members     = max_members
+        self.max_memory_size = max_memory_size
+        self.workers         = workers
+        self.directory       = directory
+        self.members         = []
+        self.total           = 0
+        self.lock            = threading.Lock()
+        self.ownsstream      = isinstance(source, str)
+        if isinstance(source, str):
+            self.stream = open(source, "rb")
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self.stream = io.BytesIO(source)
+        elif isinstance(source, MmapFileReader):
+            self.stream = io.BufferedReader(_MappedStream(source))
+        else:
+            self.stream = source
+        self.compressed = _remaining(self.stream)
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, type, value, traceback):
+        self.close()
+
+    def close (self):
+        for member in self.members:
+            member.close()
+        self.members = []
+        if self.ownsstream and self.stream is not None:
+            self.stream.close()
+        self.stream = None
+
+    def __iter__ (self):
+        head = _Prefixed(b"", self.stream)
+        magic = head.peek(6)
+        if magic[:4] in (b"PK\x03\x04", b"PK\x05\x06"):
+            yield from self.__unpackZip(head.prefix)
+            return
+        name = "data"
+        for prefix, opener, suffix in _compressions:
+            if magic.startswith(prefix):
+                head = _Prefixed(b"", opener(head))
+                name = suffix
+                break
+        if head.peek(262)[257:262] == b"ustar":
+            yield from self.__unpackTar(head)
+        else:
+            yield self.__store(name, head.read, None)
+
+    def __unpackTar (self, stream):
+        with tarfile.open(fileobj=stream, mode="r|") as archive:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                yield self.__store(info.name, archive.extractfile(info).read, None)
+
+    def __unpackZip (self, prefix):
+        if not self.stream.seekable():
+            raise ValueError("zip archives can only be unpacked from seekable streams")
+        self.stream.seek(-len(prefix), os.SEEK_CUR)  # undo the look ahead
+        with zipfile.ZipFile(self.stream) as archive:
+            infos = [info for info in archive.infolist() if not info.is_dir()]
+            if len(infos) > self.max_members:
+                raise UnpackLimitError("archive has more than {} members".format(self.max_members))
+
+            def unpack(info):
+                with archive.open(info) as member:
+                    return self.__store(info.filename, member.read, info.compress_size)
+
+            if self.workers and self.workers > 1 and len(infos) > 1:
+                with futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    yield from executor.map(unpack, infos)
+            else:
+                for info in infos:
+                    yield unpack(info)
+
+    def __store (self, name, read, compressed):
+        # copy a decompressed stream into a new member, enforcing the limits.
+        # Members are not preallocated: the sizes stated in archive headers
+        # are forgeable and every member stays open until the unpacker closes
+        with self.lock:
+            if len(self.members) >= self.max_members:
+                raise UnpackLimitError("archive has more than {} members".format(self.max_members))
+            member = ArchiveMember(name, self.max_memory_size, self.directory)
+            self.members.append(member)
+        memberLimit = None if compressed is None else self.max_ratio * max(compressed, 1)
+        while True:
+            chunk = read(MEGABYTE)
+            if not chunk:
+                break
+            member.file.write(chunk)
+            member.size += len(chunk)
+            with self.lock:
+                self.total += len(chunk)
+                total = self.total
+            if total > self.max_total_size:
+                raise UnpackLimitError("decompressed size exceeds {} bytes".format(self.max_total_size))
+            if self.compressed is not None and total > self.max_ratio * max(self.compressed, 1):
+                raise UnpackLimitError("decompression ratio exceeds {}".format(self.max_ratio))
+            if memberLimit is not None and member.size > memberLimit:
+                raise UnpackLimitError("decompression ratio of {} exceeds {}".format(name, self.max_ratio))
+        member.file.seek(0)
+        return member
+
+
+# magic, decompressing stream factory, name of the decompressed member
+_compressions = [
+    (b"\x1f\x8b",           lambda stream: gzip.GzipFile(fileobj=stream, mode="rb"), "data"),
+    (b"BZh",                lambda stream: bz2.BZ2File(stream, mode="rb"),           "data"),
+    (b"\xfd7zXZ\x00",       lambda stream: lzma.LZMAFile(stream, mode="rb"),         "data"),
+]
+
+
+def _remaining(stream):
+    # number of bytes left in stream, None if it cannot seek
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END)
+        stream.seek(position)
+        return size - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class _Prefixed (object):
+    # read-only stream of prefix followed by the rest of stream, supports
+    # looking ahead without seeking (for non-seekable and compressed streams)
+    def __init__ (self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def peek (self, size):
+        if len(self.prefix) < size:
+            self.prefix += self.stream.read(size - len(self.prefix))
+        return self.prefix[:size]
+
+    def read (self, size=-1):
+        if self.prefix:
+            if size is None or size < 0:
+                data, self.prefix = self.prefix + self.stream.read(), b""
+                return data
+            data, self.prefix = self.prefix[:size], self.prefix[size:]
+            if len(data) < size:
+                data += self.stream.read(size - len(data))
+            return data
+        return self.stream.read(size)
+
+
+class _MappedStream (io.RawIOBase):
+    # seekable raw stream over the mapping of a MmapFileReader, starting at
+    # its offset, reads copy straight out of the mapping
+    def __init__ (self, reader):
+        self.datamap  = reader.datamap
+        self.start    = reader.offset
+        self.position = reader.offset
+        self.end      = reader.filesize
+
+    def readable (self):
+        return True
+
+    def seekable (self):
+        return True
+
+    def readinto (self, buffer):
+        length = max(0, min(len(buffer), self.end - self.position))
+        buffer[:length] = self.datamap[self.position:self.position+length]
+        self.position += length
+        return length
+
+    def seek (self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            position = self.start + offset
+        elif whence == os.SEEK_CUR:
+            position = self.position + offset
+        else:
+            position = self.end + offset
+        self.position = max(self.start, position)
+        return self.position - self.start
+
+    def tell (self):
+        return self.position - self.start
@@ -0,0 +1,336 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from python3.tools.files import MmapFileReader
+from python3.tools.imports import LazyModule
+
+# only needed for the batch mode
+futures = LazyModule("concurrent.futures")
+
+
+# bytes read from the start of a file, nearly all signatures are found in it
+HEADER_SIZE = 4096
+
+# bytes read from the end of zip files to find the names of their members
+ZIP_TAIL_SIZE = 65536
+
+
+class FileType (object):
+    """
+    Result of the identification: a short name (e.g. "pe", "elf", "docx"),
+    the mime type and a description (e.g. "PE32+ executable (DLL)").
+    """
+    __slots__ = ["name", "mime", "description"]
+
+    def __init__(self, name, mime, description):
+        self.name        = name
+        self.mime        = mime
+        self.description = description
+
+    def dict(self):
+        """
+        Returns the fields as a dict, e.g. for ServiceResultSet.add.
+        """
+        return {"name": self.name, "mime": self.mime, "description": self.description}
+
+    def __eq__(self, other):
+        return isinstance(other, FileType) and self.dict() == other.dict()
+
+    def __hash__(self):
+        return hash((self.name, self.mime, self.description))
+
+    def __repr__(self):
+        return "FileType({!r}, {!r}, {!r})".format(self.name, self.mime, self.description)
+
+
+UNKNOWN = FileType("data", "application/octet-stream", "data")
+
+
+# offset, magic bytes, name, mime type, description
+SIGNATURES = [
+    (0,      b"MZ",                                "msdos",     "application/x-dosexec",          "MS-DOS executable"),
+    (0,      b"\x7fELF",                           "elf",       "application/x-executable",       "ELF"),
+    (0,      b"\xfe\xed\xfa\xce",                  "macho",     "application/x-mach-binary",      "Mach-O 32-bit (big endian)"),
+    (0,      b"\xce\xfa\xed\xfe",                  "macho",     "application/x-mach-binary",      "Mach-O 32-bit"),
+    (0,      b"\xfe\xed\xfa\xcf",                  "macho",     "application/x-mach-binary",      "Mach-O 64-bit (big endian)"),
+    (0,      b"\xcf\xfa\xed\xfe",                  "macho",     "application/x-mach-binary",      "Mach-O 64-bit"),
+    (0,      b"\xca\xfe\xba\xbe",                  "macho-fat", "application/x-mach-binary",      "Mach-O universal binary"),
+    (0,      b"dex\n",                             "dex",       "application/x-dex",              "Dalvik executable"),
+    (0,      b"\x00asm",                           "wasm",      "application/wasm",               "WebAssembly module"),
+    (0,      b"PK\x03\x04",                        "zip",       "application/zip",                "Zip archive"),
+    (0,      b"PK\x05\x06",                        "zip",       "application/zip",                "Zip archive (empty)"),
+    (0,      b"%PDF-",                             "pdf",       "application/pdf",                "PDF document"),
+    (0,      b"{\\rtf",                            "rtf",       "text/rtf",                       "Rich Text Format document"),
+    (0,      b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",  "ole",       "application/x-ole-storage",      "OLE compound document"),
+    (0,      b"\x1f\x8b",                          "gzip",      "application/gzip",               "gzip compressed data"),
+    (0,      b"BZh",                               "bzip2",     "application/x-bzip2",            "bzip2 compressed data"),
+    (0,      b"\xfd7zXZ\x00",                      "xz",        "application/x-xz",               "XZ compressed data"),
+    (0,      b"\x28\xb5\x2f\xfd",                  "zstd",      "application/zstd",               "Zstandard compressed data"),
+    (0,      b"7z\xbc\xaf\x27\x1c",                "7z",        "application/x-7z-compressed",    "7-zip archive"),
+    (0,      b"Rar!\x1a\x07",                      "rar",       "application/vnd.rar",            "RAR archive"),
+    (0,      b"MSCF\x00\x00\x00\x00",              "cab",       "application/vnd.ms-cab-compressed", "Microsoft Cabinet archive"),
+    (0,      b"\x89PNG\r\n\x1a\n",                 "png",       "image/png",                      "PNG image"),
+    (0,      b"\xff\xd8\xff",                      "jpeg",      "image/jpeg",                     "JPEG image"),
+    (0,      b"GIF87a",                            "gif",       "image/gif",                      "GIF image"),
+    (0,      b"GIF89a",                            "gif",       "image/gif",                      "GIF image"),
+    (0,      b"#!",                                "script",    "text/plain",                     "script"),
+    (0,      b"<?php",                             "php",       "text/x-php",                     "PHP script"),
+    (257,    b"ustar",                             "tar",       "application/x-tar",              "tar archive"),
+    (0x8001, b"CD001",                             "iso9660",   "application/x-iso9660-image",    "ISO 9660 CD-ROM image"),
+]
+
+
+class FileTypeIdentifier (object):
+    """
+    Identifies file types by their magic numbers. Signatures at offset 0 are
+    compiled into a prefix trie, so a single walk over the first bytes finds
+    the longest matching one, signatures at other offsets are checked after.
+    Executables, zip based formats and scripts are refined with a few more
+    reads (PE header, zip member names, shebang line).
+
+    Results are cached per sha256 (if given) in a LRU cache of cache_size
+    entries.
+
+    Usage:
+        identifier = FileTypeIdentifier()
+        with MmapFileReader(path) as reader:
+            filetype = identifier.identify(reader, sha256=sha256)
+        filetype.name          # e.g. "pe"
+        filetype.description   # e.g. "PE32 executable (DLL)"
+        identifier.identifyDirectory("/samples", workers=8)
+    """
+    def __init__(self, signatures=SIGNATURES, cache_size=65536):
+        self.trie       = ({}, None)
+        self.offsets    = []
+        self.cache      = OrderedDict()
+        self.cache_size = cache_size
+        self.lock       = threading.Lock()
+        for offset, magic, name, mime, description in signatures:
+            filetype = FileType(name, mime, description)
+            if offset == 0:
+                self.__insert(magic, filetype)
+            else:
+                self.offsets.append((offset, magic, filetype))
+
+    def __insert(self, magic, filetype):
+        node = self.trie
+        for i, byte in enumerate(magic):
+            children = node[0]
+            if byte not in children:
+                children[byte] = ({}, None)
+            if i == len(magic) - 1:
+                children[byte] = (children[byte][0], filetype)
+            node = children[byte]
+
+    def identify(self, source, sha256=None):
+        """
+        Returns the FileType of source (MmapFileReader, path or bytes), UNKNOWN
+        if no signature matches and the start of the file is not text.
+        """
+        if sha256 is not None:
+            with self.lock:
+                if sha256 in self.cache:
+                    self.cache.move_to_end(sha256)
+                    return self.cache[sha256]
+
+        if isinstance(source, MmapFileReader):
+            filetype = self.__identify(source[0:HEADER_SIZE], len(source) - source.tell(), lambda start, length: source[start:start+length])
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            data = bytes(source)
+            filetype = self.__identify(data[:HEADER_SIZE], len(data), lambda start, length: data[start:start+length])
+        else:
+            with open(source, "rb") as file:
+                def read(start, length):
+                    file.seek(start)
+                    return file.read(length)
+                filetype = self.__identify(file.read(HEADER_SIZE), os.fstat(file.fileno()).st_size, read)
+
+        if sha256 is not None:
+            with self.lock:
+                self.cache[sha256] = filetype
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        return filetype
+
+    def identifyDirectory(self, path, workers=8, recursive=False):
+        """
+        Identify every file of a directory in a pool of threads (the work is
+        mostly waiting for reads). Returns a dict mapping the paths relative
+        to path to their FileType. File names which are sha256 hashes (as in
+        sample stores) are used as cache keys.
+        """
+        files = []
+        if recursive:
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names)
+        else:
+            files = [entry.path for entry in os.scandir(path) if entry.is_file()]
+
+        def identify(filepath):
+            name = os.path.basename(filepath).lower()
+            return self.identify(filepath, sha256=name if _sha256Regex.fullmatch(name) else None)
+
+        with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            filetypes = executor.map(identify, files)
+            return {os.path.relpath(filepath, path): filetype for filepath, filetype in zip(files, filetypes)}
+
+    def __identify(self, header, size, read):
+        if isinstance(header, int):
+            header = bytes([header])  # MmapFileReader returns an int for single bytes
+        # longest signature at offset 0
+        filetype = None
+        node = self.trie
+        for byte in header:
+            node = node[0].get(byte)
+            if node is None:
+                break
+            if node[1] is not None:
+                filetype = node[1]
+        if filetype is None:
+            for offset, magic, candidate in self.offsets:
+                if offset + len(magic) <= size and read(offset, len(magic)) == magic:
+                    filetype = candidate
+                    break
+        if filetype is None:
+            return _identifyText(header)
+        refine = _refiners.get(filetype.name)
+        if refine is not None:
+            return refine(filetype, header, size, read) or filetype
+        return filetype
+
+
+"""
+Refinement of the signatures, each returns a more specific FileType or None.
+"""
+
+def _refinePE(filetype, header, size, read):
+    if len(header) < 0x40:
+        return None
+    lfanew = int.from_bytes(header[0x3c:0x40], "little")
+    if lfanew + 26 > size:
+        return None
+    pe = header[lfanew:lfanew+26] if lfanew + 26 <= len(header) else read(lfanew, 26)
+    if pe[:4] != b"PE\x00\x00":
+        return None
+    characteristics = int.from_bytes(pe[22:24], "little")
+    magic = int.from_bytes(pe[24:26], "little")
+    bits = {0x10b: "PE32", 0x20b: "PE32+"}.get(magic, "PE")
+    kind = "DLL" if characteristics & 0x2000 else "executable"
+    return FileType("pe", "application/vnd.microsoft.portable-executable", "{} executable ({})".format(bits, kind)
+                    if kind == "DLL" else "{} executable".format(bits))
+
+def _refineELF(filetype, header, size, read):
+    if len(header) < 18:
+        return None
+    bits = {1: "32-bit", 2: "64-bit"}.get(header[4], "")
+    order = "little" if header[5] == 1 else "big"
+    kind = {1: "relocatable", 2: "executable", 3: "shared object", 4: "core file"}.get(
+        int.from_bytes(header[16:18], order), "")
+    mime = "application/x-sharedlib" if kind == "shared object" else filetype.mime
+    return FileType("elf", mime, " ".join(part for part in ("ELF", bits, kind) if part))
+
+def _refineFat(filetype, header, size, read):
+    # java class files share the magic, their version follows (45 and up),
+    # universal binaries are followed by the small number of architectures
+    if len(header) >= 8 and int.from_bytes(header[4:8], "big") >= 30:
+        return FileType("java-class", "application/java-vm", "Java class file")
+    return None
+
+_zipMarkers = [
+    (b"AndroidManifest.xml", FileType("apk",  "application/vnd.android.package-archive", "Android package")),
+    (b"[Content_Types].xml", None),  # OOXML, resolved below
+    (b"META-INF/MANIFEST.MF", FileType("jar", "application/java-archive", "Java archive")),
+    (b"mimetypeapplication/vnd.oasis.opendocument.text", FileType("odt", "application/vnd.oasis.opendocument.text", "OpenDocument text")),
+    (b"mimetypeapplication/vnd.oasis.opendocument.spreadsheet", FileType("ods", "application/vnd.oasis.opendocument.spreadsheet", "OpenDocument spreadsheet")),
+]
+_ooxml = [
+    (b"word/", FileType("docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document", "Microsoft Word document")),
+    (b"xl/",   FileType("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "Microsoft Excel spreadsheet")),
+    (b"ppt/",  FileType("pptx", "application/vnd.openxmlformats-officedocument.presentationml.presentation", "Microsoft PowerPoint presentation")),
+]
+
+def _refineZipMarkers(filetype, header, size, read):
+    names = header
+    if size > len(header):
+        start = max(len(header), size - ZIP_TAIL_SIZE)
+        names = header + read(start, size - start)
+    for marker, refined in _zipMarkers:
+        if marker not in names:
+            continue
+        if refined is not None:
+            return refined
+        for part, document in _ooxml:
+            if part in names:
+                return document
+        return FileType("ooxml", "application/zip", "Office Open XML document")
+    return None
+
+def _refineScript(filetype, header, size, read):
+    line = header[2:header.find(b"\n")] if b"\n" in header else header[2:]
+    words = line.strip().split()
+    if not words:
+        return None
+    interpreter = os.path.basename(words[0])
+    if interpreter == b"env" and len(words) > 1:
+        interpreter = words[1]
+    interpreter = interpreter.decode("ascii", "replace").rstrip("0123456789.")
+    for prefix, name, mime, description in _interpreters:
+        if interpreter == prefix:
+            return FileType(name, mime, description)
+    return FileType("script", "text/plain", "{} script".format(interpreter))
+
+_interpreters = [
+    ("python", "python",     "text/x-python",          "Python script"),
+    ("sh",     "shell",      "text/x-shellscript",     "shell script"),
+    ("bash",   "shell",      "text/x-shellscript",     "Bash script"),
+    ("dash",   "shell",      "text/x-shellscript",     "shell script"),
+    ("zsh",    "shell",      "text/x-shellscript",     "Zsh script"),
+    ("perl",   "perl",       "text/x-perl",            "Perl script"),
+    ("ruby",   "ruby",       "text/x-ruby",            "Ruby script"),
+    ("node",   "javascript", "application/javascript", "Node.js script"),
+    ("php",    "php",        "text/x-php",             "PHP script"),
+]
+
+def _identifyText(header):
+    if not header or b"\x00" in header:
+        return UNKNOWN
+    try:
+        text = header.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start < len(header) - 3:
+            return UNKNOWN  # not just a character cut at the end of the header
+        text = header[:e.start].decode("utf-8")
+    if any(c < " " and c not in "\t\r\n\f" for c in text):
+        return UNKNOWN
+    start = text.lstrip("\ufeff \t\r\n").lower()
+    if start.startswith("<?xml"):
+        return FileType("xml", "text/xml", "XML document")
+    if start.startswith("<!doctype html") or start.startswith("<html"):
+        return FileType("html", "text/html", "HTML document")
+    if start.startswith("@echo off"):
+        return FileType("batch", "text/x-msdos-batch", "DOS batch file")
+    return FileType("text", "text/plain", "text")
+
+_refiners = {
+    "msdos":     _refinePE,
+    "elf":       _refineELF,
+    "macho-fat": _refineFat,
+    "zip":       _refineZipMarkers,
+    "script":    _refineScript,
+}
+
+_sha256Regex = re.compile("[0-9a-f]{64}")
+
+
+# identifier used by Identify, created on first use
+_default = []
+
+def Identify(source, sha256=None):
+    """
+    Returns the FileType of source (MmapFileReader, path or bytes) using a
+    shared FileTypeIdentifier, see FileTypeIdentifier.identify.
+    """
+    if not _default:
+        _default.append(FileTypeIdentifier())
+    return _default[0].identify(source, sha256)
@@ -0,0 +1,375 @@
+import os
+from python3.tools.files import MmapFileReader, MEGABYTE
+
+# Optional, vectorizes the hashing (pure Python otherwise, about 100x slower)
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# bytes hashed at once
+CHUNK_SIZE = 4 * MEGABYTE
+
+# size of the rolling hash window, also the length of the common substring
+# two signatures need to be compared
+ROLLING_WINDOW = 7
+
+# smallest block size, block sizes are MIN_BLOCKSIZE * 2^i
+MIN_BLOCKSIZE = 3
+BLOCKSIZES = 31
+
+# maximum length of the first signature (the second one has half of it)
+SIGNATURE_LENGTH = 64
+
+B64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+# piece hash: polynomial over the bytes of a piece, P^-1 allows computing it
+# from prefix sums (see FuzzyHasher)
+_P = 0x01000193
+_Q = pow(_P, -1, 2 ** 32)
+_MASK = 0xffffffff
+
+
+class FuzzyHasher (object):
+    """
+    Context triggered piecewise hash (CTPH) in the format of ssdeep
+    ("blocksize:signature:signature2"), computed in a single streaming pass.
+
+    Pieces end where the ssdeep rolling hash over 7 bytes triggers, every
+    piece contributes one base64 character. The hash of a piece is a
+    polynomial hash (instead of the sequential FNV hash of ssdeep) which can
+    be computed for all pieces and all block sizes at once from prefix sums,
+    so the digests are NOT interchangeable with those of ssdeep.
+
+    Usage:
+        hasher = FuzzyHasher()
+        hasher.update(chunk)
+        hasher.hexdigest()   # e.g. "96:Ab3...:Xy..."
+
+    update and hexdigest make it usable in hashing.MultiHash (as "ctph").
+    """
+    __slots__ = ["size", "tail", "prefix", "qpower", "ppower", "counts", "positions", "prefixes", "chars"]
+
+    def __init__ (self):
+        self.size      = 0           # bytes hashed
+        self.tail      = b""         # last bytes, the rolling window of the next update
+        self.prefix    = 0           # prefix sum A over all bytes
+        self.qpower    = 1           # Q^size
+        self.ppower    = 1           # P^size
+        # per block size: number of triggers, and position, prefix sum and
+        # character of the first SIGNATURE_LENGTH - 1 of them
+        self.counts    = [0] * BLOCKSIZES
+        self.positions = [[] for _ in range(BLOCKSIZES)]
+        self.prefixes  = [[] for _ in range(BLOCKSIZES)]
+        self.chars     = [[] for _ in range(BLOCKSIZES)]
+
+    def update (self, data):
+        """
+        Hash the next bytes (bytes-like).
+        """
+        if not len(data):
+            return
+        if numpy is not None:
+            self.__updateNumpy(data)
+        else:
+            self.__updatePython(data)
+        window = bytes(self.tail[-(ROLLING_WINDOW - 1):]) + bytes(data[-(ROLLING_WINDOW - 1):])
+        self.tail = window[-(ROLLING_WINDOW - 1):]
+
+    def __updateNumpy (self, data):
+        chunk = numpy.frombuffer(data, numpy.uint8)
+        n = len(chunk)
+        # rolling hash of ssdeep: h1 = sum of the window, h2 = sum weighted by
+        # recency, h3 = xor of the window bytes shifted by 5 bits per step
+        padded = numpy.zeros(n + ROLLING_WINDOW - 1, numpy.uint32)
+        tail = numpy.frombuffer(self.tail, numpy.uint8)
+        padded[ROLLING_WINDOW - 1 - len(tail):ROLLING_WINDOW - 1] = tail
+        padded[ROLLING_WINDOW - 1:] = chunk
+        roll = numpy.zeros(n, numpy.uint32)
+        h3 = numpy.zeros(n, numpy.uint32)
+        scratch = numpy.empty(n, numpy.uint32)
+        for k in range(ROLLING_WINDOW):
+            window = padded[ROLLING_WINDOW - 1 - k:ROLLING_WINDOW - 1 - k + n]
+            numpy.multiply(window, numpy.uint32(ROLLING_WINDOW + 1 - k), out=scratch)   # h1 + h2
+            roll += scratch
+            numpy.left_shift(window, numpy.uint32(5 * k), out=scratch)
+            h3 ^= scratch
+        roll += h3
+
+        # prefix sums A_g = sum c_j Q^j, piece (a, b] hashes to (A_b - A_a) P^b
+        qpowers, ppowers = _powers(n)
+        numpy.multiply(chunk, qpowers, out=scratch)
+        scratch *= numpy.uint32(self.qpower)
+        prefixes = numpy.cumsum(scratch, dtype=numpy.uint32)
+        prefixes += numpy.uint32(self.prefix)
+        ppowers = ppowers * numpy.uint32(self.ppower)
+
+        triggers = numpy.flatnonzero(roll % MIN_BLOCKSIZE == MIN_BLOCKSIZE - 1)
+        for i in range(BLOCKSIZES):
+            blocksize = MIN_BLOCKSIZE << i
+            if i > 0:
+                triggers = triggers[roll[triggers] % blocksize == blocksize - 1]
+            if len(triggers) == 0:
+                break
+            needed = SIGNATURE_LENGTH - 1 - len(self.chars[i])
+            if needed > 0:
+                selected = triggers[:needed]
+                ends = prefixes[selected]
+                starts = numpy.empty_like(ends)
+                starts[0] = self.prefixes[i][-1] if self.prefixes[i] else 0
+                starts[1:] = ends[:-1]
+                hashes = (ends - starts) * ppowers[selected]
+                self.chars[i].extend((hashes >> numpy.uint32(26)).tolist())
+                self.prefixes[i].extend(ends.tolist())
+                self.positions[i].extend((selected + self.size).tolist())
+            self.counts[i] += len(triggers)
+
+        self.prefix = int(prefixes[-1])
+        self.qpower = self.qpower * pow(_Q, n, 2 ** 32) & _MASK
+        self.ppower = int(ppowers[-1]) * _P & _MASK
+        self.size += n
+
+    def __updatePython (self, data):
+        window = [0] * (ROLLING_WINDOW - len(self.tail)) + list(self.tail)
+        prefix, qpower, ppower = self.prefix, self.qpower, self.ppower
+        position = self.size
+        for c in bytes(data):
+            window = window[1:] + [c]
+            roll = 0
+            h3 = 0
+            for k in range(ROLLING_WINDOW):
+                roll += window[-1 - k] * (ROLLING_WINDOW + 1 - k)
+                h3 ^= window[-1 - k] << (5 * k)
+            roll = (roll + h3) & _MASK
+            prefix = (prefix + c * qpower) & _MASK
+            blocksize = MIN_BLOCKSIZE
+            for i in range(BLOCKSIZES):
+                if roll % blocksize != blocksize - 1:
+                    break
+                if len(self.chars[i]) < SIGNATURE_LENGTH - 1:
+                    start = self.prefixes[i][-1] if self.prefixes[i] else 0
+                    self.chars[i].append(((prefix - start) * ppower & _MASK) >> 26)
+                    self.prefixes[i].append(prefix)
+                    self.positions[i].append(position)
+                self.counts[i] += 1
+                blocksize <<= 1
+            qpower = qpower * _Q & _MASK
+            ppower = ppower * _P & _MASK
+            position += 1
+        self.prefix, self.qpower, self.ppower, self.size = prefix, qpower, ppower, position
+
+    def __signature (self, i, length):
+        # characters of the first length - 1 triggers of block size i, plus
+        # one for the rest of the data
+        count = min(self.counts[i], length - 1)
+        chars = self.chars[i][:count]
+        last = self.positions[i][count-1] if count else -1
+        if last < self.size - 1:
+            start = self.prefixes[i][count-1] if count else 0
+            # P^(size-1), the power of the last byte
+            ppower = self.ppower * _Q & _MASK
+            chars.append(((self.prefix - start) * ppower & _MASK) >> 26)
+        return "".join(B64[c] for c in chars)
+
+    def hexdigest (self):
+        """
+        Returns the digest "blocksize:signature:signature2". The block size is
+        the smallest for which SIGNATURE_LENGTH pieces are expected, reduced
+        while the signature would be shorter than half of it.
+        """
+        i = 0
+        while i < BLOCKSIZES - 1 and (MIN_BLOCKSIZE << i) * SIGNATURE_LENGTH < self.size:
+            i += 1
+        while i > 0 and min(self.counts[i], SIGNATURE_LENGTH - 1) < SIGNATURE_LENGTH // 2:
+            i -= 1
+        signature2 = self.__signature(i + 1, SIGNATURE_LENGTH // 2) if i + 1 < BLOCKSIZES else ""
+        return "{}:{}:{}".format(MIN_BLOCKSIZE << i, self.__signature(i, SIGNATURE_LENGTH), signature2)
+
+    digest = hexdigest
+
+
+def FuzzyHash (source, chunk_size=CHUNK_SIZE):
+    """
+    Returns the fuzzy hash of source in a single pass.
+
+    Parameters:
+        source - MmapFileReader: hashed from its current offset on
+                 String:         path of the file
+                 Bytes-like:     e.g. bytes or bytearray
+                 File object:    binary stream, read from its current position
+    """
+    hasher = FuzzyHasher()
+    if isinstance(source, MmapFileReader):
+        with memoryview(source.datamap) as view:
+            for start in range(source.offset, source.filesize, chunk_size):
+                hasher.update(view[start:min(start+chunk_size, source.filesize)])
+    elif isinstance(source, str):
+        with open(source, "rb") as file:
+            return FuzzyHash(file, chunk_size)
+    elif hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    else:
+        with memoryview(source) as view:
+            for start in range(0, len(view), chunk_size):
+                hasher.update(view[start:start+chunk_size])
+    return hasher.hexdigest()
+
+
+def Compare (hash1, hash2):
+    """
+    Returns the similarity of two fuzzy hashes from 0 (unrelated) to 100
+    (identical or nearly). Hashes can only be compared if their block sizes
+    are equal or differ by a factor of two. Raises a ValueError for
+    malformed hashes.
+    """
+    blocksize1, first1, second1 = _parse(hash1)
+    blocksize2, first2, second2 = _parse(hash2)
+    if blocksize1 == blocksize2:
+        if first1 == first2 and first1:
+            return 100
+        return max(_score(first1, first2, blocksize1), _score(second1, second2, blocksize1 * 2))
+    if blocksize1 == blocksize2 * 2:
+        return _score(first1, second2, blocksize1)
+    if blocksize2 == blocksize1 * 2:
+        return _score(second1, first2, blocksize2)
+    return 0
+
+
+class FuzzyHashIndex (object):
+    """
+    Index for near-duplicate search over many fuzzy hashes. Two signatures
+    can only score above 0 if they share a substring of ROLLING_WINDOW
+    characters, so every signature is indexed under its 7-grams (together
+    with its block size) and a search only scores the hashes sharing a
+    bucket with the query, instead of comparing against all of them.
+
+    Usage:
+        index = FuzzyHashIndex()
+        index.add(sha256, fuzzyhash)
+        index.search(fuzzyhash, threshold=50)   # [(sha256, score), ...]
+    """
+    def __init__ (self):
+        self.buckets = {}
+        self.hashes  = {}
+
+    def add (self, key, fuzzyhash):
+        """
+        Index fuzzyhash under key (e.g. the sample's sha256), replacing a
+        previous hash of key.
+        """
+        if key in self.hashes:
+            self.remove(key)
+        self.hashes[key] = fuzzyhash
+        for gram in self.__grams(fuzzyhash):
+            self.buckets.setdefault(gram, []).append(key)
+
+    def remove (self, key):
+        fuzzyhash = self.hashes.pop(key)
+        for gram in self.__grams(fuzzyhash):
+            bucket = self.buckets[gram]
+            bucket.remove(key)
+            if not bucket:
+                del self.buckets[gram]
+
+    def search (self, fuzzyhash, threshold=1, limit=None):
+        """
+        Returns a list of (key, score) of the indexed hashes scoring at least
+        threshold against fuzzyhash, best first.
+        """
+        candidates = set()
+        for gram in self.__grams(fuzzyhash):
+            candidates.update(self.buckets.get(gram, ()))
+        results = []
+        for key in candidates:
+            score = Compare(fuzzyhash, self.hashes[key])
+            if score >= threshold:
+                results.append((key, score))
+        results.sort(key=lambda result: (-result[1], str(result[0])))
+        return results[:limit] if limit is not None else results
+
+    def __len__ (self):
+        return len(self.hashes)
+
+    def __contains__ (self, key):
+        return key in self.hashes
+
+    @staticmethod
+    def __grams (fuzzyhash):
+        # (block size, 7-gram) of both signatures
+        blocksize, first, second = _parse(fuzzyhash)
+        grams = set()
+        for size, signature in ((blocksize, first), (blocksize * 2, second)):
+            signature = _eliminateSequences(signature)
+            for i in range(len(signature) - ROLLING_WINDOW + 1):
+                grams.add((size, signature[i:i+ROLLING_WINDOW]))
+        return grams
+
+
+def _powers (n):
+    # Q^0 .. Q^(n-1) and P^0 .. P^(n-1) mod 2^32, cached for the chunk size
+    if len(_powerCache[0]) < n:
+        factors = numpy.full(n, _Q, numpy.uint32)
+        factors[0] = 1
+        qpowers = numpy.cumprod(factors, dtype=numpy.uint32)
+        factors[1:] = _P
+        _powerCache[:] = [qpowers, numpy.cumprod(factors, dtype=numpy.uint32)]
+    return _powerCache[0][:n], _powerCache[1][:n]
+
+_powerCache = [[], []]
+
+
+def _parse (fuzzyhash):
+    try:
+        blocksize, first, second = fuzzyhash.split(":", 2)
+        return int(blocksize), first, second.split(",", 1)[0]
+    except (AttributeError, ValueError):
+        raise ValueError("malformed fuzzy hash: {!r}".format(fuzzyhash))
+
+
+def _eliminateSequences (signature):
+    # runs of more than three equal characters carry little information
+    result = []
+    for c in signature:
+        if len(result) < 3 or not (c == result[-1] == result[-2] == result[-3]):
+            result.append(c)
+    return "".join(result)
+
+
+def _score (signature1, signature2, blocksize):
+    signature1 = _eliminateSequences(signature1)
+    signature2 = _eliminateSequences(signature2)
+    if len(signature1) < ROLLING_WINDOW or len(signature2) < ROLLING_WINDOW:
+        return 0
+    grams = set(signature1[i:i+ROLLING_WINDOW] for i in range(len(signature1) - ROLLING_WINDOW + 1))
+    if not any(signature2[i:i+ROLLING_WINDOW] in grams for i in range(len(signature2) - ROLLING_WINDOW + 1)):
+        return 0
+    # edit distance with insertions and deletions only, via the LCS
+    distance = len(signature1) + len(signature2) - 2 * _lcs(signature1, signature2)
+    score = distance * SIGNATURE_LENGTH // (len(signature1) + len(signature2))
+    score = 100 * score // SIGNATURE_LENGTH
+    if score >= 100:
+        return 0
+    score = 100 - score
+    # small block sizes: do not exaggerate the match of short files
+    if blocksize < (99 + ROLLING_WINDOW) // ROLLING_WINDOW * MIN_BLOCKSIZE:
+        score = min(score, blocksize // MIN_BLOCKSIZE * min(len(signature1), len(signature2)))
+    return score
+
+
+def _lcs (a, b):
+    # length of the longest common subsequence, bit-parallel (Hyyro 2004):
+    # one big integer operation per character of b
+    masks = {}
+    for i, c in enumerate(a):
+        masks[c] = masks.get(c, 0) | (1 << i)
+    full = (1 << len(a)) - 1
+    v = full
+    for c in b:
+        u = v & masks.get(c, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(a) - bin(v).count("1")
@@ -0,0 +1,126 @@
+import hashlib
+from python3.tools import tracing
+from python3.tools.files import MmapFileReader, MEGABYTE
+from python3.tools.imports import LazyModule
+
+# only needed for batches hashed in parallel
+futures = LazyModule("concurrent.futures")
+# only needed for "ctph", imports numpy
+fuzzyhash = LazyModule("python3.tools.fuzzyhash")
+
+
+# digests computed if no algorithms are given
+DEFAULT_ALGORITHMS = ("md5", "sha1", "sha256", "sha512")
+
+# hashlib releases the GIL while hashing buffers larger than 2 KB, feeding it
+# large chunks lets the digests of several files be computed in parallel
+CHUNK_SIZE = MEGABYTE
+
+
+class MultiHash (object):
+    """
+    Computes several digests over the same data in a single pass.
+
+    Usage:
+        hashes = MultiHash(["md5", "sha256"])
+        hashes.update(b"some ")
+        hashes.update(b"content")
+        hashes.hexdigests()   # {"md5": "...", "sha256": "..."}
+    """
+    __slots__ = ["hashes"]
+
+    def __init__ (self, algorithms=DEFAULT_ALGORITHMS):
+        """
+        Parameters:
+            algorithms - []String: Names understood by hashlib.new, or "ctph"
+                                   for the fuzzy hash of fuzzyhash.FuzzyHasher
+        Raises a ValueError for unknown algorithms.
+        """
+        self.hashes = {}
+        for algorithm in algorithms:
+            if algorithm == "ctph":
+                self.hashes[algorithm] = fuzzyhash.FuzzyHasher()
+            else:
+                self.hashes[algorithm] = hashlib.new(algorithm)
+
+    def update (self, data):
+        """
+        Feed bytes, a bytearray or a memoryview to every digest.
+        """
+        for h in self.hashes.values():
+            h.update(data)
+
+    def hexdigests (self):
+        """
+        Returns a dict mapping each algorithm to its hex encoded digest.
+        """
+        return {algorithm: h.hexdigest() for algorithm, h in self.hashes.items()}
+
+
+def HashData (data, algorithms=DEFAULT_ALGORITHMS, chunk_size=CHUNK_SIZE):
+    """
+    Returns the hex encoded digests of data (bytes-like) as a dict.
+    Data is fed in chunks of a memoryview, it is never copied.
+    """
+    hashes = MultiHash(algorithms)
+    with memoryview(data) as view:
+        view = view.cast("B")
+        for start in range(0, len(view), chunk_size):
+            hashes.update(view[start:start+chunk_size])
+    return hashes.hexdigests()
+
+
+def HashFile (source, algorithms=DEFAULT_ALGORITHMS, chunk_size=CHUNK_SIZE):
+    """
+    Returns the hex encoded digests of a file as a dict, computed in a
+    single pass.
+
+    Parameters:
+        source     - MmapFileReader: hashed from its current offset on, without copying
+                     String:         path of the file, read in chunks into a reused buffer
+                     File object:    binary stream, read from its current position
+        algorithms - []String: Names understood by hashlib.new
+        chunk_size - Int:      Bytes fed to the digests at once
+    """
+    with tracing.StartSpan("HashFile", algorithms=",".join(algorithms)):
+        if isinstance(source, MmapFileReader):
+            hashes = MultiHash(algorithms)
+            with memoryview(source.datamap) as view:
+                for start in range(source.offset, source.filesize, chunk_size):
+                    hashes.update(view[start:min(start+chunk_size, source.filesize)])
+            return hashes.hexdigests()
+        if isinstance(source, str):
+            with open(source, "rb", buffering=0) as file:
+                return __hashStream(file, algorithms, chunk_size)
+        return __hashStream(source, algorithms, chunk_size)
+
+
+def HashFiles (sources, algorithms=DEFAULT_ALGORITHMS, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Returns a list with the digests (see HashFile) of every source, in order.
+    With workers > 1 the files are hashed by a pool of threads, which run in
+    parallel since hashlib releases the GIL.
+    """
+    if workers is None or workers <= 1:
+        return [HashFile(source, algorithms, chunk_size) for source in sources]
+    with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda source: HashFile(source, algorithms, chunk_size), sources))
+
+
+def __hashStream (stream, algorithms, chunk_size):
+    hashes = MultiHash(algorithms)
+    if hasattr(stream, "readinto"):
+        buffer = bytearray(chunk_size)
+        with memoryview(buffer) as view:
+            while True:
+                length = stream.readinto(buffer)
+                if not length:
+                    break
+                hashes.update(view[:length])
+    else:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            hashes.update(chunk)
+    return hashes.hexdigests()
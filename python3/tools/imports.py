@@ -0,0 +1,31 @@
+import importlib
+
+
+class LazyModule (object):
+    """
+    Module proxy deferring the actual import until the first attribute access.
+    Used for heavy or optional dependencies that are not needed by every
+    service importing the library (e.g. tornado, requests).
+
+    Usage:
+        requests = LazyModule("requests")
+        # nothing imported yet
+        requests.get("http://127.0.0.1:8016/")
+        # requests is imported now
+    """
+    __slots__ = ["__name", "__module"]
+
+    def __init__ (self, name):
+        object.__setattr__(self, "_LazyModule__name", name)
+        object.__setattr__(self, "_LazyModule__module", None)
+
+    def __getattr__ (self, key):
+        module = self.__module
+        if module is None:
+            module = importlib.import_module(self.__name)
+            object.__setattr__(self, "_LazyModule__module", module)
+        return getattr(module, key)
+
+    def __repr__ (self):
+        state = "imported" if self.__module is not None else "not imported"
+        return "<LazyModule {} ({})>".format(self.__name, state)
@@ -1,6 +1,10 @@
-import requests
-import hashlib
-from tornado.web import HTTPError
+from python3.tools.hashing import DEFAULT_ALGORITHMS, HashData, HashFile
+from python3.tools import tracing
+from python3.tools.imports import LazyModule
+
+# only load these when actually talking to Holmes-Storage
+requests = LazyModule("requests")
+web      = LazyModule("tornado.web")
 
 class StorageSample (object):
     """
@@ -19,6 +23,7 @@ class StorageSample (object):
             comment         - String:   Comment to be associated with the submission
         """
         # Local only:
+        self.hashes       = {}  # hex digests by algorithm, see getHashes
         self.filepath     = filepath
         self.filecontents = filecontents
 
@@ -29,30 +34,71 @@ class StorageSample (object):
         self.tags    = tags
         self.comment = comment
 
+    # assigning filepath or filecontents drops the cached digests (changing
+    # the contents of a bytearray in place does not, assign it again)
+    @property
+    def filepath(self):
+        return self._filepath
+    @filepath.setter
+    def filepath(self, filepath):
+        self._filepath = filepath
+        self.hashes = {}
+
+    @property
+    def filecontents(self):
+        return self._filecontents
+    @filecontents.setter
+    def filecontents(self, filecontents):
+        self._filecontents = filecontents
+        self.hashes = {}
+
     def getContent(self):
-        if not self.filecontents:
-            with open(self.filepath, "rb") as file:
-                self.filecontents = file.read()
-        return self.filecontents
+        if not self._filecontents:
+            with open(self._filepath, "rb") as file:
+                # the same sample, the cached digests stay valid
+                self._filecontents = file.read()
+        return self._filecontents
 
     def sha256(self):
         return self.getHash()
     def getHash(self):
-        return hashlib.sha256(self.filecontents).hexdigest()
+        return self.getHashes("sha256")["sha256"]
+
+    def getHashes(self, *algorithms):
+        """
+        Returns a dict mapping each algorithm (md5, sha1, sha256 and sha512
+        if none are given) to the hex digest of the sample. Missing digests
+        are computed in one pass, over the contents if they are loaded and
+        otherwise over the file (without loading it). Results are cached until
+        filepath or filecontents is assigned.
+        """
+        algorithms = algorithms or DEFAULT_ALGORITHMS
+        missing = [a for a in algorithms if a not in self.hashes]
+        if missing:
+            if self.filecontents or not self.filepath:
+                self.hashes.update(HashData(self.filecontents, missing))
+            else:
+                self.hashes.update(HashFile(self.filepath, missing))
+        return {a: self.hashes[a] for a in algorithms}
 
 
 class Storage (object):
     """
     Holmes-Storage utility wrapper class.
     """
-    def __init__ (self, address, user_id):
+    def __init__ (self, address, user_id, known_samples=None):
         """
         Parameters:
-            address - IP:PORT
-            user_id - user id for storing data in storage
+            address       - IP:PORT
+            user_id       - user id for storing data in storage
+            known_samples - BloomFilter (see tools.bloomfilter) of the sha256
+                            hashes stored in Holmes-Storage (optional). Samples
+                            not contained are not requested from the storage.
+                            Submitted samples are added if it is writable.
         """
         self.address = address
         self.user_id = user_id
+        self.known_samples = known_samples
 
     def submitSample (self, sample):
         """
@@ -73,19 +119,24 @@ class Storage (object):
             "tags":    sample.tags,
             "comment": sample.comment
         }
-        r = requests.request("PUT", url, files=files, params=params)
+        with tracing.StartSpan("Storage.submitSample", kind="client", url=url, size=len(files["sample"])) as span:
+            r = requests.request("PUT", url, files=files, params=params)
+            span.set("status", r.status_code)
         try:
             r = r.json()
         except Exception as e:
-            raise HTTPError(500, "Error parsing response: {}".format(e), reason="Malformed Response")
+            raise web.HTTPError(500, "Error parsing response: {}".format(e), reason="Malformed Response")
 
         if not "ResponseCode" in r:
-            raise HTTPError(500, "Missing field 'ResponseCode': {}".format(r), reason="Malformed Response")
+            raise web.HTTPError(500, "Missing field 'ResponseCode': {}".format(r), reason="Malformed Response")
 
         if r["ResponseCode"] != 1:
             if not "Failure" in r:
-                raise HTTPError(500, "Missing field 'Failure': {}".format(r), reason="Malformed Response")
-            raise HTTPError(500, "Failure: {}".format(r["Failure"]), reason="Submit Failure")
+                raise web.HTTPError(500, "Missing field 'Failure': {}".format(r), reason="Malformed Response")
+            raise web.HTTPError(500, "Failure: {}".format(r["Failure"]), reason="Submit Failure")
+
+        if self.known_samples is not None and not self.known_samples.readonly:
+            self.known_samples.add(sample.getHash())
 
     def getSample (self, sha256):
         """
@@ -97,19 +148,25 @@ class Storage (object):
         Returns:
             Sample contents (bytes)
         """
+        if self.known_samples is not None and sha256.lower() not in self.known_samples:
+            # the filter has no false negatives, no need to ask the storage
+            raise web.HTTPError(500, "Failure: sample {} not in storage".format(sha256), reason="Get Failure")
         url = self.address + "/samples/" + sha256
-        r = requests.request("GET", url)
+        with tracing.StartSpan("Storage.getSample", kind="client", url=url) as span:
+            r = requests.request("GET", url)
+            span.set("status", r.status_code)
+            span.set("size", len(r.content))
         if r.status_code != 200:
-            raise HTTPError(500, r.content.encode("utf-8"))
+            raise web.HTTPError(500, r.content.encode("utf-8"))
         if (not r.headers) or r.headers["content-type"] != "application/octet-stream":
             try:
                 r = r.json()
             except Exception as e:
-                raise HTTPError(500, "Error parsing response: {}".format(e), reason="Malformed Response")
+                raise web.HTTPError(500, "Error parsing response: {}".format(e), reason="Malformed Response")
 
             if not "Failure" in r:
-                raise HTTPError(500, "Missing field 'Failure': {}".format(r), reason="Malformed Response")
+                raise web.HTTPError(500, "Missing field 'Failure': {}".format(r), reason="Malformed Response")
 
-            raise HTTPError(500, "Failure: {}".format(r["Failure"]), reason="Get Failure")
+            raise web.HTTPError(500, "Failure: {}".format(r["Failure"]), reason="Get Failure")
 
         return r.content
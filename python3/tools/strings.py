@@ -0,0 +1,135 @@
+import mmap
+import re
+from python3.tools.files import MmapFileReader, MEGABYTE
+from python3.tools.imports import LazyModule
+
+# only needed if chunks are scanned in parallel
+multiprocessing = LazyModule("multiprocessing")
+
+
+# bytes scanned at once, each chunk is one task in parallel mode
+CHUNK_SIZE = 16 * MEGABYTE
+
+# encodings understood by ExtractStrings and the width of a character
+ENCODINGS = {
+    "ascii":    1,
+    "utf-16le": 2,
+}
+
+# printable characters (as strings(1): tab and 0x20 - 0x7e)
+PRINTABLE = b"\t\x20-\x7e"
+
+
+def ExtractStrings(source, min_length=4, encodings=("ascii", "utf-16le"), max_total=None,
+                   chunk_size=CHUNK_SIZE, workers=None):
+    """
+    Yields (offset, encoding, string) for every run of at least min_length
+    printable characters, ordered by offset. The mapping is scanned with
+    compiled regular expressions chunk by chunk, nothing is copied apart from
+    the strings found. Runs crossing chunk borders are reported once, in
+    full.
+
+    Parameters:
+        source     - MmapFileReader: scanned from its current offset on,
+                                     offsets are relative to it (as find)
+                     Bytes-like:     e.g. bytes, bytearray or mmap
+        min_length - Int:      Minimum number of characters of a string
+        encodings  - []String: "ascii" and/or "utf-16le"
+        max_total  - Int:      Stop once this many characters were returned
+                               (the string exceeding it is not returned)
+        chunk_size - Int:      Bytes scanned at once
+        workers    - Int:      Scan chunks in this many processes (only for
+                               MmapFileReaders of files with a path, larger
+                               than two chunks)
+    Raises a ValueError for unknown encodings or a min_length below 1.
+
+    Usage:
+        with MmapFileReader(path) as reader:
+            for offset, encoding, string in ExtractStrings(reader, min_length=6):
+                ...
+    """
+    if min_length < 1:
+        raise ValueError("min_length must be at least 1")
+    for encoding in encodings:
+        if encoding not in ENCODINGS:
+            raise ValueError("unknown encoding: {}".format(encoding))
+    encodings = tuple(encodings)
+
+    if isinstance(source, MmapFileReader):
+        buffer, low, high = source.datamap, source.offset, source.filesize
+        path = getattr(source.file, "name", None)
+    else:
+        buffer, low, high = source, 0, len(source)
+        path = None
+    chunk_size = max(chunk_size, 1)
+    tasks = [(low, start, min(start + chunk_size, high), high, min_length, encodings)
+             for start in range(low, high, chunk_size)]
+
+    if workers and workers > 1 and len(tasks) > 2 and isinstance(path, str):
+        with multiprocessing.Pool(workers, initializer=_initWorker, initargs=(path,)) as pool:
+            yield from _limit(pool.imap(_scanWorker, tasks), max_total)
+    else:
+        yield from _limit((_scan(buffer, *task) for task in tasks), max_total)
+
+
+def _limit(chunks, max_total):
+    total = 0
+    for results in chunks:
+        for result in results:
+            total += len(result[2])
+            if max_total is not None and total > max_total:
+                return
+            yield result
+
+
+def _patterns(min_length, encodings):
+    # (encoding, compiled pattern, character width) per encoding, cached
+    key = (min_length, encodings)
+    if key not in _patternCache:
+        patterns = []
+        for encoding in encodings:
+            if ENCODINGS[encoding] == 1:
+                pattern = re.compile(b"[%s]{%d,}" % (PRINTABLE, min_length))
+            else:
+                # the unrolled first character makes the scan about twice as fast
+                pattern = re.compile(b"[%s]\x00(?:[%s]\x00){%d,}" % (PRINTABLE, PRINTABLE, min_length - 1))
+            patterns.append((encoding, pattern, ENCODINGS[encoding]))
+        _patternCache[key] = patterns
+    return _patternCache[key]
+
+_patternCache = {}
+_printable = frozenset(b"\t" + bytes(range(0x20, 0x7f)))
+
+
+def _scan(buffer, low, start, end, high, min_length, encodings):
+    # Returns the strings starting in [start, end) of buffer, scanned data
+    # begins at low and ends at high. The scan reaches into the next chunk
+    # far enough to see min_length characters of runs starting before end,
+    # runs reaching the end of the scan are matched again up to high.
+    results = []
+    for encoding, pattern, width in _patterns(min_length, encodings):
+        stop = min(high, end + width * min_length)
+        for match in pattern.finditer(buffer, start, stop):
+            first, last = match.span()
+            if first >= end:
+                break
+            # the tail of a run starting in the previous chunk
+            if first - width >= low and buffer[first-width] in _printable and (width == 1 or buffer[first-1] == 0):
+                continue
+            if last + width > stop and stop < high:
+                last = pattern.match(buffer, first, high).end()
+            results.append((first - low, encoding, bytes(buffer[first:last]).decode(encoding)))
+    if len(encodings) > 1:
+        results.sort()
+    return results
+
+
+# state of the processes of the parallel mode
+_worker = {}
+
+def _initWorker(path):
+    with open(path, "rb") as file:
+        _worker["map"] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _scanWorker(task):
+    return _scan(_worker["map"], *task)
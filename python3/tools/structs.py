@@ -1,4 +1,7 @@
 
+import keyword
+
+
 class StructDict (dict):
     """
     Extended dict class that supports access to keys via case insensitive
@@ -44,11 +47,184 @@ class StructDict (dict):
 def Struct (obj, keyMod=None):
     """
     Determines the type of the object and returns an appropriate wrapper if any.
-    (StructDict, StructList, or just the plain input object)
+    (StructDict, a list of wrapped items, or just the plain input object)
     """
-    if isinstance(obj, (str, int, float)):
-        return obj
-    if isinstance(obj, (object, dict, list, tuple)):
+    if isinstance(obj, dict):
         return StructDict(obj, keyMod)
-    else:
+    if isinstance(obj, (list, tuple)):
+        return [Struct(item, keyMod) for item in obj]
+    return obj
+
+
+class FrozenStructDict (StructDict):
+    """
+    Immutable variant of StructDict, nested dictionaries are frozen as well
+    and lists are turned into tuples. Any attempt to modify it raises a
+    TypeError.
+    """
+    def __init__ (self, data={}, keyMod=None):
+        newdata = {}
+        object.__setattr__(self,"__keymap", {})
+        keymap = object.__getattribute__(self, "__keymap")
+        for key in data:
+            _key = key
+            if keyMod != None:
+                _key = keyMod(key)
+            _key_lower = _key
+            if isinstance(_key, (str, bytes)):
+                _key_lower = _key.lower()
+            keymap[_key_lower] = _key
+            newdata[_key] = FrozenStruct(data[key], keyMod)
+        dict.__init__(self, newdata)
+
+    def __readonly (self, *args, **kwargs):
+        raise TypeError("FrozenStructDict is immutable")
+
+    __setattr__ = __readonly
+    __setitem__ = __readonly
+    __delitem__ = __readonly
+    clear       = __readonly
+    pop         = __readonly
+    popitem     = __readonly
+    setdefault  = __readonly
+    update      = __readonly
+
+
+def FrozenStruct (obj, keyMod=None):
+    """
+    Determines the type of the object and returns an immutable wrapper if any.
+    (FrozenStructDict, tuple, or just the plain input object)
+    """
+    if isinstance(obj, dict):
+        return FrozenStructDict(obj, keyMod)
+    if isinstance(obj, (list, tuple)):
+        return tuple(FrozenStruct(item, keyMod) for item in obj)
+    return obj
+
+
+class CompiledStruct (object):
+    """
+    Base class of the frozen __slots__ classes generated by CompileStruct.
+    Attribute access is a plain slot read, field names are lowercase.
+    """
+    __slots__ = []
+
+    def __setattr__ (self, key, value):
+        raise TypeError("{} is immutable".format(type(self).__name__))
+
+    def __delattr__ (self, key):
+        raise TypeError("{} is immutable".format(type(self).__name__))
+
+    def __getitem__ (self, key):
+        """
+        Case insensitive item access by the original key, also for keys that
+        are not valid identifiers.
+        """
+        return object.__getattribute__(self, type(self)._fieldmap[self.__key(key)])
+
+    def __contains__ (self, key):
+        return self.__key(key) in type(self)._fieldmap
+
+    def __iter__ (self):
+        return iter(type(self)._keys)
+
+    def __len__ (self):
+        return len(self.__slots__)
+
+    def __eq__ (self, other):
+        return type(self) is type(other) and all(
+            getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __hash__ (self):
+        return hash(tuple(getattr(self, field) for field in self.__slots__))
+
+    def __repr__ (self):
+        return "{}({})".format(type(self).__name__, ", ".join(
+            "{}={!r}".format(field, getattr(self, field)) for field in self.__slots__))
+
+    def get (self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def dict (self):
+        """
+        Convert back into a plain dictionary with the original keys.
+        """
+        return {key: self.__plain(self[key]) for key in self}
+
+    @staticmethod
+    def __key (key):
+        if isinstance(key, (str, bytes)):
+            return key.lower()
+        return key
+
+    @staticmethod
+    def __plain (obj):
+        if isinstance(obj, CompiledStruct):
+            return obj.dict()
+        if isinstance(obj, tuple):
+            return [CompiledStruct.__plain(item) for item in obj]
         return obj
+
+
+def CompileStruct (obj):
+    """
+    Compile (nested) configuration data into immutable objects optimized for
+    reading: dictionaries become instances of generated CompiledStruct classes
+    using __slots__ with lowercase field names, lists become tuples.
+
+    Keys that are no valid identifiers are sanitized for attribute access
+    ("max-size" -> max_size, "class" -> class_, "1st" -> _1st), item access
+    works with the original keys (case insensitive).
+
+    Raises a ValueError if two keys map to the same field.
+
+    Example:
+    cfg = CompileStruct({"Port": 8080, "Limits": {"MaxSize": 10, "Hosts": ["a"]}})
+    print(cfg.port, cfg.limits.maxsize, cfg.limits.hosts[0])
+    """
+    if isinstance(obj, dict):
+        keys = tuple(obj)
+        cls = __compiledClass(keys)
+        struct = object.__new__(cls)
+        for key, field in zip(keys, cls.__slots__):
+            object.__setattr__(struct, field, CompileStruct(obj[key]))
+        return struct
+    if isinstance(obj, (list, tuple)):
+        return tuple(CompileStruct(item) for item in obj)
+    return obj
+
+
+__compiledClasses = {}
+def __compiledClass (keys):
+    cls = __compiledClasses.get(keys)
+    if cls is None:
+        fields = []
+        fieldmap = {}
+        for key in keys:
+            field = __fieldName(key)
+            if field in fields:
+                raise ValueError("Conflicting config keys, {} maps to the already used field {}".format(key, field))
+            fields.append(field)
+            if isinstance(key, (str, bytes)):
+                fieldmap[key.lower()] = field
+            else:
+                fieldmap[key] = field
+        cls = type("CompiledStruct", (CompiledStruct,), {
+            "__slots__": fields,
+            "_keys":     keys,
+            "_fieldmap": fieldmap,
+        })
+        __compiledClasses[keys] = cls
+    return cls
+
+def __fieldName (key):
+    if isinstance(key, bytes):
+        key = key.decode()
+    field = "".join(c if c.isalnum() or c == "_" else "_" for c in str(key).lower())
+    if not field or field[0].isdigit():
+        field = "_" + field
+    if keyword.iskeyword(field) or field in CompiledStruct.__dict__ or field in ("_keys", "_fieldmap"):
+        field += "_"
+    return field
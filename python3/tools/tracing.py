@@ -0,0 +1,384 @@
+import contextvars
+import json
+import random
+import threading
+import time
+from collections import deque
+
+
+# the active Tracer, None while tracing is off (see ConfigureTracing).
+# Functions taking only microseconds check it before opening a span:
+#   if tracing.tracer is None:
+#       return work()
+tracer = None
+
+# span of the current context (thread, asyncio task), _UNSAMPLED inside
+# traces which are not recorded
+_current = contextvars.ContextVar("python3.tools.tracing.span", default=None)
+_UNSAMPLED = object()
+
+# OTLP span kinds
+KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+class Span (object):
+    """
+    A timed operation of a trace. Spans are context managers, spans started
+    inside of them (also in called functions, in the same thread or asyncio
+    task) become their children. Durations are measured with the monotonic
+    clock, the wall clock only dates the start.
+
+    Usage:
+        with StartSpan("Storage.getSample", kind="client", sha256=sha256) as span:
+            data = ...
+            span.set("size", len(data))
+    """
+    __slots__ = ["tracer", "name", "kind", "trace_id", "span_id", "parent_id", "attributes",
+                 "start", "end", "start_time", "error", "token"]
+
+    def __init__ (self, tracer, name, parent=None, kind="internal", attributes=None):
+        self.tracer     = tracer
+        self.name       = name
+        self.kind       = kind
+        self.trace_id   = parent.trace_id if parent is not None else random.getrandbits(128)
+        self.span_id    = random.getrandbits(64)
+        self.parent_id  = parent.span_id if parent is not None else None
+        self.attributes = attributes or {}
+        self.start      = None
+        self.end        = None
+        self.start_time = None
+        self.error      = None
+        self.token      = None
+
+    def __enter__ (self):
+        self.start_time = time.time_ns()
+        self.start = time.perf_counter_ns()
+        self.token = _current.set(self)
+        return self
+
+    def __exit__ (self, type, value, traceback):
+        self.end = time.perf_counter_ns()
+        if value is not None and self.error is None:
+            self.error = "{}: {}".format(type.__name__, value)
+        try:
+            _current.reset(self.token)
+        except ValueError:
+            pass  # ended in another context (e.g. a callback), it ends anyway
+        self.tracer.export(self)
+        return False
+
+    def set (self, key, value):
+        """
+        Set an attribute (str, int, float or bool) of the span.
+        """
+        self.attributes[key] = value
+
+    def fail (self, message):
+        """
+        Mark the span as failed without raising an exception.
+        """
+        self.error = message
+
+    @property
+    def duration (self):
+        """
+        Duration in seconds (None while the span is running).
+        """
+        if self.end is None:
+            return None
+        return (self.end - self.start) / 1e9
+
+    def dict (self):
+        return {
+            "name":       self.name,
+            "kind":       self.kind,
+            "trace_id":   "{:032x}".format(self.trace_id),
+            "span_id":    "{:016x}".format(self.span_id),
+            "parent_id":  "{:016x}".format(self.parent_id) if self.parent_id is not None else None,
+            "start_time": self.start_time,
+            "duration":   self.duration,
+            "attributes": self.attributes,
+            "error":      self.error,
+        }
+
+
+class _NoopSpan (object):
+    # returned while tracing is off and inside unsampled traces
+    __slots__ = []
+
+    def __enter__ (self):
+        return self
+
+    def __exit__ (self, type, value, traceback):
+        return False
+
+    def set (self, key, value):
+        pass
+
+    def fail (self, message):
+        pass
+
+NOOP = _NoopSpan()
+
+
+class _UnsampledSpan (_NoopSpan):
+    # root of a trace which is not recorded, its children are NOOP
+    __slots__ = ["token"]
+
+    def __enter__ (self):
+        self.token = _current.set(_UNSAMPLED)
+        return self
+
+    def __exit__ (self, type, value, traceback):
+        try:
+            _current.reset(self.token)
+        except ValueError:
+            pass
+        return False
+
+
+class Tracer (object):
+    """
+    Creates spans and hands finished ones to the sinks. Whether a trace is
+    recorded is decided once at its root span: a fraction sample_rate of the
+    traces is recorded completely, spans of the others are no-ops.
+    """
+    def __init__ (self, sinks, sample_rate=1.0):
+        """
+        Parameters:
+            sinks       - []Sink: Objects with an export(span) method (and
+                                  optionally flush() and close())
+            sample_rate - Float:  Fraction of the traces recorded (0.0 - 1.0)
+        Raises a ValueError for sample rates outside of 0.0 - 1.0.
+        """
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0.0 and 1.0")
+        self.sinks       = list(sinks)
+        self.sample_rate = sample_rate
+        self.dropped     = 0
+
+    def span (self, name, kind="internal", attributes=None):
+        parent = _current.get()
+        if parent is _UNSAMPLED:
+            return NOOP
+        if parent is None and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return _UnsampledSpan()
+        return Span(self, name, parent, kind, attributes)
+
+    def export (self, span):
+        # a failing sink must not fail the traced operation
+        for sink in self.sinks:
+            try:
+                sink.export(span)
+            except Exception:
+                self.dropped += 1
+
+    def flush (self):
+        for sink in self.sinks:
+            if hasattr(sink, "flush"):
+                sink.flush()
+
+    def close (self, keep=()):
+        """
+        Close the sinks, those in keep (e.g. still used by another tracer)
+        are only flushed.
+        """
+        for sink in self.sinks:
+            if any(sink is kept for kept in keep):
+                if hasattr(sink, "flush"):
+                    sink.flush()
+            elif hasattr(sink, "close"):
+                sink.close()
+
+
+def ConfigureTracing (sinks=None, sample_rate=1.0):
+    """
+    Turn tracing on with the given sinks, or off if sinks is empty. The sinks
+    of the previous tracer are closed (files written by them are complete
+    afterwards), except those passed again, which are flushed. Returns the
+    new Tracer (None if off).
+
+    Usage:
+        buffer = RingBufferSink(4096)
+        ConfigureTracing([buffer, OTLPFileSink("/var/log/service/spans.otlp.json")], sample_rate=0.1)
+    """
+    global tracer
+    previous = tracer
+    tracer = Tracer(sinks, sample_rate) if sinks else None
+    if previous is not None:
+        previous.close(keep=sinks or ())
+    return tracer
+
+
+def StartSpan (name, kind="internal", **attributes):
+    """
+    Returns a span (context manager) named name, a no-op if tracing is off or
+    the current trace is not sampled.
+
+    Parameters:
+        name       - String: e.g. "inputtype.Detect"
+        kind       - String: "internal", "server" (incoming requests) or
+                             "client" (outgoing requests)
+        attributes - Attributes of the span (str, int, float or bool)
+    """
+    if tracer is None:
+        return NOOP
+    return tracer.span(name, kind, attributes)
+
+
+def CurrentSpan ():
+    """
+    Returns the recorded span of the current context, None if there is none.
+    """
+    span = _current.get()
+    return span if isinstance(span, Span) else None
+
+
+def Traced (name=None, kind="internal"):
+    """
+    Decorator running every call of a function in a span (named after the
+    function by default).
+
+    Usage:
+        @Traced("analysis.unpack")
+        def unpack(path):
+            ...
+    """
+    def decorator (function):
+        spanName = name or function.__qualname__
+        def traced (*args, **kwargs):
+            if tracer is None:
+                return function(*args, **kwargs)
+            with tracer.span(spanName, kind):
+                return function(*args, **kwargs)
+        traced.__name__ = function.__name__
+        traced.__qualname__ = function.__qualname__
+        traced.__doc__ = function.__doc__
+        traced.__wrapped__ = function
+        return traced
+    return decorator
+
+
+class RingBufferSink (object):
+    """
+    Keeps the last size spans in memory, e.g. for a debug endpoint or tests.
+    """
+    def __init__ (self, size=1024):
+        self.buffer = deque(maxlen=size)
+
+    def export (self, span):
+        self.buffer.append(span)
+
+    def spans (self, name=None):
+        """
+        Returns the buffered spans (oldest first), only those called name if
+        given.
+        """
+        return [span for span in list(self.buffer) if name is None or span.name == name]
+
+    def clear (self):
+        self.buffer.clear()
+
+
+class JSONLogSink (object):
+    """
+    Writes every span as one JSON line (see Span.dict) to a file or stream.
+    """
+    def __init__ (self, destination):
+        """
+        Parameters:
+            destination - String: path of the log file (appended to)
+                          Stream: text stream, e.g. sys.stderr
+        """
+        self.owned = isinstance(destination, str)
+        self.stream = open(destination, "a") if self.owned else destination
+        self.lock = threading.Lock()
+
+    def export (self, span):
+        line = json.dumps(span.dict(), default=str) + "\n"
+        with self.lock:
+            self.stream.write(line)
+
+    def flush (self):
+        with self.lock:
+            self.stream.flush()
+
+    def close (self):
+        if self.owned and self.stream.closed:
+            return
+        self.flush()
+        if self.owned:
+            self.stream.close()
+
+
+class OTLPFileSink (object):
+    """
+    Writes spans in the OTLP/JSON format, one ExportTraceServiceRequest per
+    line for every batch_size spans, as read by the otlpjsonfile receiver of
+    the OpenTelemetry Collector. Call flush() (or close()) to write the last
+    partial batch.
+    """
+    def __init__ (self, path, service_name="python3-service", batch_size=512):
+        self.file         = open(path, "a")
+        self.service_name = service_name
+        self.batch_size   = batch_size
+        self.batch        = []
+        self.lock         = threading.Lock()
+
+    def export (self, span):
+        with self.lock:
+            self.batch.append(span)
+            if len(self.batch) >= self.batch_size:
+                self.__write()
+
+    def flush (self):
+        with self.lock:
+            if self.batch:
+                self.__write()
+            self.file.flush()
+
+    def close (self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+    def __write (self):
+        spans, self.batch = self.batch, []
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_otlpAttribute("service.name", self.service_name)]},
+            "scopeSpans": [{
+                "scope": {"name": "python3.tools.tracing"},
+                "spans": [_otlpSpan(span) for span in spans],
+            }],
+        }]}
+        self.file.write(json.dumps(request, separators=(",", ":")) + "\n")
+        self.file.flush()
+
+
+def _otlpSpan (span):
+    result = {
+        "traceId":           "{:032x}".format(span.trace_id),
+        "spanId":            "{:016x}".format(span.span_id),
+        "name":              span.name,
+        "kind":              KINDS.get(span.kind, 1),
+        "startTimeUnixNano": str(span.start_time),
+        "endTimeUnixNano":   str(span.start_time + span.end - span.start),
+        "attributes":        [_otlpAttribute(key, value) for key, value in span.attributes.items()],
+        "status":            {"code": 2, "message": span.error} if span.error is not None else {},
+    }
+    if span.parent_id is not None:
+        result["parentSpanId"] = "{:016x}".format(span.parent_id)
+    return result
+
+
+def _otlpAttribute (key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}